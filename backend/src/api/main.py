@@ -1,26 +1,80 @@
 from __future__ import annotations
 
+import asyncio
+import contextlib
 import json
 import shutil
+import threading
+from collections import OrderedDict
 from datetime import datetime, timezone
 from pathlib import Path
-from uuid import uuid4
+from typing import AsyncIterator
+from uuid import UUID, uuid4
 
 import structlog
-from celery.result import AsyncResult
-from fastapi import FastAPI, File, Form, HTTPException, Query, UploadFile, status
-from fastapi.responses import FileResponse
-
-from src.api.schemas import JobCreateResponse, JobStatus, JobStatusResponse
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+
+from src.api.schemas import (
+    PRIVATE_METADATA_FIELDS,
+    JobCreateResponse,
+    JobMetadata,
+    JobStatus,
+    JobStatusResponse,
+    RetabRequest,
+    RetranscribeRequest,
+    UploadCompleteRequest,
+    UploadCreateRequest,
+    UploadStatusResponse,
+)
+from src.api.uploads import (
+    SavedUpload,
+    UploadSession,
+    append_chunk,
+    complete_session,
+    create_session,
+    load_session,
+    probe_duration,
+    receive_upload,
+    sweep_sessions,
+)
+from src.core import jobs
 from src.core.config import settings
-from src.worker import tasks
-from src.worker.app import celery_app
+from src.core.job_store import JobStore, fail_stalled_jobs, get_job_store, load_job, read_snapshot, restore_job
+from src.pipelines.tunings import DEFAULT_TUNING, resolve_tuning
+from src.worker.app import RETAB_JOB, RETRANSCRIBE_JOB, celery_app, pipeline
 
 logger = structlog.get_logger()
 
 ALLOWED_EXTENSIONS = {"mp3", "wav", "m4a", "ogg", "flac", "opus"}
 MAX_UPLOAD_BYTES = 50 * 1024 * 1024
-METADATA_FILENAME = "metadata.json"
+# Resumable uploads are not bound by a single request, so they allow lossless sources.
+MAX_RESUMABLE_UPLOAD_BYTES = 1024 * 1024 * 1024
+# Documents the multipart body that `create_job` parses itself.
+UPLOAD_REQUEST_SCHEMA = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {
+                        "file": {"type": "string", "format": "binary"},
+                        "strings": {"type": "integer", "default": 4},
+                        "tuning": {"type": "string", "default": DEFAULT_TUNING},
+                    },
+                }
+            }
+        },
+    }
+}
+# Finished jobs no longer change unless re-run, which bumps their version.
+FINISHED_STATUSES = {JobStatus.SUCCESS, JobStatus.FAILURE, JobStatus.REVOKED}
+FINISHED_CACHE_SIZE = 4096
+# Comment frames keep idle event streams open through proxies.
+SSE_KEEPALIVE_SECONDS = 15.0
 MIME_MAP = {
     ".wav": "audio/wav",
     ".opus": "audio/opus",
@@ -36,39 +90,52 @@ MIME_MAP = {
 }
 
 
-app = FastAPI(title="Stem2Tab API")
+_finished_jobs: OrderedDict[str, tuple[str, bytes]] = OrderedDict()
+_finished_lock = threading.Lock()
 
 
-@app.get("/health")
-def health() -> dict[str, str]:
-    """Health endpoint for liveness probes."""
-    return {"status": "ok"}
+def _run_maintenance() -> None:
+    removed = sweep_sessions(settings.file_bucket_path, ttl_seconds=settings.upload_session_ttl_seconds)
+    if removed:
+        logger.info("upload_sessions_expired", upload_ids=[path.name for path in removed])
+    # A worker killed mid-task never reports a failure; its lapsed lease is the only signal.
+    stalled = fail_stalled_jobs()
+    if stalled:
+        logger.warning("stalled_jobs_failed", job_ids=stalled)
 
 
-def _now_utc() -> datetime:
-    return datetime.now(timezone.utc)
+async def _maintenance_loop() -> None:
+    # Every API process runs its own sweeps; each pass is safe to run concurrently with another.
+    while True:
+        await asyncio.sleep(settings.maintenance_interval_seconds)
+        try:
+            await run_in_threadpool(_run_maintenance)
+        except Exception as exc:  # pragma: no cover - defensive guard
+            logger.exception("maintenance_failed", error=str(exc))
 
 
-def _job_dir(job_id: str) -> Path:
-    return settings.file_bucket_path / job_id
+@contextlib.asynccontextmanager
+async def _lifespan(app: FastAPI) -> AsyncIterator[None]:
+    maintenance = asyncio.create_task(_maintenance_loop())
+    try:
+        yield
+    finally:
+        maintenance.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await maintenance
 
 
-def _metadata_path(job_id: str) -> Path:
-    return _job_dir(job_id) / METADATA_FILENAME
+app = FastAPI(title="Stem2Tab API", lifespan=_lifespan)
 
 
-def _list_job_files(job_id: str) -> list[str]:
-    job_dir = _job_dir(job_id)
-    if not job_dir.exists():
-        return []
+@app.get("/health")
+def health() -> dict[str, str]:
+    """Health endpoint for liveness probes."""
+    return {"status": "ok"}
 
-    files: list[str] = []
-    for path in job_dir.iterdir():
-        if path.name == METADATA_FILENAME or path.is_dir():
-            continue
-        files.append(path.name)
-    files.sort()
-    return files
+
+def _now_utc() -> datetime:
+    return datetime.now(timezone.utc)
 
 
 def _resolve_job_file(job_id: str, name: str) -> Path:
@@ -79,7 +146,7 @@ def _resolve_job_file(job_id: str, name: str) -> Path:
     if "/" in name or "\\" in name or ".." in Path(name).parts or Path(name).is_absolute():
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid file name")
 
-    job_dir = _job_dir(job_id)
+    job_dir = jobs.job_dir(job_id)
     if not job_dir.exists():
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
 
@@ -89,88 +156,102 @@ def _resolve_job_file(job_id: str, name: str) -> Path:
     return file_path
 
 
-def _validate_upload(file: UploadFile) -> str:
-    if not file.filename:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="File is required")
+def _validate_tuning(tuning: str, strings: int) -> None:
+    try:
+        resolve_tuning(tuning, strings)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+
+
+def _job_options(fields: dict[str, str]) -> tuple[int, str]:
+    try:
+        strings = int(fields.get("strings", "4"))
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="strings must be an integer") from None
+    tuning = fields.get("tuning") or DEFAULT_TUNING
+    _validate_tuning(tuning, strings)
+    return strings, tuning
+
 
-    ext = Path(file.filename).suffix.lower().lstrip(".")
-    if ext not in ALLOWED_EXTENSIONS:
-        allowed = ", ".join(sorted(ALLOWED_EXTENSIONS))
+def _validate_audio(path: Path) -> float:
+    """Probe the upload's duration, rejecting undecodable or overlong audio before it is queued."""
+    try:
+        duration = probe_duration(path)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Could not decode audio file") from exc
+    if duration > settings.max_audio_seconds:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Unsupported file format. Allowed: {allowed}",
+            detail=f"Audio too long ({duration:.0f}s). Max {settings.max_audio_seconds:.0f}s.",
         )
+    return duration
 
-    file.file.seek(0, 2)
-    size_bytes = file.file.tell()
-    file.file.seek(0)
-    if size_bytes > MAX_UPLOAD_BYTES:
-        raise HTTPException(
-            status_code=status.HTTP_413_CONTENT_TOO_LARGE,
-            detail="File too large. Max 50MB.",
-        )
 
-    return ext
+def _load_metadata(job_id: str) -> JobMetadata:
+    # Puts an expired job's snapshot back into the store so the re-run can update it.
+    metadata = restore_job(job_id)
+    if metadata is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return metadata
 
 
-def _save_upload(job_id: str, upload: UploadFile, ext: str) -> Path:
-    job_dir = _job_dir(job_id)
-    job_dir.mkdir(parents=True, exist_ok=True)
+def _reset_to_pending(job_id: str) -> None:
+    get_job_store().update(job_id, status=JobStatus.PENDING, error=None)
 
-    destination = job_dir / f"input.{ext}"
-    with destination.open("wb") as fp:
-        shutil.copyfileobj(upload.file, fp)
-    return destination
 
+def _version_etag(version: int) -> str:
+    return f'"v{version}"'
 
-def _write_metadata(payload: JobStatusResponse) -> None:
-    meta_path = _metadata_path(payload.job_id)
-    meta_path.parent.mkdir(parents=True, exist_ok=True)
-    meta_path.write_text(payload.model_dump_json(), encoding="utf-8")
 
+def _snapshot_etag(metadata: JobMetadata) -> str:
+    # Snapshots outlive the store's version counter; a finished job's timestamp is just as stable.
+    return f'"s{metadata.updated_at.timestamp():.6f}"'
 
-def _load_metadata(job_id: str) -> JobStatusResponse:
-    meta_path = _metadata_path(job_id)
-    if not meta_path.exists():
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
 
-    data = json.loads(meta_path.read_text(encoding="utf-8"))
-    return JobStatusResponse.model_validate(data)
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
 
 
-def _refresh_status(job_id: str, metadata: JobStatusResponse) -> JobStatusResponse:
-    async_result = AsyncResult(job_id, app=celery_app)
-    if async_result.status in JobStatus.__members__:
-        metadata.status = JobStatus(async_result.status)
-    else:
-        metadata.status = JobStatus.PENDING
+def _cached_status(job_id: str, etag: str | None) -> tuple[str, bytes] | None:
+    """A finished job's cached (etag, body); `etag` is the current one when the store still has the job."""
+    with _finished_lock:
+        entry = _finished_jobs.get(job_id)
+        if entry is None or (etag is not None and entry[0] != etag):
+            return None
+        _finished_jobs.move_to_end(job_id)
+        return entry
 
-    if async_result.failed():
-        metadata.error = str(async_result.result)
-    elif async_result.successful():
-        metadata.progress = 100
 
-    metadata.files = _list_job_files(job_id)
-    metadata.updated_at = _now_utc()
-    _write_metadata(metadata)
-    return metadata
+def _cache_status(job_id: str, entry: tuple[str, bytes]) -> None:
+    with _finished_lock:
+        _finished_jobs[job_id] = entry
+        _finished_jobs.move_to_end(job_id)
+        while len(_finished_jobs) > FINISHED_CACHE_SIZE:
+            _finished_jobs.popitem(last=False)
 
 
-@app.post(
-    "/api/v1/jobs",
-    response_model=JobCreateResponse,
-    status_code=status.HTTP_202_ACCEPTED,
-)
-def create_job(
-    file: UploadFile = File(...),
-    strings: int = Form(4),
-    tuning: str = Form("standard"),
-) -> JobCreateResponse:
-    """Create a job, persist the upload, and enqueue processing."""
-    job_id = str(uuid4())
-    ext = _validate_upload(file)
+def _status_entry(job_id: str) -> tuple[str, bytes]:
+    found = get_job_store().get_versioned(job_id)
+    if found is not None:
+        metadata, version = found
+        etag = _version_etag(version)
+    else:
+        metadata = read_snapshot(job_id)
+        if metadata is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+        etag = _snapshot_etag(metadata)
+
+    entry = etag, metadata.model_dump_json(exclude=PRIVATE_METADATA_FIELDS).encode()
+    if metadata.status in FINISHED_STATUSES:
+        _cache_status(job_id, entry)
+    return entry
 
-    input_path = _save_upload(job_id, file, ext)
+
+def _start_job(job_id: str, upload: SavedUpload, strings: int, tuning: str) -> JobCreateResponse:
+    duration = _validate_audio(upload.path)
     created_at = _now_utc()
     metadata = JobStatusResponse(
         job_id=job_id,
@@ -178,21 +259,24 @@ def create_job(
         progress=0,
         created_at=created_at,
         updated_at=created_at,
-        files=_list_job_files(job_id),
+        files=jobs.list_job_files(job_id),
         error=None,
     )
-    _write_metadata(metadata)
+    get_job_store().create(metadata)
 
     payload = {
         "job_id": job_id,
-        "input_path": str(input_path),
+        "input_path": str(upload.path),
+        "input_sha256": upload.sha256,
+        "duration_seconds": duration,
         "strings": strings,
         "tuning": tuning,
-        "original_filename": file.filename,
+        "original_filename": upload.filename,
     }
 
     try:
-        async_result = tasks.process_job.apply_async(kwargs={"job_id": job_id, "payload": payload}, task_id=job_id)
+        # The chain's final stage takes the job id, so status polling follows the whole pipeline.
+        async_result = pipeline(job_id, payload).apply_async(task_id=job_id)
     except Exception as exc:  # pragma: no cover - defensive guard
         logger.exception("job_enqueue_failed", job_id=job_id, error=str(exc))
         raise HTTPException(status_code=500, detail="Failed to enqueue job") from exc
@@ -201,18 +285,238 @@ def create_job(
         "job_enqueued",
         job_id=job_id,
         demucs_model=settings.demucs_model,
-        input_path=str(input_path),
+        input_path=str(upload.path),
+        input_sha256=upload.sha256,
+        size_bytes=upload.size_bytes,
+        duration_seconds=round(duration, 2),
         strings=strings,
         tuning=tuning,
     )
     return JobCreateResponse(job_id=async_result.id)
 
 
+@app.post(
+    "/api/v1/jobs",
+    response_model=JobCreateResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    openapi_extra=UPLOAD_REQUEST_SCHEMA,
+)
+async def create_job(request: Request) -> JobCreateResponse:
+    """Create a job from a multipart upload (`file`, `strings`, `tuning`) and enqueue processing.
+
+    The body is streamed into the job directory, so an oversized upload is cut off at the limit
+    and a rejected job leaves nothing behind.
+    """
+    job_id = str(uuid4())
+    job_dir = jobs.job_dir(job_id)
+    try:
+        upload = await receive_upload(
+            request.stream(),
+            request.headers.get("content-type", ""),
+            job_dir,
+            allowed_extensions=ALLOWED_EXTENSIONS,
+            max_bytes=MAX_UPLOAD_BYTES,
+        )
+        strings, tuning = _job_options(upload.fields)
+        return await run_in_threadpool(_start_job, job_id, upload, strings, tuning)
+    except BaseException:
+        shutil.rmtree(job_dir, ignore_errors=True)
+        raise
+
+
+def _load_session(upload_id: str) -> UploadSession:
+    try:
+        UUID(upload_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found") from None
+    session = load_session(jobs.job_dir(upload_id), ttl_seconds=settings.upload_session_ttl_seconds)
+    if session is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found")
+    return session
+
+
+def _upload_status(upload_id: str, session: UploadSession, offset: int | None = None) -> UploadStatusResponse:
+    return UploadStatusResponse(
+        upload_id=upload_id,
+        offset=session.offset if offset is None else offset,
+        size=session.size,
+    )
+
+
+@app.post(
+    "/api/v1/uploads",
+    response_model=UploadStatusResponse,
+    status_code=status.HTTP_201_CREATED,
+)
+def create_upload(request: UploadCreateRequest) -> UploadStatusResponse:
+    """Start a resumable upload; send chunks with PUT and finish it with `/complete`."""
+    upload_id = str(uuid4())
+    session = create_session(
+        jobs.job_dir(upload_id),
+        request.filename,
+        request.size,
+        allowed_extensions=ALLOWED_EXTENSIONS,
+        max_bytes=MAX_RESUMABLE_UPLOAD_BYTES,
+    )
+    logger.info("upload_created", upload_id=upload_id, filename=request.filename, size=request.size)
+    return _upload_status(upload_id, session)
+
+
+@app.get("/api/v1/uploads/{upload_id}", response_model=UploadStatusResponse)
+def get_upload(upload_id: str) -> UploadStatusResponse:
+    """Report how many bytes arrived, so an interrupted client knows where to resume."""
+    return _upload_status(upload_id, _load_session(upload_id))
+
+
+@app.put("/api/v1/uploads/{upload_id}", response_model=UploadStatusResponse)
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0, description="Byte offset of this chunk in the file"),
+) -> UploadStatusResponse:
+    """Append the raw request body at `offset`, streaming it into the job directory."""
+    session = await run_in_threadpool(_load_session, upload_id)
+    received = await append_chunk(request.stream(), session, offset=offset)
+    return _upload_status(upload_id, session, received)
+
+
+@app.post(
+    "/api/v1/uploads/{upload_id}/complete",
+    response_model=JobCreateResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def complete_upload(upload_id: str, request: UploadCompleteRequest) -> JobCreateResponse:
+    """Turn a fully received upload into a job; the upload id becomes the job id."""
+    session = _load_session(upload_id)
+    _validate_tuning(request.tuning, request.strings)
+    upload = complete_session(session)
+    try:
+        return _start_job(upload_id, upload, request.strings, request.tuning)
+    except BaseException:
+        shutil.rmtree(jobs.job_dir(upload_id), ignore_errors=True)
+        raise
+
+
 @app.get("/api/v1/jobs/{job_id}", response_model=JobStatusResponse)
-def get_job(job_id: str) -> JobStatusResponse:
-    """Retrieve the current status for a job."""
-    metadata = _load_metadata(job_id)
-    return _refresh_status(job_id, metadata)
+def get_job(job_id: str, if_none_match: str | None = Header(None)) -> Response:
+    """Retrieve the current status for a job.
+
+    Read-only: the ETag is the job's status version, so an unchanged job costs one field read
+    and a 304. Finished jobs are answered from an in-process cache.
+    """
+    version = get_job_store().version(job_id)
+    etag = _version_etag(version) if version is not None else None
+    entry = None
+    if etag is None or not _etag_matches(if_none_match, etag):
+        entry = _cached_status(job_id, etag) or _status_entry(job_id)
+        etag = entry[0]
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if entry is None or _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=entry[1], media_type="application/json", headers=headers)
+
+
+def _sse(event: str, data: dict, event_id: int | None = None) -> str:
+    id_line = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{id_line}event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _job_events(store: JobStore, job_id: str, request: Request) -> AsyncIterator[str]:
+    """Relay the job's store events as SSE frames until the job finishes or the client leaves.
+
+    The stream opens with a `status` event carrying the full job, read after subscribing so no
+    update falls between the two; events at or below that version are skipped.
+    """
+    async with store.subscribe(job_id) as events:
+        found = await run_in_threadpool(store.get_versioned, job_id)
+        if found is not None:
+            metadata, version = found
+        else:
+            metadata, version = await run_in_threadpool(read_snapshot, job_id), 0
+        if metadata is None:
+            return
+        yield _sse("status", metadata.model_dump(mode="json", exclude=PRIVATE_METADATA_FIELDS), version or None)
+        finished = metadata.status in FINISHED_STATUSES
+
+        while not finished and not await request.is_disconnected():
+            message = await events.get(SSE_KEEPALIVE_SECONDS)
+            if message is None:
+                yield ": keepalive\n\n"
+                continue
+            if message["version"] <= version:
+                continue
+            version = message["version"]
+            yield _sse(message["event"], message["data"], version)
+            finished = message["event"] == "progress" and message["data"].get("status") in FINISHED_STATUSES
+
+
+@app.get("/api/v1/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request) -> StreamingResponse:
+    """Stream the job's progress and stage events as Server-Sent Events.
+
+    `GET /api/v1/jobs/{job_id}` remains the polling fallback for clients without EventSource.
+    """
+    if await run_in_threadpool(load_job, job_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return StreamingResponse(
+        _job_events(get_job_store(), job_id, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post(
+    "/api/v1/jobs/{job_id}/retranscribe",
+    response_model=JobCreateResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def retranscribe_job(job_id: str, request: RetranscribeRequest) -> JobCreateResponse:
+    """Rebuild a finished job's MIDI and tab from its cached posteriors with new thresholds."""
+    _load_metadata(job_id)
+    _validate_tuning(request.tuning, request.strings)
+    if not (jobs.job_dir(job_id) / "bass.posteriors").is_dir():
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Job has no cached posteriors")
+
+    _reset_to_pending(job_id)
+
+    try:
+        # Reuse the job id as task id so status polling follows the re-run.
+        async_result = celery_app.signature(
+            RETRANSCRIBE_JOB, kwargs={"job_id": job_id, "payload": request.model_dump()}
+        ).apply_async(task_id=job_id)
+    except Exception as exc:  # pragma: no cover - defensive guard
+        logger.exception("job_enqueue_failed", job_id=job_id, error=str(exc))
+        raise HTTPException(status_code=500, detail="Failed to enqueue job") from exc
+
+    logger.info("job_retranscribe_enqueued", job_id=job_id, **request.model_dump())
+    return JobCreateResponse(job_id=async_result.id)
+
+
+@app.post(
+    "/api/v1/jobs/{job_id}/retab",
+    response_model=JobCreateResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def retab_job(job_id: str, request: RetabRequest) -> JobCreateResponse:
+    """Regenerate a finished job's tab for another string count or tuning, reusing its MIDI."""
+    _load_metadata(job_id)
+    _validate_tuning(request.tuning, request.strings)
+    if not (jobs.job_dir(job_id) / "bass.mid").is_file():
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Job has no transcription yet")
+
+    _reset_to_pending(job_id)
+
+    try:
+        async_result = celery_app.signature(
+            RETAB_JOB, kwargs={"job_id": job_id, "payload": request.model_dump()}
+        ).apply_async(task_id=job_id)
+    except Exception as exc:  # pragma: no cover - defensive guard
+        logger.exception("job_enqueue_failed", job_id=job_id, error=str(exc))
+        raise HTTPException(status_code=500, detail="Failed to enqueue job") from exc
+
+    logger.info("job_retab_enqueued", job_id=job_id, **request.model_dump())
+    return JobCreateResponse(job_id=async_result.id)
 
 
 @app.get("/api/v1/files/{job_id}")
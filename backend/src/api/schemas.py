@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from datetime import datetime
 from enum import Enum
+from typing import Any
 
 from pydantic import BaseModel, Field
 
@@ -34,3 +35,61 @@ class JobStatusResponse(BaseModel):
     files: list[str] = Field(default_factory=list, description="Available artifact names")
     error: str | None = Field(default=None, description="Error message if failed")
 
+
+class StageCheckpoint(BaseModel):
+    """Completion record of one pipeline stage, used to skip it when the job runs again."""
+
+    input_sha256: str = Field(..., description="sha256 of the stage's input file")
+    params: dict[str, Any] = Field(default_factory=dict, description="Parameters that affect the output")
+    artifacts: dict[str, str] = Field(default_factory=dict, description="Produced files by role")
+    completed_at: datetime = Field(..., description="Completion time (UTC)")
+
+
+class JobMetadata(JobStatusResponse):
+    """Persisted job state: the public status plus per-stage checkpoints and its store version."""
+
+    stages: dict[str, StageCheckpoint] = Field(default_factory=dict, description="Checkpoints by stage name")
+    version: int = Field(default=0, ge=0, description="Status version the record was read at")
+
+
+class RetranscribeRequest(BaseModel):
+    """Note-decoding parameters applied to a job's cached Basic Pitch posteriors."""
+
+    onset_threshold: float = Field(default=0.5, gt=0.0, lt=1.0, description="Minimum onset activation")
+    frame_threshold: float = Field(default=0.3, gt=0.0, lt=1.0, description="Minimum frame activation")
+    minimum_note_length_ms: float = Field(default=127.70, ge=0.0, description="Shortest note to keep (ms)")
+    strings: int = Field(default=4, description="Bass string count for the regenerated tab")
+    tuning: str = Field(default="standard", description="Tuning name or comma-separated MIDI pitches")
+
+
+class RetabRequest(BaseModel):
+    """Tab layout parameters applied to a job's existing MIDI transcription."""
+
+    strings: int = Field(default=4, description="Bass string count")
+    tuning: str = Field(default="standard", description="Tuning name or comma-separated MIDI pitches")
+
+
+class UploadCreateRequest(BaseModel):
+    """Declares a resumable upload before its chunks are sent."""
+
+    filename: str = Field(..., min_length=1, description="Original file name; its extension selects the format")
+    size: int = Field(..., gt=0, description="Total size of the file in bytes")
+
+
+class UploadStatusResponse(BaseModel):
+    """Progress of a resumable upload; the next chunk must start at `offset`."""
+
+    upload_id: str = Field(..., description="Upload identifier, which becomes the job id")
+    offset: int = Field(..., ge=0, description="Bytes received so far")
+    size: int = Field(..., gt=0, description="Declared total size in bytes")
+
+
+class UploadCompleteRequest(BaseModel):
+    """Job options applied when a finished upload is turned into a job."""
+
+    strings: int = Field(default=4, description="Bass string count")
+    tuning: str = Field(default="standard", description="Tuning name or comma-separated MIDI pitches")
+
+
+# JobMetadata fields that are internal bookkeeping, never part of a status response.
+PRIVATE_METADATA_FIELDS = {"stages", "version"}
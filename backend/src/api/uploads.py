@@ -0,0 +1,416 @@
+"""Streaming audio uploads for job creation.
+
+The multipart body is parsed as it arrives: the audio part goes straight into the job directory
+and is hashed on the way, and the upload is aborted as soon as it exceeds the size limit. Nothing
+is spooled to a temporary file first.
+
+Resumable uploads write chunks into `input.<ext>.part` in the job directory, at the offset the
+client says it is sending; finishing the upload renames the file in place. Each request that
+touches the file holds the session's `upload.lock` (an `flock`, so it also holds across API
+processes), and a session with no activity for its TTL expires and is swept.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import AsyncIterable, Iterator
+
+import anyio
+from fastapi import HTTPException, status
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+FILE_FIELD = "file"
+FFPROBE_TIMEOUT_SECONDS = 30
+SESSION_FILENAME = "upload.json"
+LOCK_FILENAME = "upload.lock"
+PART_SUFFIX = ".part"
+# Plain form fields are buffered in memory, so both their number and their size are capped.
+MAX_FORM_FIELDS = 32
+MAX_FIELD_BYTES = 16 * 1024
+_HASH_CHUNK_BYTES = 1024 * 1024
+
+
+@dataclass
+class SavedUpload:
+    """An uploaded audio file on disk plus the plain form fields sent with it."""
+
+    path: Path
+    filename: str
+    size_bytes: int
+    sha256: str
+    fields: dict[str, str] = field(default_factory=dict)
+
+
+def upload_extension(filename: str | None, allowed: set[str]) -> str:
+    if not filename:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="File is required")
+
+    ext = Path(filename).suffix.lower().lstrip(".")
+    if ext not in allowed:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported file format. Allowed: {', '.join(sorted(allowed))}",
+        )
+    return ext
+
+
+def too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+        detail=f"File too large. Max {max_bytes // (1024 * 1024)}MB.",
+    )
+
+
+class _MultipartReceiver:
+    """python-multipart callbacks that collect form fields and queue file data for writing."""
+
+    def __init__(self, destination_dir: Path, *, allowed_extensions: set[str], max_bytes: int) -> None:
+        self.destination_dir = destination_dir
+        self.allowed_extensions = allowed_extensions
+        self.max_bytes = max_bytes
+        self.fields: dict[str, str] = {}
+        self.path: Path | None = None
+        self.filename = ""
+        self.size_bytes = 0
+        self.digest = hashlib.sha256()
+        self.pending: list[bytes] = []
+        self._headers: dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._name = ""
+        self._value: list[bytes] = []
+        self._value_bytes = 0
+        self._field_count = 0
+        self._is_file = False
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self._part_begin,
+            "on_header_field": self._header_field_data,
+            "on_header_value": self._header_value_data,
+            "on_header_end": self._header_end,
+            "on_headers_finished": self._headers_finished,
+            "on_part_data": self._part_data,
+            "on_part_end": self._part_end,
+        }
+
+    def _part_begin(self) -> None:
+        self._headers = {}
+        self._value = []
+        self._value_bytes = 0
+        self._is_file = False
+
+    def _header_field_data(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _header_value_data(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._name = options.get(b"name", b"").decode()
+        if self._name != FILE_FIELD:
+            self._field_count += 1
+            if self._field_count > MAX_FORM_FIELDS:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Too many form fields. Max {MAX_FORM_FIELDS}.",
+                )
+            return
+        if self.path is not None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Only one file may be uploaded")
+        filename = options.get(b"filename", b"").decode()
+        ext = upload_extension(filename, self.allowed_extensions)
+        self._is_file = True
+        self.filename = filename
+        self.path = self.destination_dir / f"input.{ext}"
+
+    def _part_data(self, data: bytes, start: int, end: int) -> None:
+        chunk = data[start:end]
+        if not self._is_file:
+            self._value_bytes += len(chunk)
+            if self._value_bytes > MAX_FIELD_BYTES:
+                raise HTTPException(
+                    status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+                    detail=f"Form field {self._name!r} too large. Max {MAX_FIELD_BYTES // 1024}KB.",
+                )
+            self._value.append(chunk)
+            return
+        self.size_bytes += len(chunk)
+        if self.size_bytes > self.max_bytes:
+            raise too_large(self.max_bytes)
+        self.digest.update(chunk)
+        self.pending.append(chunk)
+
+    def _part_end(self) -> None:
+        if not self._is_file:
+            self.fields[self._name] = b"".join(self._value).decode()
+
+
+async def receive_upload(
+    body: AsyncIterable[bytes],
+    content_type: str,
+    destination_dir: Path,
+    *,
+    allowed_extensions: set[str],
+    max_bytes: int,
+) -> SavedUpload:
+    """Stream a multipart/form-data body, writing its `file` part to `destination_dir/input.<ext>`.
+
+    Raises HTTPException (400 for a bad form, file type or too many fields, 413 past `max_bytes`
+    or for an oversized field); a partially written file is removed.
+    """
+    mime, options = parse_options_header(content_type)
+    if mime != b"multipart/form-data" or b"boundary" not in options:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected multipart/form-data")
+
+    receiver = _MultipartReceiver(destination_dir, allowed_extensions=allowed_extensions, max_bytes=max_bytes)
+    parser = MultipartParser(options[b"boundary"], receiver.callbacks())
+    output = None
+    try:
+        async for chunk in body:
+            parser.write(chunk)
+            if receiver.pending:
+                if output is None:
+                    destination_dir.mkdir(parents=True, exist_ok=True)
+                    output = await anyio.open_file(receiver.path, "wb")
+                await output.write(b"".join(receiver.pending))
+                receiver.pending.clear()
+        parser.finalize()
+        if receiver.path is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="File is required")
+        if output is None:
+            # An empty file part never produced data; still create the file so probing rejects it.
+            destination_dir.mkdir(parents=True, exist_ok=True)
+            receiver.path.touch()
+    except BaseException:
+        if output is not None:
+            await output.aclose()
+            output = None
+        if receiver.path is not None:
+            receiver.path.unlink(missing_ok=True)
+        raise
+    finally:
+        if output is not None:
+            await output.aclose()
+
+    return SavedUpload(
+        path=receiver.path,
+        filename=receiver.filename,
+        size_bytes=receiver.size_bytes,
+        sha256=receiver.digest.hexdigest(),
+        fields=receiver.fields,
+    )
+
+
+@dataclass(frozen=True)
+class UploadSession:
+    """A resumable upload in progress; bytes received so far live in `part_path`."""
+
+    path: Path
+    filename: str
+    size: int
+
+    @property
+    def part_path(self) -> Path:
+        return self.path.with_name(self.path.name + PART_SUFFIX)
+
+    @property
+    def record_path(self) -> Path:
+        return self.path.parent / SESSION_FILENAME
+
+    @property
+    def offset(self) -> int:
+        return self.part_path.stat().st_size if self.part_path.exists() else 0
+
+    def last_activity(self) -> float:
+        """Time of the last chunk written (or of creation), as a Unix timestamp."""
+        times = [path.stat().st_mtime for path in (self.record_path, self.part_path) if path.exists()]
+        return max(times, default=0.0)
+
+    def expired(self, ttl_seconds: float, now: float | None = None) -> bool:
+        return (time.time() if now is None else now) - self.last_activity() > ttl_seconds
+
+
+def _not_found() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found")
+
+
+@contextmanager
+def _locked(session: UploadSession) -> Iterator[None]:
+    """Hold the session's exclusive lock; a request finding it held gets a 409 instead of waiting.
+
+    Inside the lock the session is known to still exist, so its offset cannot move under the holder.
+    """
+    try:
+        handle = (session.path.parent / LOCK_FILENAME).open("a")
+    except FileNotFoundError:
+        raise _not_found() from None
+    with handle:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Another request is writing to this upload",
+            ) from None
+        try:
+            if not session.record_path.exists():
+                raise _not_found()
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def create_session(
+    destination_dir: Path,
+    filename: str,
+    size: int,
+    *,
+    allowed_extensions: set[str],
+    max_bytes: int,
+) -> UploadSession:
+    ext = upload_extension(filename, allowed_extensions)
+    if size > max_bytes:
+        raise too_large(max_bytes)
+    session = UploadSession(destination_dir / f"input.{ext}", filename, size)
+    destination_dir.mkdir(parents=True, exist_ok=True)
+    session.part_path.touch()
+    record = {"path": session.path.name, "filename": filename, "size": size}
+    (destination_dir / SESSION_FILENAME).write_text(json.dumps(record), encoding="utf-8")
+    return session
+
+
+def load_session(destination_dir: Path, *, ttl_seconds: float | None = None) -> UploadSession | None:
+    """The upload in progress in `destination_dir`; None if there is none or it has expired."""
+    record_path = destination_dir / SESSION_FILENAME
+    try:
+        record = json.loads(record_path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+    session = UploadSession(destination_dir / record["path"], record["filename"], record["size"])
+    if ttl_seconds is not None and session.expired(ttl_seconds):
+        return None
+    return session
+
+
+async def append_chunk(body: AsyncIterable[bytes], session: UploadSession, *, offset: int) -> int:
+    """Write a chunk that starts at `offset`; returns the new offset.
+
+    A chunk for the wrong offset is refused with 409 so the client can resume from the real one,
+    as is a chunk arriving while another request still writes to the upload. A chunk running
+    past the declared size is refused with 413 and rolled back. If the client drops mid-chunk,
+    whatever arrived is kept and the next chunk resumes after it.
+    """
+    with _locked(session):
+        current = session.offset
+        if offset != current:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Upload is at offset {current}, not {offset}",
+            )
+
+        written = offset
+        try:
+            async with await anyio.open_file(session.part_path, "r+b") as output:
+                await output.seek(offset)
+                async for chunk in body:
+                    if written + len(chunk) > session.size:
+                        raise HTTPException(
+                            status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+                            detail=f"Chunk runs past the declared upload size of {session.size} bytes",
+                        )
+                    await output.write(chunk)
+                    written += len(chunk)
+        except HTTPException:
+            os.truncate(session.part_path, offset)
+            raise
+    return written
+
+
+def complete_session(session: UploadSession) -> SavedUpload:
+    """Turn a fully received upload into the job's input file (a rename, not a copy)."""
+    with _locked(session):
+        received = session.offset
+        if received != session.size:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Upload is incomplete: {received} of {session.size} bytes received",
+            )
+
+        digest = hashlib.sha256()
+        with session.part_path.open("rb") as handle:
+            for chunk in iter(lambda: handle.read(_HASH_CHUNK_BYTES), b""):
+                digest.update(chunk)
+        session.part_path.replace(session.path)
+        session.record_path.unlink(missing_ok=True)
+        (session.path.parent / LOCK_FILENAME).unlink(missing_ok=True)
+    return SavedUpload(path=session.path, filename=session.filename, size_bytes=received, sha256=digest.hexdigest())
+
+
+def sweep_sessions(root: Path, *, ttl_seconds: float, now: float | None = None) -> list[Path]:
+    """Delete the directories of uploads under `root` idle for longer than `ttl_seconds`.
+
+    An upload directory only holds the session until it is completed, so the whole directory
+    goes. Uploads with a request in flight are left for the next sweep. Returns what was removed.
+    """
+    removed: list[Path] = []
+    for record_path in root.glob(f"*/{SESSION_FILENAME}"):
+        session = load_session(record_path.parent)
+        if session is None or not session.expired(ttl_seconds, now):
+            continue
+        try:
+            with _locked(session):
+                shutil.rmtree(record_path.parent)
+        except HTTPException:
+            continue
+        removed.append(record_path.parent)
+    return removed
+
+
+def probe_duration(path: Path) -> float:
+    """Duration in seconds read from the container header.
+
+    libsndfile covers WAV/FLAC/OGG/MP3; other containers (m4a) go through ffprobe when it is
+    installed. Raises ValueError when neither can read the file.
+    """
+    import soundfile as sf
+
+    try:
+        info = sf.info(str(path))
+        if info.samplerate > 0 and info.frames > 0:
+            return info.frames / info.samplerate
+    except Exception:
+        pass
+
+    ffprobe = shutil.which("ffprobe")
+    if ffprobe is not None:
+        try:
+            result = subprocess.run(
+                [ffprobe, "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", str(path)],
+                capture_output=True,
+                text=True,
+                timeout=FFPROBE_TIMEOUT_SECONDS,
+                check=True,
+            )
+            duration = float(result.stdout.strip())
+        except (subprocess.SubprocessError, ValueError):
+            duration = 0.0
+        if duration > 0:
+            return duration
+
+    raise ValueError(f"Could not decode audio file {path.name!r}")
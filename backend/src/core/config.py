@@ -11,10 +11,30 @@ class Settings(BaseSettings):
 
     file_bucket_path: Path = Field(default=Path("/data"))
     celery_broker_url: str = Field(default="redis://redis:6379/0")
+    job_store_url: str | None = None
+    job_status_ttl_seconds: int = Field(default=7 * 24 * 3600)
     demucs_model: str = Field(default="htdemucs")
+    demucs_backend: str = Field(default="inprocess")
+    demucs_stem_mode: str = Field(default="bass")
+    demucs_chunk_seconds: float | None = Field(default=60.0)
+    demucs_stall_timeout_seconds: float | None = Field(default=300.0)
+    pipeline_mode: str = Field(default="chain")
     api_port: int = Field(default=8000)
     log_level: str = Field(default="info")
     demucs_cache_subdir: Path | None = None
+    stem_cache_max_bytes: int = Field(default=5 * 1024**3)
+    basic_pitch_intra_op_threads: int = Field(default=0)
+    basic_pitch_inter_op_threads: int = Field(default=0)
+    basic_pitch_graph_optimization: str = Field(default="all")
+    basic_pitch_execution_mode: str = Field(default="sequential")
+    basic_pitch_batch_jobs: int = Field(default=1)
+    basic_pitch_batch_wait_ms: float = Field(default=50.0)
+    musicxml_writer: str = Field(default="musicxml")
+    max_audio_seconds: float = Field(default=20 * 60)
+    upload_session_ttl_seconds: int = Field(default=24 * 3600)
+    maintenance_interval_seconds: float = Field(default=60.0)
+    job_heartbeat_seconds: float = Field(default=30.0)
+    job_stall_timeout_seconds: float = Field(default=300.0)
 
     @property
     def demucs_cache_dir(self) -> Path:
@@ -23,6 +43,11 @@ class Settings(BaseSettings):
             return self.file_bucket_path / self.demucs_cache_subdir
         return self.file_bucket_path / "cache" / "demucs"
 
+    @property
+    def stem_cache_dir(self) -> Path:
+        """Directory holding content-addressed separated stems."""
+        return self.file_bucket_path / "cache" / "stems"
+
 
 settings = Settings()
 
@@ -0,0 +1,431 @@
+"""Job status store: one Redis hash per job, written field by field.
+
+The API and the worker share this store instead of rewriting `metadata.json`. Every write is a
+single atomic transaction that sets only the given fields, bumps the job's `version` and renews
+its TTL, so concurrent writers never lose each other's changes. `metadata.json` is only written
+as a snapshot once a job finishes and is read back when the hash has expired.
+
+Each write is also published on the job's events channel (Redis pub/sub), which the API relays
+to clients as Server-Sent Events.
+
+A worker running a job holds a lease on it, renewed by heartbeats. A worker killed mid-stage
+(OOM, SIGKILL) stops renewing it, and `fail_stalled_jobs` marks the job failed once it lapses.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Mapping, Protocol
+
+from src.api.schemas import PRIVATE_METADATA_FIELDS, JobMetadata, JobStatus, JobStatusResponse, StageCheckpoint
+from src.core.config import settings
+from src.core.jobs import METADATA_FILENAME, job_dir
+
+KEY_PREFIX = "stem2tab:job:"
+# Sorted set of running jobs scored by the Unix time their lease runs out.
+LEASES_KEY = "stem2tab:jobs:leases"
+STALLED_ERROR = "Worker stopped responding"
+VERSION_FIELD = "version"
+STATUS_FIELDS = ("status", "progress", "created_at", "updated_at", "files", "error")
+_STAGE_PREFIX = "stage:"
+
+
+def _encode(field: str, value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, JobStatus):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if field == "files":
+        return json.dumps(list(value))
+    return str(value)
+
+
+def _event_value(value: Any) -> Any:
+    if isinstance(value, JobStatus):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def events_channel(job_id: str) -> str:
+    return f"{KEY_PREFIX}{job_id}:events"
+
+
+class JobEvents(Protocol):
+    """Subscription to one job's events; each event is `{"event", "version", "data"}`."""
+
+    async def get(self, timeout: float) -> dict[str, Any] | None:
+        """Next event, or None if none arrived within `timeout` seconds."""
+        ...
+
+
+def _pending_defaults() -> dict[str, str]:
+    # Fields a write fills in when the hash does not exist yet, so every stored record decodes.
+    now = _encode("updated_at", datetime.now(timezone.utc))
+    return {"status": JobStatus.PENDING.value, "progress": "0", "created_at": now, "updated_at": now, "files": "[]"}
+
+
+def _decode(job_id: str, fields: Mapping[str, str]) -> JobMetadata:
+    return JobMetadata(
+        job_id=job_id,
+        status=JobStatus(fields["status"]),
+        progress=int(fields["progress"]),
+        created_at=datetime.fromisoformat(fields["created_at"]),
+        updated_at=datetime.fromisoformat(fields["updated_at"]),
+        files=json.loads(fields.get("files") or "[]"),
+        error=fields.get("error") or None,
+        version=int(fields.get(VERSION_FIELD) or 0),
+        stages={
+            name[len(_STAGE_PREFIX) :]: StageCheckpoint.model_validate_json(value)
+            for name, value in fields.items()
+            if name.startswith(_STAGE_PREFIX)
+        },
+    )
+
+
+class JobStore(ABC):
+    """Encoding and the public operations; subclasses provide the hash primitives."""
+
+    def __init__(self, *, ttl_seconds: int) -> None:
+        self.ttl_seconds = ttl_seconds
+
+    @abstractmethod
+    def _commit(self, job_id: str, fields: Mapping[str, str], defaults: Mapping[str, str]) -> int:
+        """Atomically set `defaults` where absent and `fields`, bump the version and renew the TTL."""
+
+    @abstractmethod
+    def _publish(self, job_id: str, message: str) -> None: ...
+
+    @abstractmethod
+    def subscribe(self, job_id: str) -> AsyncIterator[JobEvents]:
+        """Async context manager yielding a subscription to the job's events."""
+
+    def _write(
+        self,
+        job_id: str,
+        fields: Mapping[str, str],
+        defaults: Mapping[str, str],
+        event: str,
+        data: Mapping[str, Any],
+    ) -> int:
+        version = self._commit(job_id, fields, defaults)
+        self._publish(job_id, json.dumps({"event": event, "version": version, "data": data}))
+        return version
+
+    @abstractmethod
+    def _read(self, job_id: str) -> dict[str, str]: ...
+
+    @abstractmethod
+    def _read_field(self, job_id: str, field: str) -> str | None: ...
+
+    @abstractmethod
+    def _delete_fields(self, job_id: str, fields: list[str]) -> None: ...
+
+    @abstractmethod
+    def _set_lease(self, job_id: str, deadline: float) -> None: ...
+
+    @abstractmethod
+    def _remove_lease(self, job_id: str) -> bool:
+        """Drop the job's lease; True only for the caller that actually removed it."""
+
+    @abstractmethod
+    def _lapsed_leases(self, now: float) -> list[str]: ...
+
+    def create(self, metadata: JobStatusResponse) -> int:
+        """Store a whole record, e.g. a new job or one restored from its snapshot.
+
+        A restored record continues from the version it was snapshotted at, so versions (and the
+        ETags built from them) never repeat for a different state of the same job.
+        """
+        fields = {name: _encode(name, getattr(metadata, name)) for name in STATUS_FIELDS}
+        if isinstance(metadata, JobMetadata):
+            stages = metadata.stages
+            fields[VERSION_FIELD] = str(metadata.version)
+        else:
+            stages = {}
+        fields.update({f"{_STAGE_PREFIX}{stage}": checkpoint.model_dump_json() for stage, checkpoint in stages.items()})
+        data = metadata.model_dump(mode="json", exclude=PRIVATE_METADATA_FIELDS)
+        return self._write(metadata.job_id, fields, {}, "progress", data)
+
+    def get(self, job_id: str) -> JobMetadata | None:
+        found = self.get_versioned(job_id)
+        return found[0] if found is not None else None
+
+    def get_versioned(self, job_id: str) -> tuple[JobMetadata, int] | None:
+        """The job and the version it was read at, from a single read."""
+        fields = self._read(job_id)
+        if "status" not in fields:
+            return None
+        return _decode(job_id, fields), int(fields[VERSION_FIELD])
+
+    def version(self, job_id: str) -> int | None:
+        """Current version without decoding the job; cheap enough to check on every poll."""
+        value = self._read_field(job_id, VERSION_FIELD)
+        return int(value) if value is not None else None
+
+    def update(self, job_id: str, **changes: Any) -> int:
+        """Set only the given status fields (None clears `error`); returns the new version.
+
+        `updated_at` is always refreshed. A job the store has not seen yet is created as PENDING.
+        The changed fields are published as a `progress` event.
+        """
+        unknown = set(changes) - set(STATUS_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown job status fields: {', '.join(sorted(unknown))}")
+        fields = {name: _encode(name, value) for name, value in changes.items()}
+        defaults = _pending_defaults()
+        fields.setdefault("updated_at", defaults["updated_at"])
+        data = {name: _event_value(value) for name, value in changes.items()}
+        data.setdefault("updated_at", fields["updated_at"])
+        return self._write(job_id, fields, defaults, "progress", data)
+
+    def set_stage(self, job_id: str, stage: str, checkpoint: StageCheckpoint) -> int:
+        """Record a completed stage; published as a `stage` event."""
+        data = {"stage": stage, "completed_at": checkpoint.completed_at.isoformat()}
+        fields = {f"{_STAGE_PREFIX}{stage}": checkpoint.model_dump_json()}
+        return self._write(job_id, fields, _pending_defaults(), "stage", data)
+
+    def drop_stages(self, job_id: str, *stages: str) -> None:
+        self._delete_fields(job_id, [f"{_STAGE_PREFIX}{stage}" for stage in stages])
+
+    def heartbeat(self, job_id: str, *, timeout_seconds: float) -> None:
+        """Extend the running job's lease by `timeout_seconds`; not a status write, so no new version."""
+        self._set_lease(job_id, time.time() + timeout_seconds)
+
+    def release(self, job_id: str) -> None:
+        """Drop the lease once the task stops running the job, whatever its outcome."""
+        self._remove_lease(job_id)
+
+    def claim_stalled(self, now: float | None = None) -> list[str]:
+        """Jobs whose lease ran out; each is handed to only one caller across processes."""
+        lapsed = self._lapsed_leases(time.time() if now is None else now)
+        return [job_id for job_id in lapsed if self._remove_lease(job_id)]
+
+
+class RedisJobStore(JobStore):
+    def __init__(self, url: str, *, ttl_seconds: int) -> None:
+        super().__init__(ttl_seconds=ttl_seconds)
+        import redis
+
+        self.url = url
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self._async_client = None
+
+    def _commit(self, job_id: str, fields: Mapping[str, str], defaults: Mapping[str, str]) -> int:
+        key = KEY_PREFIX + job_id
+        with self.client.pipeline(transaction=True) as pipe:
+            for name, value in defaults.items():
+                pipe.hsetnx(key, name, value)
+            if fields:
+                pipe.hset(key, mapping=dict(fields))
+            pipe.hincrby(key, VERSION_FIELD, 1)
+            pipe.expire(key, self.ttl_seconds)
+            return int(pipe.execute()[-2])
+
+    def _read(self, job_id: str) -> dict[str, str]:
+        return self.client.hgetall(KEY_PREFIX + job_id)
+
+    def _read_field(self, job_id: str, field: str) -> str | None:
+        return self.client.hget(KEY_PREFIX + job_id, field)
+
+    def _delete_fields(self, job_id: str, fields: list[str]) -> None:
+        if fields:
+            self.client.hdel(KEY_PREFIX + job_id, *fields)
+
+    def _publish(self, job_id: str, message: str) -> None:
+        self.client.publish(events_channel(job_id), message)
+
+    def _set_lease(self, job_id: str, deadline: float) -> None:
+        self.client.zadd(LEASES_KEY, {job_id: deadline})
+
+    def _remove_lease(self, job_id: str) -> bool:
+        return bool(self.client.zrem(LEASES_KEY, job_id))
+
+    def _lapsed_leases(self, now: float) -> list[str]:
+        return self.client.zrangebyscore(LEASES_KEY, "-inf", now)
+
+    @asynccontextmanager
+    async def subscribe(self, job_id: str) -> AsyncIterator[JobEvents]:
+        if self._async_client is None:
+            import redis.asyncio
+
+            self._async_client = redis.asyncio.Redis.from_url(self.url, decode_responses=True)
+        pubsub = self._async_client.pubsub()
+        await pubsub.subscribe(events_channel(job_id))
+        try:
+            yield _RedisJobEvents(pubsub)
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
+
+
+class _RedisJobEvents:
+    def __init__(self, pubsub: Any) -> None:
+        self._pubsub = pubsub
+
+    async def get(self, timeout: float) -> dict[str, Any] | None:
+        message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        return json.loads(message["data"]) if message is not None else None
+
+
+class MemoryJobStore(JobStore):
+    """Process-local store for tests and single-process development (`memory://`)."""
+
+    def __init__(self, *, ttl_seconds: int) -> None:
+        super().__init__(ttl_seconds=ttl_seconds)
+        self._hashes: dict[str, tuple[float, dict[str, str]]] = {}
+        self._subscribers: dict[str, list[tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._leases: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, job_id: str) -> dict[str, str]:
+        expires_at, fields = self._hashes.get(job_id, (0.0, {}))
+        return fields if expires_at > time.monotonic() else {}
+
+    def _commit(self, job_id: str, fields: Mapping[str, str], defaults: Mapping[str, str]) -> int:
+        with self._lock:
+            current = dict(self._live(job_id))
+            for name, value in defaults.items():
+                current.setdefault(name, value)
+            current.update(fields)
+            version = int(current.get(VERSION_FIELD, "0")) + 1
+            current[VERSION_FIELD] = str(version)
+            self._hashes[job_id] = (time.monotonic() + self.ttl_seconds, current)
+            return version
+
+    def _read(self, job_id: str) -> dict[str, str]:
+        with self._lock:
+            return dict(self._live(job_id))
+
+    def _read_field(self, job_id: str, field: str) -> str | None:
+        with self._lock:
+            return self._live(job_id).get(field)
+
+    def _delete_fields(self, job_id: str, fields: list[str]) -> None:
+        with self._lock:
+            live = self._live(job_id)
+            for name in fields:
+                live.pop(name, None)
+
+    def _set_lease(self, job_id: str, deadline: float) -> None:
+        with self._lock:
+            self._leases[job_id] = deadline
+
+    def _remove_lease(self, job_id: str) -> bool:
+        with self._lock:
+            return self._leases.pop(job_id, None) is not None
+
+    def _lapsed_leases(self, now: float) -> list[str]:
+        with self._lock:
+            return [job_id for job_id, deadline in self._leases.items() if deadline <= now]
+
+    def _publish(self, job_id: str, message: str) -> None:
+        # Writers may run on other threads (the eager worker, the API's threadpool).
+        with self._lock:
+            subscribers = list(self._subscribers.get(job_id, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, json.loads(message))
+
+    @asynccontextmanager
+    async def subscribe(self, job_id: str) -> AsyncIterator[JobEvents]:
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._subscribers.setdefault(job_id, []).append(subscriber)
+        try:
+            yield _MemoryJobEvents(subscriber[1])
+        finally:
+            with self._lock:
+                self._subscribers[job_id].remove(subscriber)
+                if not self._subscribers[job_id]:
+                    del self._subscribers[job_id]
+
+
+class _MemoryJobEvents:
+    def __init__(self, queue: asyncio.Queue) -> None:
+        self._queue = queue
+
+    async def get(self, timeout: float) -> dict[str, Any] | None:
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+_STORES: dict[str, JobStore] = {}
+
+
+def get_job_store() -> JobStore:
+    """Process-wide store for `JOB_STORE_URL` (the broker's Redis by default).
+
+    `memory://` selects an in-process store for tests and single-process development.
+    """
+    url = settings.job_store_url or settings.celery_broker_url
+    store = _STORES.get(url)
+    if store is None:
+        ttl_seconds = settings.job_status_ttl_seconds
+        if url.startswith("memory://"):
+            store = MemoryJobStore(ttl_seconds=ttl_seconds)
+        else:
+            store = RedisJobStore(url, ttl_seconds=ttl_seconds)
+        _STORES[url] = store
+    return store
+
+
+def snapshot_path(job_id: str) -> Path:
+    return job_dir(job_id) / METADATA_FILENAME
+
+
+def read_snapshot(job_id: str) -> JobMetadata | None:
+    path = snapshot_path(job_id)
+    if not path.exists():
+        return None
+    return JobMetadata.model_validate_json(path.read_text(encoding="utf-8"))
+
+
+def write_snapshot(metadata: JobStatusResponse) -> None:
+    path = snapshot_path(metadata.job_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(metadata.model_dump_json(), encoding="utf-8")
+
+
+def load_job(job_id: str) -> JobMetadata | None:
+    """Live status from the store, else the snapshot of a finished job whose hash has expired."""
+    return get_job_store().get(job_id) or read_snapshot(job_id)
+
+
+def restore_job(job_id: str) -> JobMetadata | None:
+    """Like `load_job`, but copies a snapshot back into the store so a re-run can update it."""
+    store = get_job_store()
+    metadata = store.get(job_id)
+    if metadata is None:
+        metadata = read_snapshot(job_id)
+        if metadata is not None:
+            store.create(metadata)
+    return metadata
+
+
+def fail_stalled_jobs(now: float | None = None) -> list[str]:
+    """Mark jobs whose worker stopped heartbeating as FAILURE; returns their ids.
+
+    Cheap enough for a periodic sweep: only jobs with a lapsed lease are read.
+    """
+    store = get_job_store()
+    failed = []
+    for job_id in store.claim_stalled(now):
+        metadata = store.get(job_id)
+        if metadata is None or metadata.status in (JobStatus.SUCCESS, JobStatus.FAILURE, JobStatus.REVOKED):
+            continue
+        store.update(job_id, status=JobStatus.FAILURE, error=STALLED_ERROR)
+        write_snapshot(store.get(job_id))
+        failed.append(job_id)
+    return failed
@@ -0,0 +1,32 @@
+"""Job directory layout shared by the API and the worker.
+
+Only the standard library and settings are imported here, so the API can use it without
+loading the worker's pipeline modules.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+from src.core.config import settings
+
+METADATA_FILENAME = "metadata.json"
+
+
+def job_dir(job_id: str) -> Path:
+    return settings.file_bucket_path / job_id
+
+
+def list_job_files(job_id: str) -> list[str]:
+    """Artifact names in the job directory, excluding the metadata snapshot and subdirectories."""
+    directory = job_dir(job_id)
+    if not directory.exists():
+        return []
+
+    files: list[str] = []
+    for path in directory.iterdir():
+        if path.name == METADATA_FILENAME or path.is_dir():
+            continue
+        files.append(path.name)
+    files.sort()
+    return files
@@ -10,8 +10,10 @@ from typing import Protocol
 
 from src.evaluation.io import read_midi
 from src.evaluation.models import NoteEventSet, SourceValue
+from src.pipelines.decode import PCM_DIRNAME, decode_audio
 from src.pipelines.separation import separate_stems
-from src.pipelines.transcription import transcribe_midi
+from src.pipelines.stem_cache import StemCache
+from src.pipelines.transcription import get_transcriber, transcribe_midi
 
 
 @dataclass(frozen=True)
@@ -20,6 +22,8 @@ class AdapterConfig:
 
     demucs_model: str
     demucs_cache_dir: Path
+    stem_cache_dir: Path | None = None
+    stem_cache_max_bytes: int = 0
 
 
 @dataclass(frozen=True)
@@ -73,7 +77,10 @@ class TranscriberAdapter(Protocol):
 
 
 class DirectSeparator:
-    """Pass input audio through without copying or processing it."""
+    """Pass input audio through unseparated, decoded once into Basic Pitch PCM.
+
+    Every transcriber then memory-maps the same buffer instead of decoding the file again.
+    """
 
     name = "direct"
 
@@ -88,14 +95,15 @@ class DirectSeparator:
         output_dir.mkdir(parents=True, exist_ok=True)
         if not audio_path.is_file():
             raise FileNotFoundError(f"Input audio not found: {audio_path}")
+        decoded = decode_audio(audio_path, output_dir / PCM_DIRNAME, model_rate=False, job_id="benchmark")
         return SeparationResult(
-            audio_path=audio_path,
+            audio_path=decoded.basic_pitch_path,
             metadata={"backend": "direct"},
         )
 
 
 class DemucsSeparator:
-    """Wrap the existing Demucs pipeline and select its bass stem."""
+    """Wrap the existing Demucs pipeline, fed with model-rate PCM, and select its bass stem."""
 
     name = "demucs"
 
@@ -107,12 +115,19 @@ class DemucsSeparator:
         config: AdapterConfig,
     ) -> SeparationResult:
         config.demucs_cache_dir.mkdir(parents=True, exist_ok=True)
+        cache = (
+            StemCache(config.stem_cache_dir, max_bytes=config.stem_cache_max_bytes)
+            if config.stem_cache_dir is not None and config.stem_cache_max_bytes > 0
+            else None
+        )
+        decoded = decode_audio(audio_path, output_dir / PCM_DIRNAME, basic_pitch=False, job_id="benchmark")
         stems = separate_stems(
-            input_audio=audio_path,
+            input_audio=decoded.model_path,
             output_dir=output_dir,
             model_name=config.demucs_model,
             cache_dir=config.demucs_cache_dir,
             job_id="benchmark",
+            cache=cache,
         )
         bass_path = stems.get("bass")
         if bass_path is None:
@@ -124,6 +139,7 @@ class DemucsSeparator:
                 "backend": "demucs",
                 "model": config.demucs_model,
                 "cache_dir": str(config.demucs_cache_dir),
+                "stem_cache_dir": str(config.stem_cache_dir) if cache is not None else None,
             },
         )
 
@@ -142,7 +158,8 @@ class BasicPitchTranscriber:
     ) -> TranscriptionResult:
         del config
         output_dir.mkdir(parents=True, exist_ok=True)
-        generated_path = transcribe_midi(audio_path, output_dir, job_id="benchmark")
+        engine = get_transcriber()
+        generated_path = transcribe_midi(audio_path, output_dir, job_id="benchmark", engine=engine)
         raw_midi_path = output_dir / "raw.mid"
         if generated_path.resolve() != raw_midi_path.resolve():
             shutil.move(str(generated_path), raw_midi_path)
@@ -161,6 +178,7 @@ class BasicPitchTranscriber:
                 "model": "ICASSP_2022",
                 "serialization": "onnx",
                 "package_version": _package_version("basic-pitch"),
+                **{f"ort_{name}": value for name, value in engine.options.as_metadata().items()},
             },
         )
 
@@ -93,6 +93,17 @@ def build_parser() -> argparse.ArgumentParser:
         type=Path,
         help="Demucs model cache (default: .cache/demucs under the current directory)",
     )
+    parser.add_argument(
+        "--stem-cache-dir",
+        type=Path,
+        help="Separated stem cache shared with the worker (default: .cache/stems under the current directory)",
+    )
+    parser.add_argument(
+        "--stem-cache-max-bytes",
+        type=int,
+        default=settings.stem_cache_max_bytes,
+        help="Stem cache size cap; 0 disables the cache",
+    )
     return parser
 
 
@@ -134,9 +145,12 @@ def run_benchmark(args: argparse.Namespace) -> tuple[Path, list[RunRecord], str]
         frame_hop_ms=args.frame_hop_ms,
     )
     demucs_cache_dir = args.demucs_cache_dir or Path.cwd() / ".cache" / "demucs"
+    stem_cache_dir = args.stem_cache_dir or Path.cwd() / ".cache" / "stems"
     adapter_config = AdapterConfig(
         demucs_model=args.demucs_model,
         demucs_cache_dir=demucs_cache_dir.resolve(),
+        stem_cache_dir=stem_cache_dir.resolve(),
+        stem_cache_max_bytes=args.stem_cache_max_bytes,
     )
     output_dir = _prepare_output_dir(args.output_dir, audio_path=audio_path)
     started_at = _utc_now()
@@ -469,6 +483,7 @@ def _write_manifest(
         "adapter_config": {
             "demucs_model": adapter_config.demucs_model,
             "demucs_cache_dir": str(adapter_config.demucs_cache_dir),
+            "stem_cache_dir": str(adapter_config.stem_cache_dir) if adapter_config.stem_cache_dir else None,
         },
         "separators": separator_details,
         "runs": [
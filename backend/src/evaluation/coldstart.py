@@ -0,0 +1,424 @@
+"""Cold-start benchmark for the API, the Celery worker and the benchmark CLI.
+
+Every measurement runs in a fresh interpreter, as an autoscaled process starts. Results are
+written as JSON and compared with a stored baseline so a change that slows startup fails.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Sequence
+
+from pydantic import BaseModel, ConfigDict
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+DEFAULT_BASELINE = BACKEND_DIR / "benchmarks" / "coldstart.json"
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.3
+# Differences below this are scheduler noise, whatever the relative change.
+DEFAULT_MIN_DELTA_SECONDS = 0.15
+DEFAULT_WORKER_QUEUES = ("render",)
+IMPORT_BREAKDOWN_SIZE = 15
+
+_API_PROBE = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+from src.api.main import app
+imported = time.perf_counter()
+
+
+async def first_request():
+    # Drive the app the way an ASGI server does: lifespan startup, then GET /health.
+    lifespan = asyncio.Queue()
+    await lifespan.put({"type": "lifespan.startup"})
+    ready = asyncio.Event()
+
+    async def lifespan_send(message):
+        if message["type"].startswith("lifespan.startup"):
+            ready.set()
+
+    lifespan_scope = {"type": "lifespan", "asgi": {"version": "3.0"}}
+    task = asyncio.ensure_future(app(lifespan_scope, lifespan.get, lifespan_send))
+    await ready.wait()
+
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/health", "raw_path": b"/health", "root_path": "",
+        "query_string": b"", "headers": [(b"host", b"localhost")],
+        "client": ("127.0.0.1", 0), "server": ("localhost", 80),
+    }
+    await app(scope, receive, send)
+    await lifespan.put({"type": "lifespan.shutdown"})
+    await task
+    return messages[0]["status"]
+
+
+status = asyncio.run(first_request())
+answered = time.perf_counter()
+if status != 200:
+    sys.exit(f"GET /health returned {status}")
+print(json.dumps({
+    "metrics": {"import_seconds": imported - started, "first_request_seconds": answered - started},
+    "module_count": len(sys.modules),
+}))
+"""
+
+_WORKER_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+from src.worker import tasks
+from src.worker.app import celery_app
+celery_app.finalize()
+imported = time.perf_counter()
+# The same warm-up a pool process runs on start, for the queues it would consume. Older trees
+# (e.g. a baseline commit) have no warm-up hook; their workers are ready once imported.
+celery_app.amqp.queues.select(sys.argv[1:])
+warm_up = getattr(tasks, "_warm_up_worker_process", None)
+if warm_up is not None:
+    warm_up()
+ready = time.perf_counter()
+print(json.dumps({
+    "metrics": {"import_seconds": imported - started, "ready_seconds": ready - started},
+    "module_count": len(sys.modules),
+}))
+"""
+
+_BENCHMARK_CLI_PROBE = """
+import contextlib, io, json, sys, time
+started = time.perf_counter()
+from src.evaluation.benchmark import build_parser
+imported = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    try:
+        build_parser().parse_args(["--help"])
+    except SystemExit:
+        pass
+parsed = time.perf_counter()
+print(json.dumps({
+    "metrics": {"import_seconds": imported - started, "startup_seconds": parsed - started},
+    "module_count": len(sys.modules),
+}))
+"""
+
+TARGETS = ("api", "worker", "benchmark_cli")
+
+
+class ColdStartConfigurationError(ValueError):
+    """An invalid target, baseline or threshold detected before measuring."""
+
+
+class TargetResult(BaseModel):
+    """Fastest timings of one target plus the per-package import breakdown of one run."""
+
+    model_config = ConfigDict(frozen=True, allow_inf_nan=False)
+
+    metrics: dict[str, float]
+    module_count: int
+    import_breakdown: dict[str, float]
+
+
+class ColdStartReport(BaseModel):
+    """One benchmark run; the same shape is stored as the baseline."""
+
+    model_config = ConfigDict(frozen=True)
+
+    schema_version: str = "1.0"
+    recorded_at: str
+    repeat: int
+    environment: dict[str, str]
+    targets: dict[str, TargetResult]
+
+
+class Regression(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    target: str
+    metric: str
+    baseline: float
+    current: float
+
+    @property
+    def ratio(self) -> float:
+        return self.current / self.baseline if self.baseline > 0 else float("inf")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Measure cold start of the API, worker and benchmark CLI and compare with a baseline.",
+    )
+    parser.add_argument(
+        "--targets",
+        default=",".join(TARGETS),
+        help=f"Comma-separated targets (default: {','.join(TARGETS)})",
+    )
+    parser.add_argument("--repeat", type=_positive_int, default=DEFAULT_REPEAT, help="Fresh processes per target")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="Baseline JSON to compare with")
+    parser.add_argument("--output", type=Path, help="Also write this run's results to a JSON file")
+    parser.add_argument(
+        "--threshold",
+        type=_positive_float,
+        default=DEFAULT_THRESHOLD,
+        help="Allowed slowdown as a fraction of the baseline (default: 0.3)",
+    )
+    parser.add_argument(
+        "--min-delta-seconds",
+        type=_positive_float,
+        default=DEFAULT_MIN_DELTA_SECONDS,
+        help="Slowdowns smaller than this never count as regressions (default: 0.15)",
+    )
+    parser.add_argument(
+        "--worker-queues",
+        default=",".join(DEFAULT_WORKER_QUEUES),
+        help="Queues whose models the worker warms up (default: render, which loads no model)",
+    )
+    parser.add_argument(
+        "--source-dir",
+        type=Path,
+        default=BACKEND_DIR,
+        help="Backend tree to measure, e.g. a worktree of the base commit (default: this checkout)",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Write the results as the new baseline instead of comparing",
+    )
+    return parser
+
+
+def parse_importtime(stderr: str, *, limit: int = IMPORT_BREAKDOWN_SIZE) -> dict[str, float]:
+    """Seconds spent importing each top-level package, from `python -X importtime` output.
+
+    Self times are summed per package, so `fastapi` includes `fastapi.routing` but not the
+    pydantic modules it pulls in. The slowest `limit` packages are returned, slowest first.
+    """
+    totals: dict[str, float] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, _, name = line[len("import time:") :].split("|", 2)
+        if not self_us.strip().isdigit():
+            continue
+        package = name.strip().split(".", 1)[0]
+        totals[package] = totals.get(package, 0.0) + int(self_us) / 1_000_000
+    slowest = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:limit]
+    return {package: round(seconds, 4) for package, seconds in slowest}
+
+
+def measure_target(
+    target: str,
+    *,
+    repeat: int,
+    worker_queues: Sequence[str] = DEFAULT_WORKER_QUEUES,
+    source_dir: Path = BACKEND_DIR,
+) -> TargetResult:
+    """Run the target's probe `repeat` times plus once under `-X importtime`.
+
+    The fastest run is kept: slower ones measure a busy machine, not the code. Probes import
+    the `src` package of `source_dir`.
+    """
+    probe = _probe(target)
+    probe_args = list(worker_queues) if target == "worker" else []
+    runs = [_run_probe(probe, probe_args, source_dir=source_dir) for _ in range(repeat)]
+    _, importtime = _run_probe_with_output(
+        probe, probe_args, source_dir=source_dir, python_options=("-X", "importtime")
+    )
+    metrics = {
+        name: round(min(run["metrics"][name] for run in runs), 4) for name in runs[0]["metrics"]
+    }
+    return TargetResult(
+        metrics=metrics,
+        module_count=runs[-1]["module_count"],
+        import_breakdown=parse_importtime(importtime),
+    )
+
+
+def run_coldstart(
+    targets: Sequence[str],
+    *,
+    repeat: int,
+    worker_queues: Sequence[str] = DEFAULT_WORKER_QUEUES,
+    source_dir: Path = BACKEND_DIR,
+) -> ColdStartReport:
+    return ColdStartReport(
+        recorded_at=_utc_now(),
+        repeat=repeat,
+        environment={
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "worker_queues": ",".join(worker_queues),
+        },
+        targets={
+            target: measure_target(target, repeat=repeat, worker_queues=worker_queues, source_dir=source_dir)
+            for target in targets
+        },
+    )
+
+
+def find_regressions(
+    report: ColdStartReport,
+    baseline: ColdStartReport,
+    *,
+    threshold: float = DEFAULT_THRESHOLD,
+    min_delta_seconds: float = DEFAULT_MIN_DELTA_SECONDS,
+) -> list[Regression]:
+    """Metrics slower than the baseline by more than `threshold` and `min_delta_seconds`."""
+    regressions = []
+    for target, result in report.targets.items():
+        expected = baseline.targets.get(target)
+        if expected is None:
+            continue
+        for metric, current in result.metrics.items():
+            previous = expected.metrics.get(metric)
+            if previous is None:
+                continue
+            if current > previous * (1.0 + threshold) and current - previous > min_delta_seconds:
+                regressions.append(Regression(target=target, metric=metric, baseline=previous, current=current))
+    return regressions
+
+
+def render_summary(report: ColdStartReport, baseline: ColdStartReport | None) -> str:
+    lines = ["| target | metric | seconds | baseline | change |", "|:---|:---|---:|---:|---:|"]
+    for target, result in report.targets.items():
+        expected = baseline.targets.get(target) if baseline is not None else None
+        for metric, current in result.metrics.items():
+            previous = expected.metrics.get(metric) if expected is not None else None
+            if previous is None:
+                lines.append(f"| {target} | {metric} | {current:.3f} | - | - |")
+            else:
+                change = (current - previous) / previous if previous > 0 else 0.0
+                lines.append(f"| {target} | {metric} | {current:.3f} | {previous:.3f} | {change:+.0%} |")
+    return "\n".join(lines) + "\n"
+
+
+def read_report(path: Path) -> ColdStartReport:
+    return ColdStartReport.model_validate_json(path.read_text(encoding="utf-8"))
+
+
+def write_report(report: ColdStartReport, path: Path) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report.model_dump(mode="json"), indent=2) + "\n", encoding="utf-8")
+    return path
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Run the CLI and return a process exit code."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        targets = _parse_targets(args.targets)
+        baseline = None
+        if not args.update_baseline:
+            if not args.baseline.is_file():
+                raise ColdStartConfigurationError(
+                    f"Baseline file not found: {args.baseline}; record one with --update-baseline"
+                )
+            baseline = read_report(args.baseline)
+        worker_queues = [name.strip() for name in args.worker_queues.split(",") if name.strip()]
+        if not (args.source_dir / "src").is_dir():
+            raise ColdStartConfigurationError(f"No backend sources under {args.source_dir}")
+        report = run_coldstart(targets, repeat=args.repeat, worker_queues=worker_queues, source_dir=args.source_dir)
+    except ColdStartConfigurationError as exc:
+        print(f"coldstart: error: {exc}", file=sys.stderr)
+        return 2
+
+    print(render_summary(report, baseline), end="")
+    if args.output is not None:
+        write_report(report, args.output)
+    if args.update_baseline:
+        print(f"Baseline: {write_report(report, args.baseline)}")
+        return 0
+
+    regressions = find_regressions(
+        report,
+        baseline,
+        threshold=args.threshold,
+        min_delta_seconds=args.min_delta_seconds,
+    )
+    for regression in regressions:
+        print(
+            f"coldstart: regression: {regression.target}.{regression.metric} "
+            f"{regression.current:.3f}s vs baseline {regression.baseline:.3f}s ({regression.ratio:.2f}x)",
+            file=sys.stderr,
+        )
+    return 1 if regressions else 0
+
+
+def _probe(target: str) -> str:
+    if target == "api":
+        return _API_PROBE
+    if target == "worker":
+        return _WORKER_PROBE
+    if target == "benchmark_cli":
+        return _BENCHMARK_CLI_PROBE
+    raise ColdStartConfigurationError(f"Unknown cold-start target {target!r}; available: {', '.join(TARGETS)}")
+
+
+def _run_probe(probe: str, args: Sequence[str], *, source_dir: Path = BACKEND_DIR) -> dict:
+    stdout, _ = _run_probe_with_output(probe, args, source_dir=source_dir)
+    return json.loads(stdout.strip().splitlines()[-1])
+
+
+def _run_probe_with_output(
+    probe: str,
+    args: Sequence[str],
+    *,
+    source_dir: Path = BACKEND_DIR,
+    python_options: Sequence[str] = (),
+) -> tuple[str, str]:
+    result = subprocess.run(
+        [sys.executable, *python_options, "-c", probe, *args],
+        cwd=source_dir,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Cold-start probe failed with exit code {result.returncode}:\n{result.stderr}")
+    return result.stdout, result.stderr
+
+
+def _parse_targets(value: str) -> list[str]:
+    names = list(dict.fromkeys(part.strip() for part in value.split(",") if part.strip()))
+    if not names:
+        raise ColdStartConfigurationError("At least one target is required")
+    unknown = [name for name in names if name not in TARGETS]
+    if unknown:
+        raise ColdStartConfigurationError(
+            f"Unknown cold-start target {unknown[0]!r}; available: {', '.join(TARGETS)}"
+        )
+    return names
+
+
+def _positive_int(value: str) -> int:
+    parsed = int(value)
+    if parsed <= 0:
+        raise argparse.ArgumentTypeError("must be greater than zero")
+    return parsed
+
+
+def _positive_float(value: str) -> float:
+    parsed = float(value)
+    if parsed <= 0.0:
+        raise argparse.ArgumentTypeError("must be greater than zero")
+    return parsed
+
+
+def _utc_now() -> str:
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,254 @@
+"""Decode input audio once into canonical float32 PCM shared by the later stages.
+
+Two variants can be written, both as `.npy` files that memory-map without a copy:
+
+- model rate: `(frames, PCM_CHANNELS)` at `PCM_SAMPLE_RATE`, the layout every pretrained Demucs
+  model consumes.
+- Basic Pitch: `(frames,)` mono at `BASIC_PITCH_SAMPLE_RATE`, resampled the way Basic Pitch's own
+  `librosa.load` call does.
+
+Decoding runs block by block, so memory use does not depend on track length.
+"""
+
+from __future__ import annotations
+
+import shutil
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, BinaryIO, Iterator
+
+import structlog
+
+logger = structlog.get_logger()
+
+# Every pretrained Demucs model runs on 44.1 kHz stereo.
+PCM_SAMPLE_RATE = 44100
+PCM_CHANNELS = 2
+BASIC_PITCH_SAMPLE_RATE = 22050
+PCM_DIRNAME = "pcm"
+PCM_SUFFIX = ".npy"
+BASIC_PITCH_SUFFIX = ".basic_pitch.npy"
+_BLOCK_FRAMES = 1 << 16
+# npy header size reserved up front and rewritten once the frame count is known.
+_HEADER_BYTES = 128
+
+
+@dataclass(frozen=True)
+class DecodedAudio:
+    """Paths of the canonical PCM variants written for one input."""
+
+    model_path: Path | None = None
+    basic_pitch_path: Path | None = None
+
+    def artifacts(self) -> dict[str, Path]:
+        paths = {"pcm": self.model_path, "basic_pitch_pcm": self.basic_pitch_path}
+        return {name: path for name, path in paths.items() if path is not None}
+
+
+def is_pcm(path: Path) -> bool:
+    """Whether `path` is a canonical PCM buffer rather than an audio container."""
+    return path.suffix == PCM_SUFFIX
+
+
+def load_pcm(path: Path) -> Any:
+    """Memory-map a canonical PCM buffer read-only."""
+    import numpy as np
+
+    return np.load(path, mmap_mode="r")
+
+
+class _PcmWriter:
+    """Append float32 frames to a `.npy` file whose length is only known at the end."""
+
+    def __init__(self, path: Path, channels: int | None) -> None:
+        self.path = path
+        self.channels = channels
+        self.frames = 0
+        self._handle: BinaryIO = path.open("wb")
+        self._handle.write(b"\0" * _HEADER_BYTES)
+
+    def write(self, block: Any) -> None:
+        import numpy as np
+
+        self._handle.write(np.ascontiguousarray(block, dtype="<f4").tobytes())
+        self.frames += len(block)
+
+    def close(self) -> None:
+        import numpy as np
+
+        shape = (self.frames,) if self.channels is None else (self.frames, self.channels)
+        self._handle.seek(0)
+        np.lib.format.write_array_header_1_0(self._handle, {"descr": "<f4", "fortran_order": False, "shape": shape})
+        if self._handle.tell() != _HEADER_BYTES:
+            raise RuntimeError(f"Unexpected npy header size for {self.path}")
+        self._handle.close()
+
+    def abort(self) -> None:
+        if not self._handle.closed:
+            self._handle.close()
+        self.path.unlink(missing_ok=True)
+
+
+class _Resampler:
+    """Block-wise soxr resampler; a pass-through when the rates already match."""
+
+    def __init__(self, in_rate: int, out_rate: int, channels: int) -> None:
+        self._stream = None
+        if in_rate != out_rate:
+            import soxr
+
+            # Same filter as librosa's default `soxr_hq`, which Basic Pitch loads audio with.
+            self._stream = soxr.ResampleStream(in_rate, out_rate, channels, dtype="float32", quality="HQ")
+
+    def __call__(self, block: Any, *, last: bool = False) -> Any:
+        if self._stream is None:
+            return block
+        return self._stream.resample_chunk(block, last=last)
+
+
+class BasicPitchBuffer:
+    """Accumulate (frames, channels) blocks in memory as Basic Pitch audio (mono, 22.05 kHz).
+
+    Downmixes and resamples like `decode_audio`'s Basic Pitch variant, for audio that never
+    touches disk before transcription.
+    """
+
+    def __init__(self, samplerate: int) -> None:
+        self._resample = _Resampler(samplerate, BASIC_PITCH_SAMPLE_RATE, 1)
+        self._blocks: list[Any] = []
+
+    def append(self, block: Any) -> None:
+        import numpy as np
+
+        mono = np.asarray(block, dtype=np.float32).mean(axis=1, keepdims=True)
+        self._blocks.append(self._resample(mono)[:, 0])
+
+    def finish(self) -> Any:
+        import numpy as np
+
+        self._blocks.append(self._resample(np.zeros((0, 1), dtype=np.float32), last=True)[:, 0])
+        audio = np.concatenate(self._blocks)
+        self._blocks = []
+        return audio
+
+
+def _convert_channels(block: Any, channels: int) -> Any:
+    """Match Demucs' channel conversion: average to mono, repeat mono, or keep the first channels."""
+    have = block.shape[1]
+    if have == channels:
+        return block
+    if channels == 1:
+        return block.mean(axis=1, keepdims=True)
+    if have == 1:
+        return block.repeat(channels, axis=1)
+    return block[:, :channels]
+
+
+def _soundfile_blocks(input_audio: Path) -> tuple[int, Iterator[Any]] | None:
+    import soundfile as sf
+
+    try:
+        src = sf.SoundFile(str(input_audio))
+    except Exception:
+        return None
+
+    def blocks() -> Iterator[Any]:
+        with src:
+            yield from src.blocks(blocksize=_BLOCK_FRAMES, dtype="float32", always_2d=True)
+
+    return src.samplerate, blocks()
+
+
+def _ffmpeg_blocks(input_audio: Path, samplerate: int, channels: int) -> Iterator[Any]:
+    """Decode through ffmpeg for containers libsndfile cannot read (m4a)."""
+    import numpy as np
+
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        raise RuntimeError(f"Could not decode input audio: {input_audio} (ffmpeg not found)")
+    cmd = [ffmpeg, "-v", "error", "-i", str(input_audio), "-f", "f32le"]
+    cmd += ["-ac", str(channels), "-ar", str(samplerate), "-"]
+    frame_bytes = 4 * channels
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as process:
+        pending = b""
+        while chunk := process.stdout.read(_BLOCK_FRAMES * frame_bytes):
+            pending += chunk
+            usable = len(pending) - len(pending) % frame_bytes
+            yield np.frombuffer(pending[:usable], dtype="<f4").reshape(-1, channels)
+            pending = pending[usable:]
+        stderr = process.stderr.read().decode("utf-8", "ignore")
+    if process.returncode != 0:
+        raise RuntimeError(f"Could not decode input audio: {input_audio} ({stderr.strip()})")
+
+
+def decode_audio(
+    input_audio: Path,
+    output_dir: Path,
+    *,
+    model_rate: bool = True,
+    basic_pitch: bool = True,
+    job_id: str | None = None,
+) -> DecodedAudio:
+    """Decode `input_audio` once into the requested canonical PCM variants under `output_dir`.
+
+    libsndfile reads WAV/FLAC/OGG/MP3 directly; other containers go through ffmpeg, which then
+    also converts to the model rate. Raises RuntimeError when the audio cannot be decoded.
+    """
+    if not input_audio.exists():
+        raise FileNotFoundError(f"Input audio not found: {input_audio}")
+    if not (model_rate or basic_pitch):
+        raise ValueError("At least one PCM variant must be requested")
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    native = _soundfile_blocks(input_audio)
+    if native is None:
+        in_rate, blocks = PCM_SAMPLE_RATE, _ffmpeg_blocks(input_audio, PCM_SAMPLE_RATE, PCM_CHANNELS)
+    else:
+        in_rate, blocks = native
+
+    import numpy as np
+
+    writers: list[_PcmWriter] = []
+    model_writer = mono_writer = None
+    if model_rate:
+        model_writer = _PcmWriter(output_dir / f"{input_audio.stem}{PCM_SUFFIX}", PCM_CHANNELS)
+        writers.append(model_writer)
+        to_model_rate = _Resampler(in_rate, PCM_SAMPLE_RATE, PCM_CHANNELS)
+    if basic_pitch:
+        mono_writer = _PcmWriter(output_dir / f"{input_audio.stem}{BASIC_PITCH_SUFFIX}", None)
+        writers.append(mono_writer)
+        to_basic_pitch = _Resampler(in_rate, BASIC_PITCH_SAMPLE_RATE, 1)
+
+    logger.info("decode_start", job_id=job_id, input_audio=str(input_audio), samplerate=in_rate)
+    try:
+        for block in blocks:
+            if model_writer is not None:
+                model_writer.write(to_model_rate(_convert_channels(block, PCM_CHANNELS)))
+            if mono_writer is not None:
+                mono_writer.write(to_basic_pitch(block.mean(axis=1, keepdims=True))[:, 0])
+        # Flush the resamplers' delay lines.
+        if model_writer is not None:
+            model_writer.write(to_model_rate(np.zeros((0, PCM_CHANNELS), dtype=np.float32), last=True))
+        if mono_writer is not None:
+            mono_writer.write(to_basic_pitch(np.zeros((0, 1), dtype=np.float32), last=True)[:, 0])
+        for writer in writers:
+            writer.close()
+    except Exception as exc:
+        for writer in writers:
+            writer.abort()
+        if isinstance(exc, RuntimeError):
+            raise
+        raise RuntimeError(f"Could not decode input audio: {input_audio}") from exc
+
+    if all(writer.frames == 0 for writer in writers):
+        for writer in writers:
+            writer.path.unlink(missing_ok=True)
+        raise RuntimeError(f"Could not decode input audio: {input_audio} (no samples)")
+
+    decoded = DecodedAudio(
+        model_path=model_writer.path if model_writer is not None else None,
+        basic_pitch_path=mono_writer.path if mono_writer is not None else None,
+    )
+    logger.info("decode_complete", job_id=job_id, **{name: str(path) for name, path in decoded.artifacts().items()})
+    return decoded
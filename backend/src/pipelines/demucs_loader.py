@@ -1,25 +1,20 @@
-import os
 from pathlib import Path
 
 import structlog
-from demucs.pretrained import get_model
+
+from src.pipelines.separation import get_engine
 
 logger = structlog.get_logger()
 
 
 def ensure_model(model_name: str, cache_dir: Path) -> Path:
     """
-    Ensure Demucs model is available locally.
+    Ensure Demucs model is available locally and loaded in this process.
 
-    Downloads the model on first use into the provided cache directory.
+    Downloads the model on first use into the provided cache directory and keeps it in the
+    process-wide separation engine, so later calls and jobs reuse the loaded weights.
     """
-    resolved_cache = cache_dir.expanduser().resolve()
-    resolved_cache.mkdir(parents=True, exist_ok=True)
-
-    # Demucs respects DEMUCS_CACHEDIR for download location.
-    os.environ["DEMUCS_CACHEDIR"] = str(resolved_cache)
-    logger.info("demucs_model_check", model=model_name, cache_dir=str(resolved_cache))
-
-    get_model(name=model_name)
-    return resolved_cache
-
+    engine = get_engine(model_name, cache_dir)
+    logger.info("demucs_model_check", model=model_name, cache_dir=str(cache_dir), loaded=engine.loaded)
+    engine.model  # noqa: B018 - loads lazily on first access
+    return cache_dir.expanduser().resolve()
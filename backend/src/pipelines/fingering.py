@@ -0,0 +1,88 @@
+"""Dynamic-programming string/fret assignment for bass tabs."""
+
+from __future__ import annotations
+
+from typing import Sequence
+
+import numpy as np
+
+MAX_FRET = 24
+# Transition cost weights: moving the fretting hand dominates, string crossings are cheap and
+# high frets carry a small penalty so equivalent positions prefer the lower neck.
+SHIFT_WEIGHT = 1.0
+STRING_WEIGHT = 0.3
+FRET_WEIGHT = 0.05
+UNPLAYABLE = -1
+
+
+def build_position_table(tuning: Sequence[int], *, max_fret: int = MAX_FRET) -> np.ndarray:
+    """Precompute the fret of every MIDI pitch on every string.
+
+    `tuning` lists open-string pitches from lowest to highest string. The result has shape
+    (128, len(tuning)) and holds `UNPLAYABLE` where the pitch is out of range for a string.
+    """
+    pitches = np.arange(128)[:, None]
+    frets = pitches - np.asarray(tuning, dtype=np.int64)[None, :]
+    return np.where((frets >= 0) & (frets <= max_fret), frets, UNPLAYABLE)
+
+
+def _transition_costs(prev_frets: np.ndarray, next_frets: np.ndarray, n_strings: int) -> np.ndarray:
+    """Cost of moving from each candidate of one note to each candidate of the next.
+
+    Frets have shape (T, S); the result has shape (T, S, S). Open strings do not move the hand,
+    so shifts are measured between fretted positions only.
+    """
+    prev = prev_frets[:, :, None].astype(np.float64)
+    nxt = next_frets[:, None, :].astype(np.float64)
+    fretted = (prev > 0) & (nxt > 0)
+    shift = np.where(fretted, np.abs(nxt - prev), 0.0)
+    strings = np.arange(n_strings, dtype=np.float64)
+    crossing = np.abs(strings[None, :, None] - strings[None, None, :])
+    return SHIFT_WEIGHT * shift + STRING_WEIGHT * crossing + FRET_WEIGHT * np.maximum(nxt, 0.0)
+
+
+def optimize_fingering(
+    pitches: Sequence[int],
+    tuning: Sequence[int],
+    *,
+    table: np.ndarray | None = None,
+) -> list[tuple[int, int] | None]:
+    """Choose a (string, fret) per note minimising total hand movement over the whole sequence.
+
+    Strings are numbered like PyGuitarPro (1 = highest string). Pitches no string can play map
+    to None and are ignored by the optimisation.
+    """
+    if table is None:
+        table = build_position_table(tuning)
+    n_strings = table.shape[1]
+    result: list[tuple[int, int] | None] = [None] * len(pitches)
+
+    pitch_array = np.clip(np.asarray(pitches, dtype=np.int64), 0, 127)
+    candidates = table[pitch_array] if len(pitches) else np.empty((0, n_strings), dtype=np.int64)
+    playable = np.flatnonzero((candidates != UNPLAYABLE).any(axis=1))
+    if playable.size == 0:
+        return result
+
+    frets = candidates[playable]
+    invalid = frets == UNPLAYABLE
+    costs = _transition_costs(frets[:-1], frets[1:], n_strings)
+    costs[invalid[:-1], :] = np.inf
+    costs = np.where(invalid[1:, None, :], np.inf, costs)
+
+    best = np.where(invalid[0], np.inf, FRET_WEIGHT * np.maximum(frets[0], 0).astype(np.float64))
+    backpointers = np.empty((len(costs), n_strings), dtype=np.int64)
+    for step, transition in enumerate(costs):
+        total = best[:, None] + transition
+        backpointers[step] = total.argmin(axis=0)
+        best = total[backpointers[step], np.arange(n_strings)]
+
+    state = int(best.argmin())
+    path = [state]
+    for step in range(len(costs) - 1, -1, -1):
+        state = int(backpointers[step, state])
+        path.append(state)
+    path.reverse()
+
+    for position, (note_index, string_low_idx) in enumerate(zip(playable, path)):
+        result[note_index] = (n_strings - string_low_idx, int(frets[position, string_low_idx]))
+    return result
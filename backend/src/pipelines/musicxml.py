@@ -0,0 +1,116 @@
+"""Streaming MusicXML emitter for bass scores.
+
+Measures, ties and note values are laid out directly from a `Score` and written measure by
+measure, so no notation toolkit is imported and memory stays flat on dense bass lines.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import IO, Iterator
+
+import numpy as np
+
+from src.pipelines.score import (
+    DIVISIONS,
+    REST,
+    Event,
+    Score,
+    measure_ticks,
+    notated_values,
+    sequential_events,
+    split_measures,
+    tempo_marks,
+)
+
+PART_ID = "P1"
+INSTRUMENT_ID = "P1-I1"
+FINGERED_BASS_PROGRAM = 34  # MusicXML programs are 1-based; General MIDI 33 is Electric Bass (finger)
+# Sharps-only spelling per pitch class.
+_STEPS = (
+    ("C", 0), ("C", 1), ("D", 0), ("D", 1), ("E", 0), ("F", 0),
+    ("F", 1), ("G", 0), ("G", 1), ("A", 0), ("A", 1), ("B", 0),
+)
+
+_HEADER = f"""<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE score-partwise PUBLIC "-//Recordare//DTD MusicXML 4.0 Partwise//EN" "http://www.musicxml.org/dtds/partwise.dtd">
+<score-partwise version="4.0">
+  <part-list>
+    <score-part id="{PART_ID}">
+      <part-name>Electric Bass</part-name>
+      <score-instrument id="{INSTRUMENT_ID}">
+        <instrument-name>Electric Bass</instrument-name>
+      </score-instrument>
+      <midi-instrument id="{INSTRUMENT_ID}">
+        <midi-channel>1</midi-channel>
+        <midi-program>{FINGERED_BASS_PROGRAM}</midi-program>
+      </midi-instrument>
+    </score-part>
+  </part-list>
+  <part id="{PART_ID}">
+"""
+_FOOTER = """  </part>
+</score-partwise>
+"""
+
+
+def _pitch_xml(midi: int) -> str:
+    step, alter = _STEPS[midi % 12]
+    alter_xml = f"<alter>{alter}</alter>" if alter else ""
+    return f"<pitch><step>{step}</step>{alter_xml}<octave>{midi // 12 - 1}</octave></pitch>"
+
+
+def _tempo_xml(bpm: float, offset: int) -> str:
+    offset_xml = f"<offset>{offset}</offset>" if offset else ""
+    return (
+        '      <direction placement="above"><direction-type><metronome>'
+        f"<beat-unit>quarter</beat-unit><per-minute>{bpm:g}</per-minute>"
+        f'</metronome></direction-type>{offset_xml}<sound tempo="{bpm:g}"/></direction>\n'
+    )
+
+
+def _event_xml(event: Event, pitches: np.ndarray) -> Iterator[str]:
+    values = notated_values(event.ticks)
+    head = "<rest/>" if event.note == REST else _pitch_xml(int(pitches[event.note]))
+    for index, value in enumerate(values):
+        tie_stop = event.note != REST and (index > 0 or event.tie_stop)
+        tie_start = event.note != REST and (index < len(values) - 1 or event.tie_start)
+        ties = ('<tie type="stop"/>' if tie_stop else "") + ('<tie type="start"/>' if tie_start else "")
+        tied = ('<tied type="stop"/>' if tie_stop else "") + ('<tied type="start"/>' if tie_start else "")
+        parts = [head, f"<duration>{value.ticks}</duration>", ties, f"<type>{value.type}</type>"]
+        parts.append("<dot/>" * value.dots)
+        if tied:
+            parts.append(f"<notations>{tied}</notations>")
+        yield f"      <note>{''.join(parts)}</note>\n"
+
+
+def write_musicxml(score: Score, output: IO[str]) -> int:
+    """Write `score` as a single-part MusicXML document; returns the number of measures."""
+    beats, beat_type = score.time_signature
+    length = measure_ticks(score.time_signature)
+    ticks, notes = sequential_events(score)
+    measures = split_measures(ticks, notes, length)
+    marks = tempo_marks(score, length)
+
+    output.write(_HEADER)
+    for index, events in enumerate(measures):
+        output.write(f'    <measure number="{index + 1}">\n')
+        if index == 0:
+            output.write(
+                f"      <attributes><divisions>{DIVISIONS}</divisions><key><fifths>0</fifths></key>"
+                f"<time><beats>{beats}</beats><beat-type>{beat_type}</beat-type></time>"
+                "<clef><sign>F</sign><line>4</line></clef></attributes>\n"
+            )
+        for offset, bpm in marks.get(index, ()):
+            output.write(_tempo_xml(bpm, offset))
+        for event in events:
+            output.writelines(_event_xml(event, score.pitches))
+        output.write("    </measure>\n")
+    output.write(_FOOTER)
+    return len(measures)
+
+
+def write_musicxml_file(score: Score, output_path: Path) -> int:
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with output_path.open("w", encoding="utf-8") as handle:
+        return write_musicxml(score, handle)
@@ -0,0 +1,226 @@
+"""Array-backed note list and tempo map shared by every tab writer."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+DEFAULT_BPM = 120.0
+
+
+@dataclass(frozen=True, eq=False)
+class Score:
+    """Note stream sorted by onset, plus the MIDI tempo map.
+
+    Notes are parallel arrays so writers can quantise and slice them without per-note objects.
+    `tempo_times` holds the start (seconds) of each tempo segment and `tempi` its BPM.
+    """
+
+    starts: np.ndarray
+    ends: np.ndarray
+    pitches: np.ndarray
+    velocities: np.ndarray
+    tempo_times: np.ndarray
+    tempi: np.ndarray
+    time_signature: tuple[int, int] = (4, 4)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    @property
+    def bpm(self) -> float:
+        """Tempo at the start of the piece."""
+        return float(self.tempi[0]) if len(self.tempi) else DEFAULT_BPM
+
+    def seconds_to_quarters(self, seconds: np.ndarray | float) -> np.ndarray:
+        """Map times in seconds to quarter-note offsets by integrating the tempo map."""
+        times = np.asarray(seconds, dtype=np.float64)
+        if not len(self.tempi):
+            return times * (DEFAULT_BPM / 60.0)
+        rates = self.tempi / 60.0
+        segment_quarters = np.concatenate(([0.0], np.cumsum(np.diff(self.tempo_times) * rates[:-1])))
+        segment = np.clip(np.searchsorted(self.tempo_times, times, side="right") - 1, 0, len(rates) - 1)
+        return segment_quarters[segment] + (times - self.tempo_times[segment]) * rates[segment]
+
+
+def score_from_notes(
+    notes: np.ndarray,
+    *,
+    tempo_times: np.ndarray | None = None,
+    tempi: np.ndarray | None = None,
+    time_signature: tuple[int, int] = (4, 4),
+) -> Score:
+    """Build a Score from an (N, 4) array of `start, end, pitch, velocity` rows.
+
+    Zero-length notes are dropped and the rest are ordered by onset, then pitch.
+    """
+    notes = np.asarray(notes, dtype=np.float64).reshape(-1, 4)
+    notes = notes[notes[:, 1] > notes[:, 0]]
+    notes = notes[np.lexsort((notes[:, 2], notes[:, 0]))]
+    return Score(
+        starts=notes[:, 0],
+        ends=notes[:, 1],
+        pitches=notes[:, 2].astype(np.int16),
+        velocities=notes[:, 3].astype(np.uint8),
+        tempo_times=np.zeros(1) if tempo_times is None else np.asarray(tempo_times, dtype=np.float64),
+        tempi=np.array([DEFAULT_BPM]) if tempi is None else np.asarray(tempi, dtype=np.float64),
+        time_signature=time_signature,
+    )
+
+
+def load_score(midi_path: Path) -> Score:
+    """Parse a MIDI file once into a Score; drum tracks are ignored."""
+    import pretty_midi  # type: ignore
+
+    midi = pretty_midi.PrettyMIDI(str(midi_path))
+    notes = np.array(
+        [
+            (note.start, note.end, note.pitch, note.velocity)
+            for instrument in midi.instruments
+            if not instrument.is_drum
+            for note in instrument.notes
+        ],
+        dtype=np.float64,
+    )
+    tempo_times, tempi = midi.get_tempo_changes()
+    valid = tempi > 0
+    time_signature = (4, 4)
+    if midi.time_signature_changes:
+        first = midi.time_signature_changes[0]
+        time_signature = (first.numerator, first.denominator)
+    return score_from_notes(
+        notes,
+        tempo_times=tempo_times[valid] if valid.any() else None,
+        tempi=tempi[valid] if valid.any() else None,
+        time_signature=time_signature,
+    )
+
+
+# Tick grid shared by the writers (ticks per quarter). Positions snap to GRID_TICKS, a 64th note,
+# so every length is a sum of plain and dotted values and no tuplet is ever left incomplete.
+DIVISIONS = 48
+GRID_TICKS = 3
+MIN_QUARTERS = 0.25
+MAX_NOTE_QUARTERS = 8.0
+REST = -1
+
+
+class Event(NamedTuple):
+    """One notated slot in a measure; `note` indexes the Score arrays or is `REST`."""
+
+    ticks: int
+    note: int
+    tie_start: bool = False
+    tie_stop: bool = False
+
+
+class NotatedValue(NamedTuple):
+    ticks: int
+    type: str
+    gp_value: int
+    dots: int = 0
+
+
+_PLAIN = (("whole", 1), ("half", 2), ("quarter", 4), ("eighth", 8), ("16th", 16), ("32nd", 32), ("64th", 64))
+NOTATED_VALUES: tuple[NotatedValue, ...] = tuple(
+    sorted(
+        [NotatedValue(DIVISIONS * 4 // value, name, value) for name, value in _PLAIN]
+        + [NotatedValue(DIVISIONS * 6 // value, name, value, dots=1) for name, value in _PLAIN if value <= 32],
+        key=lambda value: value.ticks,
+        reverse=True,
+    )
+)
+
+
+def quantize_ticks(quarters: np.ndarray) -> np.ndarray:
+    """Round quarter-note positions to the nearest grid tick (vectorised `_quantize_quarter`)."""
+    grid = np.rint(np.asarray(quarters, dtype=np.float64) * DIVISIONS / GRID_TICKS).astype(np.int64)
+    return grid * GRID_TICKS
+
+
+def sequential_events(score: Score) -> tuple[np.ndarray, np.ndarray]:
+    """Lay the notes out on the tick grid with rests filling the gaps.
+
+    Returns parallel `ticks` and `note` arrays (`REST` for rests). Onsets are quantised to absolute
+    ticks, so rounding never accumulates along the line. Each note lasts its quantised length (at
+    least a sixteenth, at most two whole notes) cut short at the next onset; a gap shorter than a
+    sixteenth is added to the note before it instead of written as a rest. Notes that share an
+    onset are played in sequence rather than as chords, each a grid step after the previous one.
+    """
+    if not len(score):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    min_ticks = round(MIN_QUARTERS * DIVISIONS)
+    max_ticks = round(MAX_NOTE_QUARTERS * DIVISIONS)
+    steps = np.arange(len(score))
+    onsets = np.maximum(quantize_ticks(score.seconds_to_quarters(score.starts)), 0)
+    # Strictly increasing: each onset is at least one grid step after the one before it.
+    onsets = np.maximum.accumulate(onsets - steps * GRID_TICKS) + steps * GRID_TICKS
+    ends = quantize_ticks(score.seconds_to_quarters(score.ends))
+    note_ticks = np.clip(ends - onsets, min_ticks, max_ticks)
+    next_onsets = np.append(onsets[1:], onsets[-1] + note_ticks[-1])
+    note_ticks = np.minimum(note_ticks, next_onsets - onsets)
+    gaps = next_onsets - onsets - note_ticks
+    short = gaps < min_ticks
+    note_ticks = np.where(short, note_ticks + gaps, note_ticks)
+    rest_ticks = np.where(short, 0, gaps)
+
+    ticks = np.concatenate((onsets[:1], np.column_stack((note_ticks, rest_ticks)).ravel()))
+    notes = np.concatenate(([REST], np.column_stack((steps, np.full(len(score), REST))).ravel()))
+    keep = ticks > 0
+    return ticks[keep], notes[keep]
+
+
+def measure_ticks(time_signature: tuple[int, int]) -> int:
+    numerator, denominator = time_signature
+    return numerator * DIVISIONS * 4 // denominator
+
+
+def split_measures(ticks: np.ndarray, notes: np.ndarray, length: int) -> list[list[Event]]:
+    """Cut the event stream at every barline, tying notes that cross one.
+
+    The last measure is padded with a rest; an empty stream yields one full-measure rest.
+    """
+    measures: list[list[Event]] = [[]]
+    filled = 0
+    for duration, note in zip(ticks.tolist(), notes.tolist()):
+        tied_in = False
+        while duration > 0:
+            if filled == length:
+                measures.append([])
+                filled = 0
+            part = min(duration, length - filled)
+            duration -= part
+            measures[-1].append(Event(part, note, tie_start=note != REST and duration > 0, tie_stop=tied_in))
+            tied_in = note != REST
+            filled += part
+    if filled < length:
+        measures[-1].append(Event(length - filled, REST))
+    return measures
+
+
+def tempo_marks(score: Score, length: int) -> dict[int, list[tuple[int, float]]]:
+    """Tempo changes keyed by measure index, as (offset in ticks, BPM)."""
+    positions = np.rint(score.seconds_to_quarters(score.tempo_times) * DIVISIONS).astype(np.int64)
+    marks: dict[int, list[tuple[int, float]]] = {}
+    for position, bpm in zip(positions.tolist(), score.tempi.tolist()):
+        marks.setdefault(position // length, []).append((position % length, round(bpm, 2)))
+    return marks
+
+
+def notated_values(ticks: int) -> list[NotatedValue]:
+    """Split a duration into writable note values, tied in order, largest first.
+
+    `ticks` must be a multiple of `GRID_TICKS`, as every length from `sequential_events` is.
+    """
+    if ticks <= 0 or ticks % GRID_TICKS:
+        raise ValueError(f"Cannot notate {ticks} ticks; lengths must be positive multiples of {GRID_TICKS}")
+    values: list[NotatedValue] = []
+    for value in NOTATED_VALUES:
+        while ticks >= value.ticks:
+            values.append(value)
+            ticks -= value.ticks
+    return values
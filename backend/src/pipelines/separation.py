@@ -2,17 +2,493 @@
 
 from __future__ import annotations
 
+import contextlib
 import os
+import queue
+import re
 import shutil
 import subprocess
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
+from typing import IO, Any, Callable, Sequence
 
 import structlog
 
+from src.pipelines.decode import PCM_SAMPLE_RATE, BasicPitchBuffer, is_pcm, load_pcm
+from src.pipelines.stem_cache import StemCache
+
 logger = structlog.get_logger()
 
 # Demucs standard 4 stems
 DEFAULT_STEMS = ("vocals", "drums", "bass", "other")
+SEPARATION_BACKENDS = ("inprocess", "cli")
+# Percentage of Demucs' separation bar, e.g. ` 45%|████▌     | 23.4/52.0 [00:10<00:12, 2.30seconds/s]`.
+# Its unit is seconds of audio, which tells it apart from the model download bar.
+_CLI_PROGRESS_RE = re.compile(r"(\d{1,3})%\|.*seconds")
+# Lines of CLI output kept for the failure log.
+_CLI_OUTPUT_TAIL = 20
+# Which stems get written to disk. `no_<stem>` is the mix of every other source.
+STEM_MODES: dict[str, tuple[str, ...]] = {
+    "all": DEFAULT_STEMS,
+    "bass": ("bass",),
+    "bass_rest": ("bass", "no_bass"),
+}
+
+
+class StemHandoff:
+    """Hands one stem to the caller in memory while every stem's WAV is written in the background.
+
+    Pass one to `separate_stems`: after it returns, `audio` holds the stem as Basic Pitch audio
+    (mono, 22.05 kHz float32) ready for transcription, and `wait()` blocks until the stem files
+    are on disk. `audio` stays None when no separation ran (a stem-cache hit, the CLI backend).
+    """
+
+    def __init__(self, stem: str = "bass") -> None:
+        self.stem = stem
+        self.audio: Any = None
+        self._buffer: BasicPitchBuffer | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._pending: list[Future[Any]] = []
+        self._failed = False
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> None:
+        """Run `fn(*args)` on the writer thread; calls run one at a time, in order.
+
+        Once a call fails, later ones are skipped, so nothing queued after a failed write (a
+        checkpoint, a cache entry) can claim the stems are complete.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stem-writer")
+        self._pending.append(self._executor.submit(self._call, fn, args))
+
+    def _call(self, fn: Callable[..., Any], args: tuple[Any, ...]) -> None:
+        if self._failed:
+            return
+        try:
+            fn(*args)
+        except BaseException:
+            self._failed = True
+            raise
+
+    def collect(self, block: Any, samplerate: int) -> None:
+        """Append a (frames, channels) block of the handed-off stem."""
+        if self._buffer is None:
+            self._buffer = BasicPitchBuffer(samplerate)
+        self._buffer.append(block)
+
+    def finish(self) -> None:
+        if self._buffer is not None:
+            self.audio = self._buffer.finish()
+            self._buffer = None
+
+    def wait(self) -> None:
+        """Block until every submitted write is done; re-raises the first write error."""
+        pending, self._pending = self._pending, []
+        try:
+            for future in pending:
+                future.result()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def close(self) -> None:
+        """Wait for pending writes, dropping their errors; for cleanup after the job already failed."""
+        with contextlib.suppress(Exception):
+            self.wait()
+
+
+def _run_now(fn: Callable[..., Any], *args: Any) -> None:
+    fn(*args)
+
+
+class DemucsEngine:
+    """Long-lived Demucs separator that keeps the model loaded between jobs.
+
+    The model is loaded lazily on first use and reused for every later call, so a worker
+    process pays the torch import and weight loading cost once instead of once per job.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        cache_dir: Path,
+        *,
+        device: str | None = None,
+        shifts: int = 1,
+        overlap: float = 0.25,
+        chunk_overlap_seconds: float = 1.0,
+    ) -> None:
+        self.model_name = model_name
+        self.cache_dir = cache_dir
+        self.device = device
+        self.shifts = shifts
+        self.overlap = overlap
+        self.chunk_overlap_seconds = chunk_overlap_seconds
+        self._model: Any = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def model(self) -> Any:
+        if self._model is None:
+            self._model = self._load_model()
+        return self._model
+
+    def _load_model(self) -> Any:
+        import torch
+        from demucs.pretrained import get_model
+
+        resolved_cache = self.cache_dir.expanduser().resolve()
+        resolved_cache.mkdir(parents=True, exist_ok=True)
+        # Mirror the environment the CLI subprocess used so weights land in the same cache.
+        os.environ["DEMUCS_CACHEDIR"] = str(resolved_cache)
+        os.environ["TORCH_HOME"] = str(resolved_cache)
+
+        if self.device is None:
+            self.device = "cuda" if torch.cuda.is_available() else "cpu"
+
+        logger.info("demucs_model_load", model=self.model_name, device=self.device, cache_dir=str(resolved_cache))
+        model = get_model(name=self.model_name)
+        model.to(self.device)
+        model.eval()
+        return model
+
+    def _load_audio(self, input_audio: Path) -> Any:
+        """Decode audio into a (channels, samples) tensor at the model sample rate.
+
+        Canonical PCM (see `src.pipelines.decode`) is memory-mapped and wrapped without a copy.
+        """
+        import numpy as np
+        import soundfile as sf
+        import torch
+        from demucs.audio import AudioFile, convert_audio
+
+        model = self.model
+        if is_pcm(input_audio):
+            # Copy-on-write mapping: torch needs a writable buffer but never writes to it here.
+            wav = torch.from_numpy(np.load(input_audio, mmap_mode="c")).T
+            return convert_audio(wav, PCM_SAMPLE_RATE, model.samplerate, model.audio_channels)
+        try:
+            data, samplerate = sf.read(str(input_audio), dtype="float32", always_2d=True)
+        except Exception:
+            # libsndfile cannot read every container (e.g. m4a); fall back to Demucs' ffmpeg reader.
+            return AudioFile(input_audio).read(streams=0, samplerate=model.samplerate, channels=model.audio_channels)
+        wav = torch.from_numpy(data.T.copy())
+        return convert_audio(wav, samplerate, model.samplerate, model.audio_channels)
+
+    def _run_model(self, normalized: Any) -> dict[str, Any]:
+        """Apply the model to a normalised (channels, samples) tensor."""
+        import torch
+        from demucs.apply import apply_model
+
+        model = self.model
+        with torch.no_grad():
+            sources = apply_model(
+                model,
+                normalized[None],
+                device=self.device,
+                shifts=self.shifts,
+                split=True,
+                overlap=self.overlap,
+                progress=False,
+            )[0]
+        return dict(zip(model.sources, sources))
+
+    def separate_tensor(self, wav: Any) -> dict[str, Any]:
+        """Separate a decoded (channels, samples) tensor and return one tensor per source."""
+        ref = wav.mean(0)
+        mean = ref.mean()
+        std = ref.std() + 1e-8
+        separated = self._run_model((wav - mean) / std)
+        return {name: source * std + mean for name, source in separated.items()}
+
+    def separate(
+        self,
+        input_audio: Path,
+        output_dir: Path,
+        *,
+        stems: Sequence[str] = DEFAULT_STEMS,
+        chunk_seconds: float | None = None,
+        job_id: str | None = None,
+        handoff: StemHandoff | None = None,
+        on_progress: Callable[[float], None] | None = None,
+    ) -> dict[str, Path]:
+        """Separate an audio file in-process and write the requested stems into `output_dir`.
+
+        With `chunk_seconds`, audio is decoded, separated and written window by window so peak
+        memory no longer depends on track length. Containers libsndfile cannot seek fall back to
+        whole-file decoding. `input_audio` may also be canonical PCM from `decode_audio`. With a
+        `handoff`, stem files are written on its writer thread and its stem is kept in memory.
+        `on_progress` receives the fraction of windows separated so far (streaming path only).
+
+        Both paths scale every stem by one factor taken from the mix's peak (see `_level_scale`),
+        so a track's stems come out at the same level whether or not it was streamed. The Demucs
+        CLI rescales each stem by its own peak instead.
+        """
+        if not input_audio.exists():
+            raise FileNotFoundError(f"Input audio not found: {input_audio}")
+
+        output_dir.mkdir(parents=True, exist_ok=True)
+        logger.info(
+            "demucs_start",
+            job_id=job_id,
+            backend="inprocess",
+            model=self.model_name,
+            chunk_seconds=chunk_seconds,
+        )
+
+        if chunk_seconds is not None and _is_streamable(input_audio):
+            written = self._separate_streaming(
+                input_audio,
+                output_dir,
+                stems=stems,
+                chunk_seconds=chunk_seconds,
+                handoff=handoff,
+                on_progress=on_progress,
+            )
+            if not written:
+                raise RuntimeError(f"No stems produced by Demucs model {self.model_name}")
+            logger.info("demucs_complete", job_id=job_id, stems=list(written.keys()))
+            return written
+
+        try:
+            wav = self._load_audio(input_audio)
+        except Exception as exc:
+            logger.exception("demucs_decode_failed", job_id=job_id, error=str(exc))
+            raise RuntimeError(f"Could not decode input audio: {input_audio}") from exc
+
+        separated = self.separate_tensor(wav)
+        scale = _level_scale(float(wav.abs().max()) if wav.numel() else 0.0)
+        samplerate = self.model.samplerate
+        run = handoff.submit if handoff is not None else _run_now
+
+        written: dict[str, Path] = {}
+        for stem in stems:
+            source = _select_source(separated, stem)
+            if source is None:
+                continue
+            dest = output_dir / f"{stem}.wav"
+            data = _stem_samples(source, scale)
+            run(_write_pcm16, dest, data, samplerate)
+            if handoff is not None and stem == handoff.stem:
+                handoff.collect(data, samplerate)
+            written[stem] = dest
+        if handoff is not None:
+            handoff.finish()
+
+        if not written:
+            raise RuntimeError(f"No stems produced by Demucs model {self.model_name}")
+
+        logger.info("demucs_complete", job_id=job_id, stems=list(written.keys()))
+        return written
+
+    def _separate_streaming(
+        self,
+        input_audio: Path,
+        output_dir: Path,
+        *,
+        stems: Sequence[str],
+        chunk_seconds: float,
+        handoff: StemHandoff | None = None,
+        on_progress: Callable[[float], None] | None = None,
+    ) -> dict[str, Path]:
+        """Separate fixed-length windows and stream each stem to disk with linear crossfades.
+
+        Consecutive windows overlap by `chunk_overlap_seconds`; the overlapping output of the
+        previous window is held back as a tail and blended into the head of the next one.
+        """
+        import numpy as np
+        import soundfile as sf
+        import torch
+        from demucs.audio import convert_audio
+
+        run = handoff.submit if handoff is not None else _run_now
+        model = self.model
+        with contextlib.ExitStack() as stack:
+            src = stack.enter_context(_open_source(input_audio))
+            in_rate = src.samplerate
+            ratio = model.samplerate / in_rate
+            window = max(1, int(chunk_seconds * in_rate))
+            overlap = min(int(self.chunk_overlap_seconds * in_rate), window // 2)
+            hop = window - overlap
+            mean, std, peak = _mix_statistics(src, block_frames=window)
+            scale = _level_scale(peak)
+
+            paths = {stem: output_dir / f"{stem}.wav" for stem in stems}
+            writers = {
+                stem: sf.SoundFile(str(path), "w", samplerate=model.samplerate, channels=model.audio_channels, subtype="PCM_16")
+                for stem, path in paths.items()
+            }
+            for writer in writers.values():
+                # Queued behind the writer's pending writes when they run in the background.
+                stack.callback(run, writer.close)
+            tails: dict[str, Any] = {}
+            available: set[str] = set()
+
+            start = 0
+            while start < src.frames:
+                src.seek(start)
+                block = src.read(window, dtype="float32", always_2d=True)
+                wav = convert_audio(torch.from_numpy(block.T.copy()), in_rate, model.samplerate, model.audio_channels)
+                separated = self._run_model((wav - mean) / std)
+
+                last = start + window >= src.frames
+                # Output samples from `keep` onwards overlap the next window and are held back.
+                keep = round((start + hop) * ratio) - round(start * ratio)
+                for stem in stems:
+                    source = _select_source(separated, stem)
+                    if source is None:
+                        continue
+                    available.add(stem)
+                    chunk = (source * std + mean).cpu().numpy().T * scale
+                    tail = tails.pop(stem, None)
+                    if tail is not None:
+                        fade_len = min(len(tail), len(chunk))
+                        fade = np.linspace(0.0, 1.0, fade_len, endpoint=False, dtype=chunk.dtype)[:, None]
+                        chunk[:fade_len] = tail[:fade_len] * (1.0 - fade) + chunk[:fade_len] * fade
+                    block = np.clip(chunk if last else chunk[:keep], -1.0, 1.0)
+                    run(writers[stem].write, block)
+                    if handoff is not None and stem == handoff.stem:
+                        handoff.collect(block, model.samplerate)
+                    if not last:
+                        tails[stem] = chunk[keep:]
+                if on_progress is not None:
+                    on_progress(min(start + window, src.frames) / src.frames)
+                if last:
+                    break
+                start += hop
+
+        for stem, path in paths.items():
+            if stem not in available:
+                run(path.unlink, True)
+        if handoff is not None:
+            handoff.finish()
+        return {stem: path for stem, path in paths.items() if stem in available}
+
+
+_ENGINES: dict[tuple[str, Path], DemucsEngine] = {}
+
+
+def get_engine(model_name: str, cache_dir: Path) -> DemucsEngine:
+    """Return the process-wide engine for a model, creating it on first use."""
+    key = (model_name, cache_dir.expanduser().resolve())
+    engine = _ENGINES.get(key)
+    if engine is None:
+        engine = DemucsEngine(model_name, cache_dir)
+        _ENGINES[key] = engine
+    return engine
+
+
+def resolve_stem_mode(mode: str) -> tuple[str, ...]:
+    """Map a stem-selection mode to the stem names that should be written."""
+    try:
+        return STEM_MODES[mode]
+    except KeyError as exc:
+        available = ", ".join(sorted(STEM_MODES))
+        raise ValueError(f"Unknown stem mode {mode!r}; available: {available}") from exc
+
+
+def _select_source(separated: dict[str, Any], stem: str) -> Any:
+    if stem in separated:
+        return separated[stem]
+    if stem.startswith("no_") and stem[3:] in separated:
+        rest = [source for name, source in separated.items() if name != stem[3:]]
+        return sum(rest[1:], rest[0]) if rest else None
+    return None
+
+
+class _PcmSource:
+    """The slice of the `soundfile.SoundFile` interface `_separate_streaming` uses, over canonical PCM."""
+
+    def __init__(self, path: Path) -> None:
+        self._data = load_pcm(path)
+        self.samplerate = PCM_SAMPLE_RATE
+        self.frames = len(self._data)
+        self._position = 0
+
+    def __enter__(self) -> _PcmSource:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        del self._data
+
+    def seek(self, frame: int) -> None:
+        self._position = frame
+
+    def read(self, frames: int, *, dtype: str, always_2d: bool = True) -> Any:
+        block = self._data[self._position : self._position + frames].astype(dtype)
+        self._position += len(block)
+        return block
+
+    def blocks(self, *, blocksize: int, dtype: str, always_2d: bool = True) -> Any:
+        for start in range(self._position, self.frames, blocksize):
+            yield self._data[start : start + blocksize].astype(dtype)
+
+
+def _open_source(input_audio: Path) -> Any:
+    import soundfile as sf
+
+    if is_pcm(input_audio):
+        return _PcmSource(input_audio)
+    return sf.SoundFile(str(input_audio))
+
+
+def _is_streamable(input_audio: Path) -> bool:
+    import soundfile as sf
+
+    if is_pcm(input_audio):
+        return True
+    try:
+        sf.info(str(input_audio))
+    except Exception:
+        return False
+    return True
+
+
+def _mix_statistics(src: Any, *, block_frames: int) -> tuple[float, float, float]:
+    """Mean and standard deviation of the mono mix plus the peak of any channel, block by block."""
+    total = 0.0
+    total_sq = 0.0
+    peak = 0.0
+    count = 0
+    src.seek(0)
+    for block in src.blocks(blocksize=block_frames, dtype="float64", always_2d=True):
+        mono = block.mean(axis=1)
+        total += float(mono.sum())
+        total_sq += float((mono * mono).sum())
+        peak = max(peak, float(abs(block).max()) if block.size else 0.0)
+        count += mono.size
+    if count == 0:
+        return 0.0, 1.0, 0.0
+    mean = total / count
+    variance = max(total_sq / count - mean * mean, 0.0)
+    return mean, variance**0.5 + 1e-8, peak
+
+
+def _level_scale(mix_peak: float) -> float:
+    """Gain for every stem of a mix peaking at `mix_peak`: Demucs' `clip="rescale"` rule, from the mix.
+
+    It is known before the first window is separated, so streamed and whole-file stems match.
+    """
+    return 1.0 / max(1.01 * mix_peak, 1.0)
+
+
+def _stem_samples(source: Any, scale: float) -> Any:
+    """A (channels, samples) tensor as (samples, channels) float32 at `scale`, clipped to full scale."""
+    import numpy as np
+
+    return np.clip(source.detach().cpu().numpy().T * scale, -1.0, 1.0)
+
+
+def _write_pcm16(dest: Path, data: Any, samplerate: int) -> None:
+    import soundfile as sf
+
+    sf.write(str(dest), data, samplerate, subtype="PCM_16")
 
 
 def separate_stems(
@@ -22,6 +498,88 @@ def separate_stems(
     model_name: str,
     cache_dir: Path,
     job_id: str | None = None,
+    backend: str = "inprocess",
+    mode: str = "all",
+    chunk_seconds: float | None = None,
+    cache: StemCache | None = None,
+    handoff: StemHandoff | None = None,
+    on_progress: Callable[[float], None] | None = None,
+    stall_timeout_seconds: float | None = None,
+) -> dict[str, Path]:
+    """Separate stems with Demucs and return generated stem paths.
+
+    The default `inprocess` backend reuses a per-process `DemucsEngine`; `cli` shells out to the
+    `demucs` command for environments that need process isolation. `mode` selects which stems are
+    materialised (see `STEM_MODES`); unrequested stems are never written to disk. `chunk_seconds`
+    enables bounded-memory windowed separation and only applies to the in-process backend. With a
+    `cache`, stems previously produced for the same audio and model are linked in instead.
+
+    With a `handoff` (in-process backend only), the returned paths may still be being written:
+    call `handoff.wait()` before reading them. The cache is filled once they are complete.
+
+    `on_progress` is called with the separated fraction (0-1) as Demucs works through the track.
+    `stall_timeout_seconds` kills a `cli` run that prints nothing for that long.
+    """
+    stems = resolve_stem_mode(mode)
+    if backend not in SEPARATION_BACKENDS:
+        raise ValueError(f"Unknown separation backend {backend!r}; available: {', '.join(SEPARATION_BACKENDS)}")
+    if not input_audio.exists():
+        raise FileNotFoundError(f"Input audio not found: {input_audio}")
+
+    cache_key = cache.key(input_audio, model_name) if cache is not None else None
+    if cache is not None and cache_key is not None:
+        cached = cache.fetch(cache_key, stems, output_dir)
+        if cached is not None:
+            logger.info("demucs_cached", job_id=job_id, stems=list(cached.keys()))
+            return cached
+
+    if backend == "inprocess":
+        produced = get_engine(model_name, cache_dir).separate(
+            input_audio,
+            output_dir,
+            stems=stems,
+            chunk_seconds=chunk_seconds,
+            job_id=job_id,
+            handoff=handoff,
+            on_progress=on_progress,
+        )
+    else:
+        produced = _separate_with_cli(
+            input_audio,
+            output_dir,
+            model_name=model_name,
+            cache_dir=cache_dir,
+            stems=stems,
+            job_id=job_id,
+            on_progress=on_progress,
+            stall_timeout_seconds=stall_timeout_seconds,
+        )
+
+    if cache is not None and cache_key is not None:
+        if handoff is not None and backend == "inprocess":
+            handoff.submit(_store_in_cache, cache, cache_key, produced, job_id)
+        else:
+            _store_in_cache(cache, cache_key, produced, job_id)
+    return produced
+
+
+def _store_in_cache(cache: StemCache, cache_key: str, produced: dict[str, Path], job_id: str | None) -> None:
+    try:
+        cache.store(cache_key, produced)
+    except OSError as exc:
+        logger.warning("stem_cache_store_failed", job_id=job_id, error=str(exc))
+
+
+def _separate_with_cli(
+    input_audio: Path,
+    output_dir: Path,
+    *,
+    model_name: str,
+    cache_dir: Path,
+    stems: Sequence[str] = DEFAULT_STEMS,
+    job_id: str | None = None,
+    on_progress: Callable[[float], None] | None = None,
+    stall_timeout_seconds: float | None = None,
 ) -> dict[str, Path]:
     """Run Demucs via CLI and return generated stem paths."""
     if not input_audio.exists():
@@ -36,35 +594,98 @@ def separate_stems(
         **os.environ,
         "DEMUCS_CACHEDIR": str(cache_dir),
         "TORCH_HOME": str(cache_dir),
+        # Progress lines must reach the pipe as they are printed.
+        "PYTHONUNBUFFERED": "1",
     }
 
-    cmd = ["demucs", "-n", model_name, "--out", str(tmp_root), str(input_audio)]
-    logger.info("demucs_start", job_id=job_id, cmd=" ".join(cmd), cache_dir=str(cache_dir))
+    cmd = ["demucs", "-n", model_name, "--out", str(tmp_root)]
+    two_stems = {stem.removeprefix("no_") for stem in stems}
+    if len(two_stems) == 1:
+        # Lets Demucs emit only `<stem>` and `no_<stem>` instead of every source.
+        cmd += ["--two-stems", two_stems.pop()]
+    cmd.append(str(input_audio))
+    logger.info("demucs_start", job_id=job_id, backend="cli", cmd=" ".join(cmd), cache_dir=str(cache_dir))
 
     try:
-        subprocess.run(cmd, check=True, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        _run_cli(cmd, env, on_progress=on_progress, stall_timeout_seconds=stall_timeout_seconds, job_id=job_id)
     except FileNotFoundError as exc:
         logger.exception("demucs_not_found", job_id=job_id, error=str(exc))
         raise RuntimeError("Demucs CLI not found. Ensure demucs is installed in the environment.") from exc
     except subprocess.CalledProcessError as exc:
-        logger.exception("demucs_failed", job_id=job_id, returncode=exc.returncode, stderr=exc.stderr.decode("utf-8", "ignore"))
+        logger.exception("demucs_failed", job_id=job_id, returncode=exc.returncode, stderr=exc.output)
         raise RuntimeError(f"Demucs separation failed: {exc}") from exc
 
     separated_dir = tmp_root / model_name / input_audio.stem
-    stems: dict[str, Path] = {}
-    for stem in DEFAULT_STEMS:
+    written: dict[str, Path] = {}
+    for stem in stems:
         candidate = separated_dir / f"{stem}.wav"
         if candidate.exists():
             dest = output_dir / f"{stem}.wav"
             shutil.move(str(candidate), dest)
-            stems[stem] = dest
+            written[stem] = dest
 
     shutil.rmtree(tmp_root, ignore_errors=True)
 
-    if not stems:
+    if not written:
         raise RuntimeError(f"No stems produced by Demucs at {separated_dir}")
 
-    logger.info("demucs_complete", job_id=job_id, stems=list(stems.keys()))
-    return stems
+    logger.info("demucs_complete", job_id=job_id, stems=list(written.keys()))
+    return written
+
+
+def _run_cli(
+    cmd: list[str],
+    env: dict[str, str],
+    *,
+    on_progress: Callable[[float], None] | None,
+    stall_timeout_seconds: float | None,
+    job_id: str | None,
+) -> None:
+    """Run the Demucs CLI, reading its output as it is printed instead of buffering all of it.
+
+    Progress-bar updates go to `on_progress`; other lines are logged. A run that prints nothing
+    for `stall_timeout_seconds` is killed. Raises CalledProcessError (with the last lines of output)
+    on a non-zero exit and RuntimeError on a stall.
+    """
+    process = subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    lines: queue.Queue[bytes | None] = queue.Queue()
+    reader = threading.Thread(target=_pump_lines, args=(process.stdout, lines), name="demucs-output", daemon=True)
+    reader.start()
+    tail: deque[str] = deque(maxlen=_CLI_OUTPUT_TAIL)
+    try:
+        # `get` raises queue.Empty once nothing was printed for the stall timeout.
+        while (line := lines.get(timeout=stall_timeout_seconds)) is not None:
+            text = line.decode("utf-8", "ignore").strip()
+            if not text:
+                continue
+            match = _CLI_PROGRESS_RE.search(text)
+            if match is None:
+                tail.append(text)
+                logger.debug("demucs_output", job_id=job_id, line=text)
+            elif on_progress is not None:
+                on_progress(min(int(match.group(1)), 100) / 100)
+    except queue.Empty:
+        process.kill()
+        logger.error("demucs_stalled", job_id=job_id, timeout_seconds=stall_timeout_seconds, output="\n".join(tail))
+        raise RuntimeError(f"Demucs produced no output for {stall_timeout_seconds:g}s and was killed") from None
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+        reader.join(timeout=5)
+        process.stdout.close()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd, output="\n".join(tail))
 
 
+def _pump_lines(stream: IO[bytes], lines: queue.Queue[bytes | None]) -> None:
+    """Split a pipe into lines at newlines and at the carriage returns progress bars redraw with; None marks EOF."""
+    pending = b""
+    while chunk := stream.read1(65536):
+        parts = re.split(rb"[\r\n]", pending + chunk)
+        pending = parts.pop()
+        for part in parts:
+            lines.put(part)
+    if pending:
+        lines.put(pending)
+    lines.put(None)
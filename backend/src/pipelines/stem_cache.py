@@ -0,0 +1,117 @@
+"""Content-addressed cache of separated stems shared across jobs."""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+from pathlib import Path
+from typing import Iterable, Mapping
+
+import structlog
+
+logger = structlog.get_logger()
+
+_DIGEST_BLOCK_FRAMES = 1 << 16
+_FILE_CHUNK_BYTES = 1 << 20
+
+
+def audio_digest(input_audio: Path) -> str:
+    """sha256 of the decoded PCM, so identical audio in a different container still matches.
+
+    Containers libsndfile cannot decode are hashed by their raw bytes instead.
+    """
+    import soundfile as sf
+
+    digest = hashlib.sha256()
+    try:
+        with sf.SoundFile(str(input_audio)) as src:
+            digest.update(f"pcm:{src.samplerate}:{src.channels}:".encode())
+            for block in src.blocks(blocksize=_DIGEST_BLOCK_FRAMES, dtype="float32", always_2d=True):
+                digest.update(block.tobytes())
+    except Exception:
+        digest = hashlib.sha256(b"file:")
+        with input_audio.open("rb") as handle:
+            for chunk in iter(lambda: handle.read(_FILE_CHUNK_BYTES), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _link_or_copy(source: Path, dest: Path) -> None:
+    dest.unlink(missing_ok=True)
+    try:
+        os.link(source, dest)
+    except OSError:
+        # Hard links fail across filesystems; a copy keeps the cache usable there.
+        shutil.copy2(source, dest)
+
+
+class StemCache:
+    """Stems keyed by audio digest and Demucs model, evicted least-recently-used first.
+
+    Each entry is a directory `<root>/<model>/<digest>/` holding one WAV per stem. Hits are
+    hard-linked into the job directory so a cached song costs no extra disk space.
+    """
+
+    def __init__(self, root: Path, *, max_bytes: int) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def key(self, input_audio: Path, model_name: str) -> str:
+        # Model names such as `hf://user/model` must stay a single directory level.
+        model_dir = model_name.replace("://", "_").replace("/", "_")
+        return f"{model_dir}/{audio_digest(input_audio)}"
+
+    def _entry_dir(self, key: str) -> Path:
+        return self.root / key
+
+    def fetch(self, key: str, stems: Iterable[str], output_dir: Path) -> dict[str, Path] | None:
+        """Link cached stems into `output_dir`, or return None unless every stem is cached."""
+        entry = self._entry_dir(key)
+        sources = {stem: entry / f"{stem}.wav" for stem in stems}
+        if not sources or not all(path.is_file() for path in sources.values()):
+            return None
+
+        output_dir.mkdir(parents=True, exist_ok=True)
+        linked: dict[str, Path] = {}
+        for stem, source in sources.items():
+            dest = output_dir / source.name
+            _link_or_copy(source, dest)
+            linked[stem] = dest
+        # Directory mtime doubles as the LRU timestamp.
+        os.utime(entry)
+        logger.info("stem_cache_hit", key=key, stems=list(linked))
+        return linked
+
+    def store(self, key: str, stems: Mapping[str, Path]) -> None:
+        """Add produced stems to the cache, then evict old entries beyond `max_bytes`."""
+        entry = self._entry_dir(key)
+        entry.mkdir(parents=True, exist_ok=True)
+        for stem, path in stems.items():
+            tmp = entry / f".{stem}.wav.{os.getpid()}"
+            _link_or_copy(path, tmp)
+            tmp.replace(entry / f"{stem}.wav")
+        os.utime(entry)
+        logger.info("stem_cache_store", key=key, stems=list(stems))
+        self.evict()
+
+    def evict(self) -> list[Path]:
+        """Remove least-recently-used entries until the cache fits in `max_bytes`."""
+        entries = [
+            (entry.stat().st_mtime, entry, sum(f.stat().st_size for f in entry.iterdir() if f.is_file()))
+            for model_dir in (self.root.iterdir() if self.root.is_dir() else ())
+            if model_dir.is_dir()
+            for entry in model_dir.iterdir()
+            if entry.is_dir()
+        ]
+        total = sum(size for _, _, size in entries)
+        removed: list[Path] = []
+        for _, entry, size in sorted(entries, key=lambda item: item[0]):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            removed.append(entry)
+        if removed:
+            logger.info("stem_cache_evicted", entries=len(removed), remaining_bytes=total)
+        return removed
@@ -3,201 +3,306 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Iterable, Tuple
+from typing import Protocol, Sequence
 
+import numpy as np
 import structlog
 
+from src.pipelines.fingering import build_position_table, optimize_fingering
+from src.pipelines.musicxml import write_musicxml_file
+from src.pipelines.score import (
+    NOTATED_VALUES,
+    REST,
+    NotatedValue,
+    Score,
+    load_score,
+    measure_ticks,
+    notated_values,
+    sequential_events,
+    split_measures,
+    tempo_marks,
+)
+from src.pipelines.tunings import DEFAULT_TUNING, TUNINGS, resolve_tuning
+
 logger = structlog.get_logger()
 
 
-# MIDI numbers for standard bass tunings (4/5/6 strings)
-STANDARD_TUNINGS = {
-    4: [40, 45, 50, 55],  # E1 A1 D2 G2
-    5: [35, 40, 45, 50, 55],  # B0 E1 A1 D2 G2
-    6: [28, 33, 38, 43, 47, 52],  # E0 A0 D1 G1 B1 E2 (approx)
+# Pitch -> fret lookup per tuning. Registered tunings are built up front; custom ones on first use.
+POSITION_TABLES: dict[tuple[int, ...], np.ndarray] = {
+    tuning: build_position_table(tuning) for variants in TUNINGS.values() for tuning in variants.values()
 }
 
 
-def _pick_string_and_fret(midi_pitch: int, strings: int) -> tuple[int, int] | None:
-    """Naively pick a string/fret for a given MIDI pitch."""
-    tuning = STANDARD_TUNINGS.get(strings, STANDARD_TUNINGS[4])
-    # Strings are numbered from 1 (highest) in PyGuitarPro, so reverse for bass perspective.
-    for string_idx, open_pitch in enumerate(reversed(tuning), start=1):
-        fret = midi_pitch - open_pitch
-        if 0 <= fret <= 24:
-            return string_idx, fret
-    return None
+def position_table(tuning: tuple[int, ...]) -> np.ndarray:
+    table = POSITION_TABLES.get(tuning)
+    if table is None:
+        table = POSITION_TABLES.setdefault(tuning, build_position_table(tuning))
+    return table
 
 
-def midi_to_gp5(
-    midi_path: Path,
-    output_path: Path,
-    *,
-    strings: int = 4,
-    job_id: str | None = None,
-) -> Path:
-    """Convert a MIDI file to a minimal GP5 bass tab.
+class ScoreWriter(Protocol):
+    """Interface implemented by tab output formats."""
 
-    On failure, falls back to emitting a MusicXML file so that AlphaTab can still import the result.
-    """
-    if not midi_path.exists():
-        raise FileNotFoundError(f"MIDI not found: {midi_path}")
+    name: str
+    suffix: str
 
-    output_path.parent.mkdir(parents=True, exist_ok=True)
+    def write(
+        self,
+        score: Score,
+        output_path: Path,
+        *,
+        tuning: tuple[int, ...],
+        job_id: str | None = None,
+    ) -> Path:
+        """Render a parsed score to `output_path`."""
+        ...
 
-    logger.info("tab_generation_start", job_id=job_id, midi=str(midi_path), gp5=str(output_path))
 
-    try:
+class Gp5Writer:
+    """Guitar Pro 5 tab, one measure per bar of the score, fingered by `optimize_fingering`."""
+
+    name = "gp5"
+    suffix = ".gp5"
+
+    def write(
+        self,
+        score: Score,
+        output_path: Path,
+        *,
+        tuning: tuple[int, ...],
+        job_id: str | None = None,
+    ) -> Path:
         import guitarpro  # type: ignore
-        import pretty_midi  # type: ignore
-        midi = pretty_midi.PrettyMIDI(str(midi_path))
-        tempo = int(midi.estimate_tempo() or 120)
-        song = guitarpro.models.Song(tempo=tempo, tempoName="Bass")
-        time_signature = guitarpro.models.TimeSignature(
-            numerator=4, denominator=guitarpro.models.Duration(value=4)
-        )
-        header = guitarpro.models.MeasureHeader(number=1, start=0, timeSignature=time_signature)
-        song.measureHeaders.append(header)
 
-        channel = guitarpro.models.MidiChannel(instrument=33)  # Fingered Bass
-        track = guitarpro.models.Track(song, name="Bass", channel=channel)
-        tuning = STANDARD_TUNINGS.get(strings, STANDARD_TUNINGS[4])
+        models = guitarpro.models
+        song = models.Song(tempo=int(round(score.bpm)), tempoName="Bass")
+        # Song() starts with a default guitar track and header; build the bass track from scratch.
+        song.tracks.clear()
+        song.measureHeaders.clear()
+
+        channel = models.MidiChannel(instrument=33)  # Fingered Bass
+        track = models.Track(song, name="Bass", channel=channel)
         track.strings = [
-            guitarpro.models.GuitarString(number=idx + 1, value=pitch)
-            for idx, pitch in enumerate(reversed(tuning))
+            models.GuitarString(number=idx + 1, value=pitch) for idx, pitch in enumerate(reversed(tuning))
         ]
         song.tracks.append(track)
 
-        measure = guitarpro.models.Measure(track, header, clef=guitarpro.models.MeasureClef.bass)
-        track.measures.append(measure)
-
-        voice = measure.voices[0]
-        default_duration = guitarpro.models.Duration(value=4)  # quarter note
-
-        notes = sorted((n.start, n.end, n.pitch) for inst in midi.instruments for n in inst.notes)
-        if not notes:
-            rest = guitarpro.models.Beat(
-                voice,
-                status=guitarpro.models.BeatStatus.rest,
-                duration=default_duration,
+        fingering = optimize_fingering(score.pitches.tolist(), tuning, table=position_table(tuning))
+        length = measure_ticks(score.time_signature)
+        ticks, notes = sequential_events(score)
+        marks = tempo_marks(score, length)
+        numerator, denominator = score.time_signature
+        gp_durations = {value: _gp_duration(models, value) for value in NOTATED_VALUES}
+
+        start = models.Duration.quarterTime
+        header_length = numerator * models.Duration.quarterTime * 4 // denominator
+        for index, events in enumerate(split_measures(ticks, notes, length)):
+            header = models.MeasureHeader(
+                number=index + 1,
+                start=start,
+                timeSignature=models.TimeSignature(numerator=numerator, denominator=models.Duration(value=denominator)),
             )
-            voice.beats.append(rest)
-        else:
-            for _, _, pitch in notes:
-                mapping = _pick_string_and_fret(pitch, strings)
-                if mapping is None:
-                    continue
-                string_idx, fret = mapping
-                beat = guitarpro.models.Beat(
-                    voice,
-                    status=guitarpro.models.BeatStatus.normal,
-                    duration=default_duration,
-                )
-                gp_note = guitarpro.models.Note(
-                    beat,
-                    value=fret,
-                    string=string_idx,
-                    velocity=80,
-                    type=guitarpro.models.NoteType.normal,
-                )
-                beat.notes.append(gp_note)
-                voice.beats.append(beat)
-
-            if not voice.beats:
-                rest = guitarpro.models.Beat(
-                    voice,
-                    status=guitarpro.models.BeatStatus.rest,
-                    duration=default_duration,
-                )
-                voice.beats.append(rest)
+            song.measureHeaders.append(header)
+            measure = models.Measure(track, header)
+            track.measures.append(measure)
+            start += header_length
+
+            voice = measure.voices[0]
+            pending_tempi = list(marks.get(index, ()))
+            position = 0
+            for event in events:
+                mapping = fingering[event.note] if event.note != REST else None
+                values = notated_values(event.ticks)
+                for part, value in enumerate(values):
+                    beat = models.Beat(voice, duration=gp_durations[value])
+                    if mapping is None:
+                        beat.status = models.BeatStatus.rest
+                    else:
+                        string_idx, fret = mapping
+                        tied = part > 0 or event.tie_stop
+                        beat.status = models.BeatStatus.normal
+                        beat.notes.append(
+                            models.Note(
+                                beat,
+                                value=fret,
+                                string=string_idx,
+                                velocity=int(score.velocities[event.note]) or 80,
+                                type=models.NoteType.tie if tied else models.NoteType.normal,
+                            )
+                        )
+                    if pending_tempi and pending_tempi[0][0] <= position:
+                        _, bpm = pending_tempi.pop(0)
+                        beat.effect.mixTableChange = models.MixTableChange(
+                            tempo=models.MixTableItem(value=int(round(bpm)))
+                        )
+                    voice.beats.append(beat)
+                    position += value.ticks
 
         guitarpro.write(song, output_path)
-        logger.info("tab_generation_complete", job_id=job_id, gp5=str(output_path))
+        logger.info(
+            "tab_generation_complete",
+            job_id=job_id,
+            gp5=str(output_path),
+            measures=len(song.measureHeaders),
+        )
+        return output_path
 
-        _write_simple_musicxml(midi_path, output_path.with_suffix(".musicxml"), tempo=tempo, job_id=job_id)
 
+def _gp_duration(models, value: NotatedValue):
+    return models.Duration(value=value.gp_value, isDotted=bool(value.dots))
+
+
+class MusicXmlWriter:
+    """Single-voice MusicXML that AlphaTab can safely render while keeping timing."""
+
+    name = "musicxml"
+    suffix = ".musicxml"
+
+    def write(
+        self,
+        score: Score,
+        output_path: Path,
+        *,
+        tuning: tuple[int, ...],
+        job_id: str | None = None,
+    ) -> Path:
+        measures = write_musicxml_file(score, output_path)
+        logger.info(
+            "musicxml_written",
+            job_id=job_id,
+            musicxml=str(output_path),
+            notes=len(score),
+            measures=measures,
+            bpm=score.bpm,
+        )
         return output_path
-    except Exception as exc:  # pragma: no cover - defensive fallback
-        logger.warning("tab_generation_fallback", job_id=job_id, error=str(exc))
 
-        fallback_path = output_path.with_suffix(".musicxml")
-        _write_simple_musicxml(midi_path, fallback_path, tempo=None, job_id=job_id)
-        return fallback_path
 
+class Music21MusicXmlWriter:
+    """The original music21 `makeNotation` path, kept as an opt-in fallback (`MUSICXML_WRITER=music21`)."""
+
+    name = "music21"
+    suffix = ".musicxml"
+
+    def write(
+        self,
+        score: Score,
+        output_path: Path,
+        *,
+        tuning: tuple[int, ...],
+        job_id: str | None = None,
+    ) -> Path:
+        from music21 import instrument, meter, note, stream, tempo as m21tempo  # type: ignore
+
+        bpm = score.bpm if score.bpm > 0 else 120.0
+
+        m21score = stream.Score()
+        part = stream.Part()
+        part.insert(0, m21tempo.MetronomeMark(number=bpm))
+        part.insert(0, meter.TimeSignature("4/4"))
+        part.insert(0, instrument.ElectricBass())
 
-def _write_simple_musicxml(
+        if not len(score):
+            part.append(note.Rest(quarterLength=4.0))
+        else:
+            seconds_to_quarter = bpm / 60.0
+            current_time = 0.0
+
+            for start, end, pitch in zip(score.starts.tolist(), score.ends.tolist(), score.pitches.tolist()):
+                # fill rest if there is a gap
+                if start > current_time:
+                    rest_q = max(0.25, (start - current_time) * seconds_to_quarter)
+                    rest_q = _quantize_quarter(rest_q)
+                    part.append(note.Rest(quarterLength=rest_q))
+                    current_time = start
+
+                duration_q = max(0.25, (end - start) * seconds_to_quarter)
+                # clamp extremely long durations to avoid rendering issues
+                duration_q = min(duration_q, 8.0)
+                duration_q = _quantize_quarter(duration_q)
+
+                m_note = note.Note()
+                m_note.pitch.midi = pitch
+                m_note.quarterLength = duration_q
+                part.append(m_note)
+
+                current_time = start + (duration_q / seconds_to_quarter)
+
+        part.makeMeasures(inPlace=True)
+        part.makeNotation(inPlace=True)
+        m21score.append(part)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        m21score.write("musicxml", str(output_path))
+        logger.info("musicxml_simple_written", job_id=job_id, musicxml=str(output_path), notes=len(score), bpm=bpm)
+        return output_path
+
+
+SCORE_WRITERS: dict[str, ScoreWriter] = {
+    Gp5Writer.name: Gp5Writer(),
+    MusicXmlWriter.name: MusicXmlWriter(),
+    Music21MusicXmlWriter.name: Music21MusicXmlWriter(),
+}
+
+
+def register_writer(writer: ScoreWriter) -> ScoreWriter:
+    """Add an output format; `midi_to_gp5(..., extra_formats=...)` can then emit it."""
+    SCORE_WRITERS[writer.name] = writer
+    return writer
+
+
+def get_writer(name: str) -> ScoreWriter:
+    """Resolve a registered writer or report all available names."""
+    try:
+        return SCORE_WRITERS[name]
+    except KeyError as exc:
+        available = ", ".join(sorted(SCORE_WRITERS))
+        raise ValueError(f"Unknown tab format {name!r}; available: {available}") from exc
+
+
+def midi_to_gp5(
     midi_path: Path,
     output_path: Path,
     *,
-    tempo: int | None = None,
+    strings: int = 4,
+    tuning: str | Sequence[int] = DEFAULT_TUNING,
+    extra_formats: Sequence[str] = ("musicxml",),
     job_id: str | None = None,
-) -> None:
-    """Emit a single-voice MusicXML that AlphaTab can safely render while keeping timing."""
-    try:
-        import pretty_midi  # type: ignore
-        from music21 import instrument, meter, note, stream, tempo as m21tempo  # type: ignore
-    except Exception as exc:  # pragma: no cover - dependency guard
-        logger.warning("musicxml_dependencies_missing", job_id=job_id, error=str(exc))
-        return
+) -> Path:
+    """Convert a MIDI file to a minimal GP5 bass tab.
 
+    The MIDI is parsed once into a `Score` that every writer shares; each of `extra_formats` is
+    written next to `output_path` with the writer's suffix.
+    `tuning` is a registered tuning name or a custom MIDI list (see `resolve_tuning`); tunings
+    that do not resolve for `strings` raise ValueError before anything is written.
+    On failure, falls back to emitting a MusicXML file so that AlphaTab can still import the result.
+    """
     if not midi_path.exists():
-        logger.warning("musicxml_midi_missing", job_id=job_id, midi=str(midi_path))
-        return
-
-    midi = pretty_midi.PrettyMIDI(str(midi_path))
-    notes_raw: list[Tuple[float, float, int]] = []
-    for inst in midi.instruments:
-        for n in inst.notes:
-            if n.end > n.start:
-                notes_raw.append((n.start, n.end, n.pitch))
-    notes_raw.sort(key=lambda x: x[0])
-
-    if tempo is not None and tempo > 0:
-        bpm = tempo
-    else:
-        tempo_times, tempi = midi.get_tempo_changes()
-        bpm = float(tempi[0]) if len(tempi) > 0 and tempi[0] > 0 else float(midi.estimate_tempo() or 120)
-    if bpm <= 0:
-        bpm = 120.0
-
-    score = stream.Score()
-    part = stream.Part()
-    part.insert(0, m21tempo.MetronomeMark(number=bpm))
-    part.insert(0, meter.TimeSignature("4/4"))
-    part.insert(0, instrument.ElectricBass())
-
-    if not notes_raw:
-        part.append(note.Rest(quarterLength=4.0))
-    else:
-        seconds_to_quarter = bpm / 60.0
-        current_time = 0.0
-
-        for start, end, pitch in notes_raw:
-            # fill rest if there is a gap
-            if start > current_time:
-                rest_q = max(0.25, (start - current_time) * seconds_to_quarter)
-                rest_q = _quantize_quarter(rest_q)
-                part.append(note.Rest(quarterLength=rest_q))
-                current_time = start
-
-            duration_q = max(0.25, (end - start) * seconds_to_quarter)
-            # clamp extremely long durations to avoid rendering issues
-            duration_q = min(duration_q, 8.0)
-            duration_q = _quantize_quarter(duration_q)
-
-            m_note = note.Note()
-            m_note.pitch.midi = pitch
-            m_note.quarterLength = duration_q
-            part.append(m_note)
-
-            current_time = start + (duration_q / seconds_to_quarter)
-
-    part.makeMeasures(inPlace=True)
-    part.makeNotation(inPlace=True)
-    score.append(part)
+        raise FileNotFoundError(f"MIDI not found: {midi_path}")
+    open_strings = resolve_tuning(tuning, strings)
+    writers = [get_writer(name) for name in extra_formats]
+
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    score.write("musicxml", str(output_path))
-    logger.info("musicxml_simple_written", job_id=job_id, musicxml=str(output_path), notes=len(notes_raw), bpm=bpm)
+
+    logger.info(
+        "tab_generation_start",
+        job_id=job_id,
+        midi=str(midi_path),
+        gp5=str(output_path),
+        tuning=list(open_strings),
+    )
+
+    score = load_score(midi_path)
+    try:
+        get_writer("gp5").write(score, output_path, tuning=open_strings, job_id=job_id)
+        for writer in writers:
+            writer.write(score, output_path.with_suffix(writer.suffix), tuning=open_strings, job_id=job_id)
+        return output_path
+    except Exception as exc:  # pragma: no cover - defensive fallback
+        logger.warning("tab_generation_fallback", job_id=job_id, error=str(exc))
+
+        fallback_path = output_path.with_suffix(MusicXmlWriter.suffix)
+        get_writer(MusicXmlWriter.name).write(score, fallback_path, tuning=open_strings, job_id=job_id)
+        return fallback_path
 
 
 def _quantize_quarter(value: float) -> float:
@@ -207,5 +312,3 @@ def _quantize_quarter(value: float) -> float:
     if quantized <= 0:
         quantized = step
     return quantized
-
-
@@ -2,43 +2,489 @@
 
 from __future__ import annotations
 
+import argparse
 import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
+from typing import Any, Sequence
 
 import structlog
 
+from src.pipelines.decode import is_pcm, load_pcm
+
 logger = structlog.get_logger()
 
+# Tensor names of the packaged ICASSP 2022 ONNX graph.
+ONNX_INPUT_NAME = "serving_default_input_2:0"
+ONNX_OUTPUT_NAMES = {
+    "note": "StatefulPartitionedCall:1",
+    "onset": "StatefulPartitionedCall:2",
+    "contour": "StatefulPartitionedCall:0",
+}
+# Overlap between consecutive model windows, in output frames (Basic Pitch's default).
+N_OVERLAPPING_FRAMES = 30
+POSTERIOR_NAMES = tuple(ONNX_OUTPUT_NAMES)
+POSTERIORS_SUFFIX = ".posteriors"
+GRAPH_OPTIMIZATION_LEVELS = ("disable", "basic", "extended", "all")
+EXECUTION_MODES = ("sequential", "parallel")
+
+
+@dataclass(frozen=True)
+class SessionOptions:
+    """ONNX Runtime settings for the Basic Pitch session; 0 threads lets ORT decide."""
+
+    intra_op_threads: int = 0
+    inter_op_threads: int = 0
+    graph_optimization: str = "all"
+    execution_mode: str = "sequential"
+
+    def to_ort(self) -> Any:
+        import onnxruntime as ort
+
+        if self.graph_optimization not in GRAPH_OPTIMIZATION_LEVELS:
+            available = ", ".join(GRAPH_OPTIMIZATION_LEVELS)
+            raise ValueError(f"Unknown graph optimization {self.graph_optimization!r}; available: {available}")
+        if self.execution_mode not in EXECUTION_MODES:
+            available = ", ".join(EXECUTION_MODES)
+            raise ValueError(f"Unknown execution mode {self.execution_mode!r}; available: {available}")
 
-def transcribe_midi(input_wav: Path, output_dir: Path, *, job_id: str | None = None) -> Path:
-    """Run Basic Pitch (ONNX) on a WAV file and return the generated MIDI path.
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = self.inter_op_threads
+        options.graph_optimization_level = {
+            "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+            "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+            "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+            "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+        }[self.graph_optimization]
+        options.execution_mode = {
+            "sequential": ort.ExecutionMode.ORT_SEQUENTIAL,
+            "parallel": ort.ExecutionMode.ORT_PARALLEL,
+        }[self.execution_mode]
+        return options
 
-    The packaged ONNX model (`ICASSP_2022_MODEL_PATH`) is used; TensorFlow is not required.
+    def as_metadata(self) -> dict[str, str | int]:
+        return asdict(self)
+
+
+class BasicPitchEngine:
+    """Long-lived Basic Pitch transcriber holding one ONNX Runtime session.
+
+    The session is created lazily on first use and shared by every later call in the process.
     """
-    if not input_wav.exists():
-        raise FileNotFoundError(f"Input audio not found: {input_wav}")
 
-    output_dir.mkdir(parents=True, exist_ok=True)
+    def __init__(
+        self,
+        model_path: Path | None = None,
+        *,
+        options: SessionOptions | None = None,
+        batch_size: int = 16,
+    ) -> None:
+        self.model_path = model_path
+        self.options = options or SessionOptions()
+        self.batch_size = batch_size
+        self._session: Any = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._session is not None
+
+    @property
+    def session(self) -> Any:
+        # Batching and handoff threads may ask for the first session at once; build only one.
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._create_session()
+        return self._session
+
+    def _create_session(self) -> Any:
+        # Ensure ONNX backend is chosen even if other runtimes are present.
+        os.environ.setdefault("BASIC_PITCH_MODEL_SERIALIZATION", "onnx")
+        import onnxruntime as ort
+
+        if self.model_path is None:
+            from basic_pitch import inference
+
+            self.model_path = Path(inference.ICASSP_2022_MODEL_PATH)
+
+        logger.info("basic_pitch_session_create", model_path=str(self.model_path), **self.options.as_metadata())
+        return ort.InferenceSession(
+            str(self.model_path),
+            sess_options=self.options.to_ort(),
+            providers=["CPUExecutionProvider"],
+        )
+
+    def predict_windows(self, windows: Any) -> dict[str, Any]:
+        """Run (n_windows, AUDIO_N_SAMPLES, 1) windows through the session, `batch_size` at a time."""
+        import numpy as np
+
+        batches: dict[str, list[Any]] = {name: [] for name in ONNX_OUTPUT_NAMES}
+        for start in range(0, len(windows), self.batch_size):
+            batch = np.ascontiguousarray(windows[start : start + self.batch_size], dtype=np.float32)
+            outputs = self.session.run(list(ONNX_OUTPUT_NAMES.values()), {ONNX_INPUT_NAME: batch})
+            for name, values in zip(ONNX_OUTPUT_NAMES, outputs):
+                batches[name].append(values)
+        return {name: np.concatenate(values) for name, values in batches.items()}
+
+    def load_windows(self, input_wav: Path, audio: Any = None) -> tuple[Any, int]:
+        """Decode audio into model windows plus its original length in samples.
+
+        Canonical Basic Pitch PCM (see `src.pipelines.decode`) is memory-mapped instead of decoded,
+        and already-decoded mono 22.05 kHz `audio` is windowed as is without touching `input_wav`.
+        """
+        if audio is not None:
+            if audio.ndim != 1:
+                raise ValueError(f"Expected mono Basic Pitch audio, got shape {audio.shape}")
+        elif is_pcm(input_wav):
+            audio = load_pcm(input_wav)
+            if audio.ndim != 1:
+                raise ValueError(f"Expected mono Basic Pitch PCM, got shape {audio.shape}: {input_wav}")
+        else:
+            import librosa
+            from basic_pitch.constants import AUDIO_SAMPLE_RATE
+
+            audio, _ = librosa.load(str(input_wav), sr=AUDIO_SAMPLE_RATE, mono=True)
+        return window_audio(audio), len(audio)
+
+    def predict_many(self, loaded: Sequence[tuple[Any, int]]) -> list[dict[str, Any]]:
+        """Run the windows of several files through shared batches and split the posteriors per file."""
+        import numpy as np
+        from basic_pitch.inference import unwrap_output
+
+        if not loaded:
+            return []
+        output = self.predict_windows(np.concatenate([windows for windows, _ in loaded]))
+        bounds = np.cumsum([0] + [len(windows) for windows, _ in loaded])
+        return [
+            {
+                name: unwrap_output(values[bounds[i] : bounds[i + 1]], original_length, N_OVERLAPPING_FRAMES)
+                for name, values in output.items()
+            }
+            for i, (_, original_length) in enumerate(loaded)
+        ]
+
+    def infer_many(self, input_wavs: Sequence[Path]) -> list[dict[str, Any]]:
+        """Return posteriors for several files, inferred in shared batches."""
+        return self.predict_many([self.load_windows(input_wav) for input_wav in input_wavs])
+
+    def infer(self, input_wav: Path, audio: Any = None) -> dict[str, Any]:
+        """Return the note, onset and contour posteriors for an audio file (or its decoded `audio`)."""
+        return self.predict_many([self.load_windows(input_wav, audio)])[0]
+
+    def transcribe(
+        self,
+        input_wav: Path,
+        output_dir: Path,
+        *,
+        keep_posteriors: bool = False,
+        audio: Any = None,
+    ) -> Path:
+        """Transcribe an audio file into `<output_dir>/<stem>.mid`.
+
+        With `keep_posteriors`, the raw activations are also saved next to the MIDI (see
+        `save_posteriors`) so the notes can later be re-thresholded without inference. `audio`
+        (see `load_windows`) skips reading `input_wav`, which then only names the output.
+        """
+        posteriors = self.infer(input_wav, audio)
+        return _write_transcription(posteriors, input_wav, output_dir, keep_posteriors=keep_posteriors)
+
+
+def window_audio(audio: Any) -> Any:
+    """Split mono 22.05 kHz audio into (n_windows, AUDIO_N_SAMPLES, 1) model windows.
+
+    Same windows as Basic Pitch's `get_audio_input`, but as strided views of one padded buffer
+    instead of a copy per window.
+    """
+    import numpy as np
+    from basic_pitch.constants import AUDIO_N_SAMPLES, FFT_HOP
+
+    overlap_len = N_OVERLAPPING_FRAMES * FFT_HOP
+    hop_size = AUDIO_N_SAMPLES - overlap_len
+    lead = overlap_len // 2
+    n_windows = max(1, -(-(len(audio) + lead) // hop_size))
+    padded = np.zeros((n_windows - 1) * hop_size + AUDIO_N_SAMPLES, dtype=np.float32)
+    padded[lead : lead + len(audio)] = audio
+    windows = np.lib.stride_tricks.sliding_window_view(padded, AUDIO_N_SAMPLES)[::hop_size]
+    return windows[:, :, None]
+
+
+@dataclass
+class _BatchRequest:
+    input_wav: Path
+    audio: Any = None
+    future: Future[dict[str, Any]] = field(default_factory=Future)
+
+
+class BatchingTranscriber:
+    """Coalesce concurrent transcription requests into shared ONNX batches.
+
+    Callers on different threads (e.g. a Celery worker running `--pool threads`) block on their
+    own request while a dispatcher thread waits up to `max_wait_seconds` for up to `max_jobs`
+    requests, decodes them, runs their windows through `engine` together and hands each caller
+    its own posteriors.
+    """
+
+    def __init__(self, engine: BasicPitchEngine, *, max_jobs: int = 8, max_wait_seconds: float = 0.05) -> None:
+        self.engine = engine
+        self.max_jobs = max_jobs
+        self.max_wait_seconds = max_wait_seconds
+        self._queue: queue.Queue[_BatchRequest] = queue.Queue()
+        self._dispatcher: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def options(self) -> SessionOptions:
+        return self.engine.options
+
+    def _ensure_dispatcher(self) -> None:
+        with self._lock:
+            if self._dispatcher is None or not self._dispatcher.is_alive():
+                self._dispatcher = threading.Thread(target=self._dispatch_forever, name="basic-pitch-batcher", daemon=True)
+                self._dispatcher.start()
+
+    def _collect(self) -> list[_BatchRequest]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_seconds
+        while len(batch) < self.max_jobs:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _dispatch_forever(self) -> None:
+        while True:
+            batch = self._collect()
+            # This thread serves every later caller too; an unexpected error fails only its batch.
+            try:
+                self._run_batch(batch)
+            except Exception as exc:
+                logger.exception("basic_pitch_batch_failed", jobs=len(batch), error=str(exc))
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(exc)
+
+    def _run_batch(self, batch: list[_BatchRequest]) -> None:
+        started = time.perf_counter()
+        requests: list[_BatchRequest] = []
+        loaded: list[tuple[Any, int]] = []
+        for request in batch:
+            # A file that fails to decode only fails its own caller.
+            try:
+                loaded.append(self.engine.load_windows(request.input_wav, request.audio))
+            except Exception as exc:
+                request.future.set_exception(exc)
+                continue
+            requests.append(request)
+        if not requests:
+            return
+
+        try:
+            results = self.engine.predict_many(loaded)
+        except Exception as exc:
+            for request in requests:
+                request.future.set_exception(exc)
+            return
+
+        for request, posteriors in zip(requests, results):
+            request.future.set_result(posteriors)
+        logger.info(
+            "basic_pitch_batch_complete",
+            jobs=len(requests),
+            windows=sum(len(windows) for windows, _ in loaded),
+            seconds=round(time.perf_counter() - started, 3),
+        )
+
+    def infer(self, input_wav: Path, audio: Any = None) -> dict[str, Any]:
+        """Queue one file for the next shared batch and wait for its posteriors."""
+        self._ensure_dispatcher()
+        request = _BatchRequest(input_wav, audio)
+        self._queue.put(request)
+        return request.future.result()
+
+    def transcribe(
+        self,
+        input_wav: Path,
+        output_dir: Path,
+        *,
+        keep_posteriors: bool = False,
+        audio: Any = None,
+    ) -> Path:
+        """Same contract as `BasicPitchEngine.transcribe`, but inference runs in a shared batch."""
+        posteriors = self.infer(input_wav, audio)
+        return _write_transcription(posteriors, input_wav, output_dir, keep_posteriors=keep_posteriors)
+
+
+def _write_transcription(
+    posteriors: dict[str, Any],
+    input_wav: Path,
+    output_dir: Path,
+    *,
+    keep_posteriors: bool,
+) -> Path:
     midi_path = output_dir / f"{input_wav.stem}.mid"
+    if keep_posteriors:
+        save_posteriors(posteriors, posteriors_dir_for(midi_path))
+    midi_data = posteriors_to_midi(posteriors)
+    midi_data.write(str(midi_path))
+    return midi_path
+
+
+def posteriors_dir_for(midi_path: Path) -> Path:
+    """Directory holding the cached posteriors of a transcribed MIDI (`bass.mid` -> `bass.posteriors/`)."""
+    return midi_path.with_suffix(POSTERIORS_SUFFIX)
+
+
+def save_posteriors(posteriors: dict[str, Any], directory: Path) -> Path:
+    """Write each activation matrix as a standalone `.npy` so it can be memory-mapped on load."""
+    import numpy as np
+
+    directory.mkdir(parents=True, exist_ok=True)
+    for name in POSTERIOR_NAMES:
+        np.save(directory / f"{name}.npy", np.asarray(posteriors[name], dtype=np.float32))
+    return directory
+
+
+def load_posteriors(directory: Path) -> dict[str, Any]:
+    """Memory-map cached posteriors written by `save_posteriors`."""
+    import numpy as np
+
+    missing = [name for name in POSTERIOR_NAMES if not (directory / f"{name}.npy").is_file()]
+    if missing:
+        raise FileNotFoundError(f"Cached posteriors missing in {directory}: {', '.join(missing)}")
+    return {name: np.load(directory / f"{name}.npy", mmap_mode="r") for name in POSTERIOR_NAMES}
+
+
+def retranscribe_midi(
+    posteriors_dir: Path,
+    output_path: Path,
+    *,
+    onset_threshold: float = 0.5,
+    frame_threshold: float = 0.3,
+    minimum_note_length_ms: float = 127.70,
+    job_id: str | None = None,
+) -> Path:
+    """Rebuild a MIDI file from cached posteriors with new note-decoding thresholds."""
+    posteriors = load_posteriors(posteriors_dir)
+    midi_data = posteriors_to_midi(
+        posteriors,
+        onset_threshold=onset_threshold,
+        frame_threshold=frame_threshold,
+        minimum_note_length_ms=minimum_note_length_ms,
+    )
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    midi_data.write(str(output_path))
+    logger.info(
+        "retranscription_complete",
+        job_id=job_id,
+        midi_path=str(output_path),
+        notes=sum(len(inst.notes) for inst in midi_data.instruments),
+        onset_threshold=onset_threshold,
+        frame_threshold=frame_threshold,
+        minimum_note_length_ms=minimum_note_length_ms,
+    )
+    return output_path
+
+
+def posteriors_to_midi(
+    posteriors: dict[str, Any],
+    *,
+    onset_threshold: float = 0.5,
+    frame_threshold: float = 0.3,
+    minimum_note_length_ms: float = 127.70,
+) -> Any:
+    """Decode Basic Pitch posteriors into MIDI using the same defaults as `inference.predict`."""
+    from basic_pitch import note_creation as infer
+    from basic_pitch.constants import AUDIO_SAMPLE_RATE, FFT_HOP
+
+    min_note_len = int(round(minimum_note_length_ms / 1000 * (AUDIO_SAMPLE_RATE / FFT_HOP)))
+    midi_data, _ = infer.model_output_to_notes(
+        posteriors,
+        onset_thresh=onset_threshold,
+        frame_thresh=frame_threshold,
+        min_note_len=min_note_len,
+        min_freq=None,
+        max_freq=None,
+        multiple_pitch_bends=False,
+        melodia_trick=True,
+        midi_tempo=120,
+    )
+    return midi_data
 
-    # Ensure ONNX backend is chosen even if other runtimes are present.
-    os.environ.setdefault("BASIC_PITCH_MODEL_SERIALIZATION", "onnx")
+
+_ENGINES: dict[SessionOptions, BasicPitchEngine] = {}
+
+
+def get_transcriber(options: SessionOptions | None = None) -> BasicPitchEngine:
+    """Return the process-wide transcriber for a session configuration, creating it on first use."""
+    key = options or SessionOptions()
+    engine = _ENGINES.get(key)
+    if engine is None:
+        engine = BasicPitchEngine(options=key)
+        _ENGINES[key] = engine
+    return engine
+
+
+_BATCHERS: dict[tuple[SessionOptions, int, float], BatchingTranscriber] = {}
+
+
+def get_batching_transcriber(
+    options: SessionOptions | None = None,
+    *,
+    max_jobs: int = 8,
+    max_wait_seconds: float = 0.05,
+) -> BatchingTranscriber:
+    """Return the process-wide batching front for the shared transcriber of `options`."""
+    key = (options or SessionOptions(), max_jobs, max_wait_seconds)
+    batcher = _BATCHERS.get(key)
+    if batcher is None:
+        batcher = BatchingTranscriber(get_transcriber(options), max_jobs=max_jobs, max_wait_seconds=max_wait_seconds)
+        _BATCHERS[key] = batcher
+    return batcher
+
+
+def transcribe_midi(
+    input_wav: Path,
+    output_dir: Path,
+    *,
+    job_id: str | None = None,
+    engine: BasicPitchEngine | BatchingTranscriber | None = None,
+    keep_posteriors: bool = False,
+    audio: Any = None,
+) -> Path:
+    """Run Basic Pitch (ONNX) on a WAV file or Basic Pitch PCM and return the generated MIDI path.
+
+    The packaged ONNX model (`ICASSP_2022_MODEL_PATH`) runs on a shared, per-process ONNX Runtime
+    session; TensorFlow is not required. `keep_posteriors` caches the raw activations for
+    `retranscribe_midi`. With in-memory `audio` (mono 22.05 kHz), `input_wav` need not exist
+    yet and only names the MIDI.
+    """
+    if audio is None and not input_wav.exists():
+        raise FileNotFoundError(f"Input audio not found: {input_wav}")
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    engine = engine or get_transcriber()
 
     logger.info(
         "transcription_start",
         job_id=job_id,
         input_wav=str(input_wav),
         output_dir=str(output_dir),
+        in_memory=audio is not None,
     )
 
     try:
-        from basic_pitch import inference
-
-        _, midi_data, _ = inference.predict(
-            audio_path=input_wav,
-            model_or_model_path=inference.ICASSP_2022_MODEL_PATH,
-        )
-        midi_data.write(str(midi_path))
+        midi_path = engine.transcribe(input_wav, output_dir, keep_posteriors=keep_posteriors, audio=audio)
     except Exception as exc:  # pragma: no cover - defensive guard
         logger.exception("transcription_failed", job_id=job_id, error=str(exc))
         raise
@@ -49,3 +495,37 @@ def transcribe_midi(input_wav: Path, output_dir: Path, *, job_id: str | None = N
     logger.info("transcription_complete", job_id=job_id, midi_path=str(midi_path))
     return midi_path
 
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the re-thresholding CLI parser."""
+    parser = argparse.ArgumentParser(
+        description="Rebuild MIDI from cached Basic Pitch posteriors with new thresholds.",
+    )
+    parser.add_argument("--posteriors", required=True, type=Path, help="Cached posteriors directory")
+    parser.add_argument("--output", required=True, type=Path, help="MIDI file to write")
+    parser.add_argument("--onset-threshold", type=float, default=0.5)
+    parser.add_argument("--frame-threshold", type=float, default=0.3)
+    parser.add_argument("--minimum-note-length-ms", type=float, default=127.70)
+    return parser
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Run the CLI and return a process exit code."""
+    args = build_parser().parse_args(argv)
+    try:
+        midi_path = retranscribe_midi(
+            args.posteriors,
+            args.output,
+            onset_threshold=args.onset_threshold,
+            frame_threshold=args.frame_threshold,
+            minimum_note_length_ms=args.minimum_note_length_ms,
+        )
+    except FileNotFoundError as exc:
+        print(f"transcription: error: {exc}", file=sys.stderr)
+        return 2
+    print(f"MIDI: {midi_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
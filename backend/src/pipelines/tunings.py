@@ -0,0 +1,69 @@
+"""Registry of bass tunings as open-string MIDI pitches (lowest string first)."""
+
+from __future__ import annotations
+
+from typing import Sequence
+
+DEFAULT_TUNING = "standard"
+MAX_STRINGS = 8
+
+# MIDI numbers for standard bass tunings (4/5/6 strings)
+STANDARD_TUNINGS: dict[int, tuple[int, ...]] = {
+    4: (40, 45, 50, 55),  # E1 A1 D2 G2
+    5: (35, 40, 45, 50, 55),  # B0 E1 A1 D2 G2
+    6: (28, 33, 38, 43, 47, 52),  # E0 A0 D1 G1 B1 E2 (approx)
+}
+
+
+def _drop_lowest(tuning: Sequence[int]) -> tuple[int, ...]:
+    return (tuning[0] - 2, *tuning[1:])
+
+
+def _half_step_down(tuning: Sequence[int]) -> tuple[int, ...]:
+    return tuple(pitch - 1 for pitch in tuning)
+
+
+TUNINGS: dict[str, dict[int, tuple[int, ...]]] = {
+    "standard": STANDARD_TUNINGS,
+    "drop_d": {strings: _drop_lowest(tuning) for strings, tuning in STANDARD_TUNINGS.items()},
+    "half_step_down": {strings: _half_step_down(tuning) for strings, tuning in STANDARD_TUNINGS.items()},
+    "bead": {4: (35, 40, 45, 50)},  # B0 E1 A1 D2: a 5-string range on four strings
+}
+
+
+def _normalize_name(name: str) -> str:
+    return name.strip().lower().replace("-", "_").replace(" ", "_")
+
+
+def _parse_custom(spec: str) -> tuple[int, ...]:
+    try:
+        pitches = tuple(int(part) for part in spec.split(","))
+    except ValueError:
+        raise ValueError(f"Invalid custom tuning {spec!r}; expected comma-separated MIDI numbers") from None
+    if not 1 <= len(pitches) <= MAX_STRINGS or not all(0 <= pitch <= 127 for pitch in pitches):
+        raise ValueError(f"Invalid custom tuning {spec!r}; expected 1-{MAX_STRINGS} MIDI numbers in 0-127")
+    return pitches
+
+
+def resolve_tuning(tuning: str | Sequence[int], strings: int) -> tuple[int, ...]:
+    """Return open-string pitches for a registered tuning name or a custom MIDI list.
+
+    Names are case-insensitive and accept `-` or spaces for `_` (`Drop-D`, `half step down`).
+    A custom tuning is either a sequence of ints or a comma-separated string such as
+    `"38,45,50,55"`, listed from the lowest string; its length must match `strings`.
+    """
+    if isinstance(tuning, str) and not tuning.strip()[:1].isdigit():
+        name = _normalize_name(tuning)
+        if name not in TUNINGS:
+            available = ", ".join(sorted(TUNINGS))
+            raise ValueError(f"Unknown tuning {tuning!r}; available: {available} or a comma-separated MIDI list")
+        variants = TUNINGS[name]
+        if strings not in variants:
+            supported = ", ".join(str(count) for count in sorted(variants))
+            raise ValueError(f"Tuning {name!r} is not defined for {strings} strings; supported: {supported}")
+        return variants[strings]
+
+    pitches = _parse_custom(tuning) if isinstance(tuning, str) else _parse_custom(",".join(map(str, tuning)))
+    if len(pitches) != strings:
+        raise ValueError(f"Custom tuning has {len(pitches)} strings but {strings} were requested")
+    return pitches
@@ -1,7 +1,20 @@
-from celery import Celery
+from celery import Celery, chain
+from celery.canvas import Signature
 
 from src.core.config import settings
 
+# Tasks are referenced by name so processes that only enqueue (the API) never import
+# src.worker.tasks and the ML stack behind it.
+SEPARATE_STAGE = "src.worker.tasks.separate_stage"
+TRANSCRIBE_STAGE = "src.worker.tasks.transcribe_stage"
+RENDER_STAGE = "src.worker.tasks.render_stage"
+RETRANSCRIBE_JOB = "src.worker.tasks.retranscribe_job"
+RETAB_JOB = "src.worker.tasks.retab_job"
+PROCESS_JOB = "src.worker.tasks.process_job"
+# `chain` runs each stage as its own task on its own queue; `inprocess` runs the whole job as one
+# `process_job` task on the default queue, handing the bass stem to Basic Pitch in memory.
+PIPELINE_MODES = ("chain", "inprocess")
+
 celery_app = Celery(
     "stem2tab",
     broker=settings.celery_broker_url,
@@ -16,5 +29,31 @@ celery_app.conf.update(
     timezone="UTC",
     enable_utc=True,
     worker_prefetch_multiplier=1,
+    task_routes={
+        SEPARATE_STAGE: {"queue": "separation"},
+        TRANSCRIBE_STAGE: {"queue": "transcription"},
+        RETRANSCRIBE_JOB: {"queue": "transcription"},
+        RENDER_STAGE: {"queue": "render"},
+        RETAB_JOB: {"queue": "render"},
+    },
 )
 
+
+def pipeline(job_id: str, payload: dict, mode: str | None = None) -> Signature:
+    """Build the job's signature for `mode` (default `settings.pipeline_mode`, see `PIPELINE_MODES`).
+
+    In `chain` mode each stage is routed to its own queue and hands artifacts on by path.
+    Enqueue with `pipeline(...).apply_async(task_id=job_id)`: Celery assigns the id to the final
+    stage, so the job's result and status live under the job id. Where the tasks are not
+    registered (the API process) the signatures are sent by name, as `send_task` would.
+    """
+    mode = mode or settings.pipeline_mode
+    if mode not in PIPELINE_MODES:
+        raise ValueError(f"Unknown pipeline mode {mode!r}; available: {', '.join(PIPELINE_MODES)}")
+    if mode == "inprocess":
+        return celery_app.signature(PROCESS_JOB, args=(job_id, payload))
+    return chain(
+        celery_app.signature(SEPARATE_STAGE, args=(job_id, payload)),
+        celery_app.signature(TRANSCRIBE_STAGE),
+        celery_app.signature(RENDER_STAGE),
+    )
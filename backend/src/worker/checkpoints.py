@@ -0,0 +1,44 @@
+"""Per-stage completion checkpoints so a re-run job skips work already in its directory."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Mapping
+
+from src.api.schemas import StageCheckpoint
+
+_CHUNK_BYTES = 1 << 20
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _normalize(params: Mapping[str, Any]) -> dict[str, Any]:
+    # Compare parameters the way they come back from metadata.json (tuples become lists, etc.).
+    return json.loads(json.dumps(dict(params), sort_keys=True, default=str))
+
+
+def make_checkpoint(input_path: Path, params: Mapping[str, Any], artifacts: Mapping[str, Path]) -> StageCheckpoint:
+    return StageCheckpoint(
+        input_sha256=file_sha256(input_path),
+        params=_normalize(params),
+        artifacts={role: str(path) for role, path in artifacts.items()},
+        completed_at=datetime.now(timezone.utc),
+    )
+
+
+def is_valid(checkpoint: StageCheckpoint | None, input_path: Path, params: Mapping[str, Any]) -> bool:
+    """True when the stage already ran on this exact input with these parameters and its files remain."""
+    if checkpoint is None or checkpoint.params != _normalize(params):
+        return False
+    if not all(Path(path).exists() for path in checkpoint.artifacts.values()):
+        return False
+    return input_path.is_file() and file_sha256(input_path) == checkpoint.input_sha256
@@ -1,63 +1,50 @@
 from __future__ import annotations
 
-import json
 import os
-from datetime import datetime, timezone
+import shutil
+import threading
+from contextlib import contextmanager
 from pathlib import Path
+from time import perf_counter
+from typing import Callable, Iterator
 
 import structlog
+from celery.concurrency import get_implementation
+from celery.signals import worker_init, worker_process_init
 
-from src.api.schemas import JobStatus, JobStatusResponse
+from src.api.schemas import JobMetadata, JobStatus, StageCheckpoint
+from src.core import jobs
 from src.core.config import settings
+from src.core.job_store import get_job_store, load_job, write_snapshot
+from src.pipelines.decode import PCM_CHANNELS, PCM_DIRNAME, PCM_SAMPLE_RATE, decode_audio
 from src.pipelines.demucs_loader import ensure_model
-from src.pipelines.separation import separate_stems
+from src.pipelines.separation import StemHandoff, separate_stems
+from src.pipelines.stem_cache import StemCache
 from src.pipelines.tab import midi_to_gp5
-from src.pipelines.transcription import transcribe_midi
+from src.pipelines.transcription import (
+    BasicPitchEngine,
+    BatchingTranscriber,
+    SessionOptions,
+    get_batching_transcriber,
+    get_transcriber,
+    posteriors_dir_for,
+    retranscribe_midi,
+    transcribe_midi,
+)
+from src.pipelines.tunings import DEFAULT_TUNING, resolve_tuning
 from src.worker.app import celery_app
+from src.worker.checkpoints import is_valid, make_checkpoint
 
 logger = structlog.get_logger()
 
-METADATA_FILENAME = "metadata.json"
+# Basic Pitch note-decoding defaults; the transcription checkpoint records them.
+DEFAULT_NOTE_THRESHOLDS = {"onset_threshold": 0.5, "frame_threshold": 0.3, "minimum_note_length_ms": 127.70}
+# Pools that send `worker_process_init` from the process that runs the tasks.
+_PROCESS_INIT_POOLS = {"celery.concurrency.prefork", "celery.concurrency.solo"}
 
 
-def _now_utc() -> datetime:
-    return datetime.now(timezone.utc)
-
-
-def _job_dir(job_id: str) -> Path:
-    return settings.file_bucket_path / job_id
-
-
-def _metadata_path(job_id: str) -> Path:
-    return _job_dir(job_id) / METADATA_FILENAME
-
-
-def _list_job_files(job_id: str) -> list[str]:
-    job_dir = _job_dir(job_id)
-    if not job_dir.exists():
-        return []
-
-    files: list[str] = []
-    for path in job_dir.iterdir():
-        if path.name == METADATA_FILENAME or path.is_dir():
-            continue
-        files.append(path.name)
-    files.sort()
-    return files
-
-
-def _load_metadata(job_id: str) -> JobStatusResponse | None:
-    meta_path = _metadata_path(job_id)
-    if not meta_path.exists():
-        return None
-    data = json.loads(meta_path.read_text(encoding="utf-8"))
-    return JobStatusResponse.model_validate(data)
-
-
-def _write_metadata(payload: JobStatusResponse) -> None:
-    meta_path = _metadata_path(payload.job_id)
-    meta_path.parent.mkdir(parents=True, exist_ok=True)
-    meta_path.write_text(payload.model_dump_json(), encoding="utf-8")
+def _load_metadata(job_id: str) -> JobMetadata | None:
+    return load_job(job_id)
 
 
 def _update_metadata(
@@ -67,63 +54,265 @@ def _update_metadata(
     progress: int | None = None,
     error: str | None = None,
     refresh_files: bool = False,
-) -> JobStatusResponse:
-    metadata = _load_metadata(job_id)
-    if metadata is None:
-        now = _now_utc()
-        metadata = JobStatusResponse(
-            job_id=job_id,
-            status=status or JobStatus.PENDING,
-            progress=progress or 0,
-            created_at=now,
-            updated_at=now,
-            files=_list_job_files(job_id),
-            error=None,
-        )
+) -> JobMetadata:
+    """Update only the given status fields; a finished job also gets its metadata.json snapshot."""
+    changes: dict[str, object] = {}
     if status is not None:
-        metadata.status = status
+        changes["status"] = status
     if progress is not None:
-        metadata.progress = progress
+        changes["progress"] = progress
     if error is not None:
-        metadata.error = error
+        changes["error"] = error
     if refresh_files:
-        metadata.files = _list_job_files(job_id)
+        changes["files"] = jobs.list_job_files(job_id)
 
-    metadata.updated_at = _now_utc()
-    _write_metadata(metadata)
+    store = get_job_store()
+    store.update(job_id, **changes)
+    metadata = store.get(job_id)
+    if status in (JobStatus.SUCCESS, JobStatus.FAILURE):
+        write_snapshot(metadata)
     return metadata
 
 
+def _completed_stage(job_id: str, stage: str, input_path: Path, params: dict) -> StageCheckpoint | None:
+    """Return the stage's checkpoint if it is still valid for this input and these parameters."""
+    metadata = _load_metadata(job_id)
+    checkpoint = metadata.stages.get(stage) if metadata is not None else None
+    if not is_valid(checkpoint, input_path, params):
+        return None
+    logger.info("stage_checkpoint_hit", job_id=job_id, stage=stage, completed_at=str(checkpoint.completed_at))
+    return checkpoint
+
+
+def _record_checkpoint(job_id: str, stage: str, input_path: Path, params: dict, artifacts: dict[str, Path]) -> None:
+    get_job_store().set_stage(job_id, stage, make_checkpoint(input_path, params, artifacts))
+
+
+def _drop_checkpoints(job_id: str, *stages: str) -> None:
+    get_job_store().drop_stages(job_id, *stages)
+
+
+def _decode_params() -> dict:
+    return {"samplerate": PCM_SAMPLE_RATE, "channels": PCM_CHANNELS}
+
+
+def _separation_params() -> dict:
+    return {"model": settings.demucs_model, "mode": settings.demucs_stem_mode}
+
+
+def _render_params(strings: int, tuning: str) -> dict:
+    return {"strings": strings, "tuning": tuning, "musicxml_writer": settings.musicxml_writer}
+
+
+def _stem_cache() -> StemCache | None:
+    if settings.stem_cache_max_bytes <= 0:
+        return None
+    return StemCache(settings.stem_cache_dir, max_bytes=settings.stem_cache_max_bytes)
+
+
+def _session_options() -> SessionOptions:
+    return SessionOptions(
+        intra_op_threads=settings.basic_pitch_intra_op_threads,
+        inter_op_threads=settings.basic_pitch_inter_op_threads,
+        graph_optimization=settings.basic_pitch_graph_optimization,
+        execution_mode=settings.basic_pitch_execution_mode,
+    )
+
+
+def _transcriber() -> BasicPitchEngine | BatchingTranscriber:
+    # Batching only pays off when the worker runs several tasks concurrently (`--pool threads`).
+    if settings.basic_pitch_batch_jobs > 1:
+        return get_batching_transcriber(
+            _session_options(),
+            max_jobs=settings.basic_pitch_batch_jobs,
+            max_wait_seconds=settings.basic_pitch_batch_wait_ms / 1000,
+        )
+    return get_transcriber(_session_options())
+
+
 def _set_basic_pitch_env() -> None:
     os.environ.setdefault("BASIC_PITCH_MODEL_SERIALIZATION", "onnx")
 
 
-def _update_state(progress: int) -> None:
+def warm_up(*, demucs: bool = True, basic_pitch: bool = True) -> dict[str, float]:
+    """Load the Demucs and/or Basic Pitch models into this process and report how long it took."""
+    _set_basic_pitch_env()
+    timings: dict[str, float] = {}
+
+    if demucs and settings.demucs_backend == "inprocess":
+        started = perf_counter()
+        ensure_model(settings.demucs_model, cache_dir=settings.demucs_cache_dir)
+        timings["demucs_seconds"] = round(perf_counter() - started, 3)
+
+    if basic_pitch:
+        started = perf_counter()
+        get_transcriber(_session_options()).session  # noqa: B018 - creates the shared ONNX Runtime session
+        timings["basic_pitch_seconds"] = round(perf_counter() - started, 3)
+
+    timings["total_seconds"] = round(sum(timings.values()), 3)
+    logger.info("worker_warm_up_complete", demucs_model=settings.demucs_model, **timings)
+    return timings
+
+
+def _consumed_queues() -> set[str]:
+    # `-Q` selects queues before the pool forks; without it only the default queue is served.
+    consume_from = celery_app.amqp.queues.consume_from
+    return set(consume_from or ()) or {celery_app.conf.task_default_queue}
+
+
+@worker_process_init.connect
+def _warm_up_worker_process(**kwargs: object) -> None:
+    # Load only what this worker's queues need so render-only workers stay small. The default
+    # queue runs `process_job`, which needs every model.
+    queues = _consumed_queues()
+    default = celery_app.conf.task_default_queue
+    # A failed warm-up must not kill the pool process; models then load lazily on the first job.
     try:
-        process_job.update_state(state=JobStatus.STARTED.value, meta={"progress": progress})
+        warm_up(
+            demucs=bool(queues & {"separation", default}),
+            basic_pitch=bool(queues & {"transcription", default}),
+        )
+    except Exception as exc:  # pragma: no cover - defensive guard
+        logger.exception("worker_warm_up_failed", error=str(exc))
+
+
+@worker_init.connect
+def _warm_up_worker(sender: object, **kwargs: object) -> None:
+    # The threads pool (which batched transcription needs) and the green pools run tasks in the
+    # worker's main process and never send `worker_process_init`; warm up before consuming.
+    if get_implementation(sender.pool_cls).__module__ not in _PROCESS_INIT_POOLS:
+        _warm_up_worker_process()
+
+
+def _update_state(job_id: str, progress: int) -> None:
+    # Progress within a stage goes to the job store only, which publishes it to the job's
+    # events channel; a store outage must not fail the job.
+    try:
+        get_job_store().update(job_id, progress=progress)
+    except Exception:  # pragma: no cover - defensive guard
+        logger.warning("job_progress_update_failed", job_id=job_id, progress=progress)
+
+
+def _stage_progress(job_id: str, start: int, end: int) -> Callable[[float], None]:
+    """Map a stage's 0-1 progress onto job progress between `start` and `end`.
+
+    Only forwards changes of whole percent and never moves backwards; Demucs restarts its
+    progress bar for every model of a bag.
+    """
+    reported = start
+
+    def report(fraction: float) -> None:
+        nonlocal reported
+        progress = start + int((end - start) * min(max(fraction, 0.0), 1.0))
+        if progress > reported:
+            reported = progress
+            _update_state(job_id, progress)
+
+    return report
+
+
+@contextmanager
+def _job_lease(job_id: str) -> Iterator[None]:
+    """Heartbeat the job's lease while a task runs it.
+
+    A worker killed mid-task stops renewing the lease, and the API's maintenance sweep marks the
+    job failed once it lapses. The lease is dropped between chained stages, so a job waiting in a
+    queue never looks stalled.
+    """
+    store = get_job_store()
+    stop = threading.Event()
+
+    def beat() -> None:
+        try:
+            store.heartbeat(job_id, timeout_seconds=settings.job_stall_timeout_seconds)
+        except Exception:  # pragma: no cover - defensive guard
+            logger.warning("job_heartbeat_failed", job_id=job_id)
+
+    def run() -> None:
+        while not stop.wait(settings.job_heartbeat_seconds):
+            beat()
+
+    beat()
+    thread = threading.Thread(target=run, name=f"job-heartbeat-{job_id}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+        try:
+            store.release(job_id)
+        except Exception:  # pragma: no cover - defensive guard
+            logger.warning("job_lease_release_failed", job_id=job_id)
+
+
+def _mark_failed(job_id: str, exc: Exception) -> None:
+    # A failing early stage stops the chain before the job-id task runs; record the failure for it.
+    try:
+        celery_app.backend.mark_as_failure(job_id, exc)
     except Exception:  # pragma: no cover - defensive guard
-        logger.warning("celery_update_state_failed", progress=progress)
+        logger.warning("celery_mark_failed_failed", job_id=job_id)
+
+
+def _fail_stage(job_id: str, stage: str, exc: Exception) -> None:
+    logger.exception("job_failed", job_id=job_id, stage=stage, error=str(exc))
+    _update_metadata(job_id, status=JobStatus.FAILURE, error=str(exc), refresh_files=True)
+    _mark_failed(job_id, exc)
+
+
+def _decode_input(job_id: str, input_path: Path) -> Path:
+    """Decode the upload once into model-rate PCM for separation; returns the `.npy` path.
+
+    The worker transcribes the bass stem rather than the input, so no Basic Pitch variant is written.
+    """
+    checkpoint = _completed_stage(job_id, "decode", input_path, _decode_params())
+    if checkpoint is not None:
+        return Path(checkpoint.artifacts["pcm"])
+    decoded = decode_audio(input_path, jobs.job_dir(job_id) / PCM_DIRNAME, basic_pitch=False, job_id=job_id)
+    _record_checkpoint(job_id, "decode", input_path, _decode_params(), decoded.artifacts())
+    return decoded.model_path
+
+
+def _drop_pcm(job_id: str) -> None:
+    # Model-rate PCM is several times the size of a compressed upload; only separation reads it.
+    shutil.rmtree(jobs.job_dir(job_id) / PCM_DIRNAME, ignore_errors=True)
+    _drop_checkpoints(job_id, "decode")
+
+
+def _render_tab(job_id: str, midi_path: Path, *, strings: int, tuning: str) -> Path:
+    gp5_path = midi_to_gp5(
+        midi_path,
+        midi_path.with_suffix(".gp5"),
+        strings=strings,
+        tuning=tuning,
+        extra_formats=(settings.musicxml_writer,),
+        job_id=job_id,
+    )
+    if not gp5_path.exists():
+        raise FileNotFoundError(f"GP5 not generated at {gp5_path}")
+    _record_checkpoint(job_id, "render", midi_path, _render_params(strings, tuning), {"tab": gp5_path})
+    return gp5_path
 
 
 @celery_app.task
-def process_job(job_id: str, payload: dict | None = None) -> dict[str, str]:
+def separate_stage(job_id: str, payload: dict | None = None) -> dict:
     """
-    Full processing pipeline: Demucs separation -> Basic Pitch -> GP5.
+    Pipeline stage 1: decode the input, then Demucs separation. Returns the job context with
+    `bass_path` added.
     """
-    if payload is None:
-        payload = {}
+    with _job_lease(job_id):
+        return _separate(job_id, payload)
 
-    cache_dir: Path = settings.demucs_cache_dir
-    ensure_model(settings.demucs_model, cache_dir=cache_dir)
-    _set_basic_pitch_env()
 
-    input_path = Path(payload.get("input_path", ""))
-    strings = int(payload.get("strings", 4))
+def _separate(job_id: str, payload: dict | None, handoff: StemHandoff | None = None) -> dict:
+    context = {**(payload or {}), "job_id": job_id}
+    _set_basic_pitch_env()
 
-    if not input_path.exists():
-        raise FileNotFoundError(f"Input audio not found: {input_path}")
+    input_path = Path(context.get("input_path", ""))
+    strings = int(context.get("strings", 4))
+    tuning = context.get("tuning") or DEFAULT_TUNING
 
-    output_dir = _job_dir(job_id)
+    output_dir = jobs.job_dir(job_id)
     output_dir.mkdir(parents=True, exist_ok=True)
 
     logger.info(
@@ -132,46 +321,208 @@ def process_job(job_id: str, payload: dict | None = None) -> dict[str, str]:
         input_path=str(input_path),
         output_dir=str(output_dir),
         strings=strings,
+        tuning=tuning,
         demucs_model=settings.demucs_model,
     )
 
     _update_metadata(job_id, status=JobStatus.STARTED, progress=5)
-    _update_state(5)
 
     try:
-        stems = separate_stems(
-            input_audio=input_path,
-            output_dir=output_dir,
-            model_name=settings.demucs_model,
-            cache_dir=cache_dir,
-            job_id=job_id,
-        )
+        if not input_path.exists():
+            raise FileNotFoundError(f"Input audio not found: {input_path}")
+        # Reject an unusable tuning before spending minutes on separation and transcription.
+        resolve_tuning(tuning, strings)
+
+        params = _separation_params()
+        checkpoint = _completed_stage(job_id, "separation", input_path, params)
+        if checkpoint is not None:
+            stems = {stem: Path(path) for stem, path in checkpoint.artifacts.items()}
+        else:
+            # The Demucs CLI decodes files itself; the in-process engine reads decoded PCM.
+            source = input_path
+            if settings.demucs_backend == "inprocess":
+                source = _decode_input(job_id, input_path)
+                _update_state(job_id, 10)
+            stems = separate_stems(
+                input_audio=source,
+                output_dir=output_dir,
+                model_name=settings.demucs_model,
+                cache_dir=settings.demucs_cache_dir,
+                job_id=job_id,
+                backend=settings.demucs_backend,
+                mode=settings.demucs_stem_mode,
+                chunk_seconds=settings.demucs_chunk_seconds,
+                cache=_stem_cache(),
+                handoff=handoff,
+                on_progress=_stage_progress(job_id, 10, 25),
+                stall_timeout_seconds=settings.demucs_stall_timeout_seconds,
+            )
+            if handoff is not None:
+                # Only valid once the stem files the handoff is still writing are complete.
+                handoff.submit(_record_checkpoint, job_id, "separation", input_path, params, stems)
+            else:
+                _record_checkpoint(job_id, "separation", input_path, params, stems)
         _update_metadata(job_id, progress=25, refresh_files=True)
-        _update_state(25)
+    except Exception as exc:
+        _fail_stage(job_id, "separation", exc)
+        raise
+
+    bass_path = stems.get("bass") or next(iter(stems.values()))
+    return {**context, "bass_path": str(bass_path)}
 
-        bass_path = stems.get("bass") or next(iter(stems.values()))
-        midi_path = transcribe_midi(bass_path, output_dir, job_id=job_id)
+
+@celery_app.task
+def transcribe_stage(context: dict) -> dict:
+    """
+    Pipeline stage 2: Basic Pitch on the bass stem. Returns the context with `midi_path` added.
+    """
+    with _job_lease(context["job_id"]):
+        return _transcribe(context)
+
+
+def _transcribe(context: dict, handoff: StemHandoff | None = None) -> dict:
+    job_id = context["job_id"]
+    bass_path = Path(context["bass_path"])
+    # The separator handed the bass stem over in memory; bass.wav may still be being written.
+    audio = None
+    if handoff is not None:
+        audio = handoff.audio
+        if audio is None:
+            handoff.wait()
+    _set_basic_pitch_env()
+    try:
+        checkpoint = None
+        if audio is None:
+            checkpoint = _completed_stage(job_id, "transcription", bass_path, DEFAULT_NOTE_THRESHOLDS)
+        if checkpoint is not None:
+            midi_path = Path(checkpoint.artifacts["midi"])
+        else:
+            midi_path = transcribe_midi(
+                bass_path,
+                jobs.job_dir(job_id),
+                job_id=job_id,
+                engine=_transcriber(),
+                keep_posteriors=True,
+                audio=audio,
+            )
+            if handoff is not None:
+                handoff.wait()
+            artifacts = {"midi": midi_path, "posteriors": posteriors_dir_for(midi_path)}
+            _record_checkpoint(job_id, "transcription", bass_path, DEFAULT_NOTE_THRESHOLDS, artifacts)
         _update_metadata(job_id, progress=55, refresh_files=True)
-        _update_state(55)
+    except Exception as exc:
+        _fail_stage(job_id, "transcription", exc)
+        raise
+    return {**context, "midi_path": str(midi_path)}
+
+
+@celery_app.task
+def render_stage(context: dict) -> dict[str, str]:
+    """
+    Pipeline stage 3: GP5/MusicXML from the MIDI, then mark the job finished.
+    """
+    with _job_lease(context["job_id"]):
+        return _render(context)
+
 
-        gp5_path = midi_to_gp5(midi_path, output_dir / "bass.gp5", strings=strings, job_id=job_id)
-        if not gp5_path.exists():
-            raise FileNotFoundError(f"GP5 not generated at {gp5_path}")
+def _render(context: dict) -> dict[str, str]:
+    job_id = context["job_id"]
+    midi_path = Path(context["midi_path"])
+    strings = int(context.get("strings", 4))
+    tuning = context.get("tuning") or DEFAULT_TUNING
+    try:
+        if _completed_stage(job_id, "render", midi_path, _render_params(strings, tuning)) is None:
+            _render_tab(job_id, midi_path, strings=strings, tuning=tuning)
         _update_metadata(job_id, progress=80, refresh_files=True)
-        _update_state(80)
 
+        _drop_pcm(job_id)
         metadata = _update_metadata(job_id, status=JobStatus.SUCCESS, progress=100, refresh_files=True)
-        _update_state(100)
-
-        logger.info(
-            "job_complete",
-            job_id=job_id,
-            files=metadata.files,
-        )
-        return {"job_id": job_id, "files": metadata.files}
     except Exception as exc:
-        logger.exception("job_failed", job_id=job_id, error=str(exc))
-        _update_metadata(job_id, status=JobStatus.FAILURE, error=str(exc), refresh_files=True)
+        _fail_stage(job_id, "render", exc)
         raise
 
+    logger.info(
+        "job_complete",
+        job_id=job_id,
+        files=metadata.files,
+    )
+    return {"job_id": job_id, "files": metadata.files}
+
 
+@celery_app.task
+def process_job(job_id: str, payload: dict | None = None) -> dict[str, str]:
+    """
+    Full processing pipeline in a single task: decode -> Demucs separation -> Basic Pitch -> GP5.
+
+    The API enqueues it through `src.worker.app.pipeline()` in the `inprocess` pipeline mode.
+    Running every stage in one process lets the in-process separator hand the bass stem to Basic
+    Pitch as an array; the stem WAVs are written for download in the background meanwhile.
+    """
+    handoff = StemHandoff("bass") if settings.demucs_backend == "inprocess" else None
+    with _job_lease(job_id):
+        try:
+            context = _transcribe(_separate(job_id, payload, handoff), handoff)
+        finally:
+            if handoff is not None:
+                handoff.close()
+        return _render(context)
+
+
+@celery_app.task
+def retranscribe_job(job_id: str, payload: dict | None = None) -> dict[str, str]:
+    """
+    Re-threshold cached Basic Pitch posteriors -> MIDI -> GP5, skipping separation and inference.
+    """
+    if payload is None:
+        payload = {}
+
+    output_dir = jobs.job_dir(job_id)
+    midi_path = output_dir / "bass.mid"
+    strings = int(payload.get("strings", 4))
+
+    with _job_lease(job_id):
+        _update_metadata(job_id, status=JobStatus.STARTED, progress=55)
+        try:
+            # bass.mid no longer matches the pipeline's default thresholds.
+            _drop_checkpoints(job_id, "transcription")
+            retranscribe_midi(
+                posteriors_dir_for(midi_path),
+                midi_path,
+                **{name: float(payload.get(name, default)) for name, default in DEFAULT_NOTE_THRESHOLDS.items()},
+                job_id=job_id,
+            )
+            _render_tab(job_id, midi_path, strings=strings, tuning=payload.get("tuning") or DEFAULT_TUNING)
+
+            metadata = _update_metadata(job_id, status=JobStatus.SUCCESS, progress=100, refresh_files=True)
+            logger.info("retranscribe_complete", job_id=job_id, files=metadata.files)
+            return {"job_id": job_id, "files": metadata.files}
+        except Exception as exc:
+            logger.exception("retranscribe_failed", job_id=job_id, error=str(exc))
+            _update_metadata(job_id, status=JobStatus.FAILURE, error=str(exc), refresh_files=True)
+            raise
+
+
+@celery_app.task
+def retab_job(job_id: str, payload: dict | None = None) -> dict[str, str]:
+    """
+    Regenerate the GP5/MusicXML tab from the job's existing bass.mid, e.g. for another tuning.
+    """
+    if payload is None:
+        payload = {}
+
+    midi_path = jobs.job_dir(job_id) / "bass.mid"
+    strings = int(payload.get("strings", 4))
+    tuning = payload.get("tuning") or DEFAULT_TUNING
+
+    with _job_lease(job_id):
+        _update_metadata(job_id, status=JobStatus.STARTED, progress=80)
+        try:
+            _render_tab(job_id, midi_path, strings=strings, tuning=tuning)
+
+            metadata = _update_metadata(job_id, status=JobStatus.SUCCESS, progress=100, refresh_files=True)
+            logger.info("retab_complete", job_id=job_id, strings=strings, tuning=tuning, files=metadata.files)
+            return {"job_id": job_id, "files": metadata.files}
+        except Exception as exc:
+            logger.exception("retab_failed", job_id=job_id, error=str(exc))
+            _update_metadata(job_id, status=JobStatus.FAILURE, error=str(exc), refresh_files=True)
+            raise
@@ -0,0 +1,14 @@
+from __future__ import annotations
+
+import pytest
+
+from src.core import job_store
+from src.core.config import settings
+
+
+@pytest.fixture(autouse=True)
+def memory_job_store(monkeypatch) -> job_store.JobStore:
+    """Keep job status in an in-process store so tests need no Redis."""
+    monkeypatch.setattr(settings, "job_store_url", "memory://")
+    monkeypatch.setattr(job_store, "_STORES", {})
+    return job_store.get_job_store()
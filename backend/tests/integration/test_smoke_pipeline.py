@@ -1,3 +1,7 @@
+import io
+
+import numpy as np
+import soundfile as sf
 from fastapi.testclient import TestClient
 
 from src.api.main import app
@@ -19,7 +23,6 @@ def test_job_creation_smoke(monkeypatch, tmp_path) -> None:
     monkeypatch.setattr(celery_app.conf, "task_always_eager", True)
     monkeypatch.setattr(celery_app.conf, "task_store_eager_result", True)
     monkeypatch.setattr(celery_app.conf, "result_backend", "cache+memory://")
-    monkeypatch.setattr(tasks, "ensure_model", lambda model_name, cache_dir: cache_dir)
     monkeypatch.setattr(
         tasks,
         "separate_stems",
@@ -42,7 +45,9 @@ def test_job_creation_smoke(monkeypatch, tmp_path) -> None:
 
     client = TestClient(app)
 
-    files = {"file": ("sample.wav", b"\x00\x01", "audio/wav")}
+    audio = io.BytesIO()
+    sf.write(audio, np.zeros(800, dtype=np.float32), 8000, format="WAV")
+    files = {"file": ("sample.wav", audio.getvalue(), "audio/wav")}
     response = client.post("/api/v1/jobs", files=files, data={"strings": 4})
     assert response.status_code == 202
 
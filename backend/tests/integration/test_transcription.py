@@ -1,11 +1,20 @@
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import numpy as np
+import pytest
 import soundfile as sf
 
-from src.pipelines.transcription import transcribe_midi
+from src.pipelines import transcription
+from src.pipelines.transcription import (
+    BasicPitchEngine,
+    BatchingTranscriber,
+    SessionOptions,
+    get_transcriber,
+    transcribe_midi,
+)
 
 
 def test_transcribe_midi_generates_mid(tmp_path, monkeypatch) -> None:
@@ -27,3 +36,73 @@ def test_transcribe_midi_generates_mid(tmp_path, monkeypatch) -> None:
     assert midi_path.stat().st_size > 0
     assert midi_path.suffix == ".mid"
 
+
+def _write_tone(path, *, seconds: float, frequency: float = 110.0):
+    sr = 22050
+    t = np.linspace(0, seconds, int(sr * seconds), endpoint=False)
+    sf.write(path, 0.3 * np.sin(2 * np.pi * frequency * t) * (t % 1 < 0.5), sr)
+    return path
+
+
+def test_engine_reuses_one_session_across_calls(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(transcription, "_ENGINES", {})
+    options = SessionOptions(intra_op_threads=1, inter_op_threads=1, graph_optimization="basic")
+    input_wav = _write_tone(tmp_path / "tone.wav", seconds=1.0)
+
+    engine = get_transcriber(options)
+    transcribe_midi(input_wav, tmp_path / "first", engine=engine)
+    session = engine.session
+    transcribe_midi(input_wav, tmp_path / "second", engine=get_transcriber(options))
+
+    assert get_transcriber(options).session is session
+    assert session.get_session_options().intra_op_num_threads == 1
+
+
+def test_batched_windows_match_single_window_inference(tmp_path) -> None:
+    input_wav = _write_tone(tmp_path / "long.wav", seconds=7.0)
+
+    batched = BasicPitchEngine(batch_size=16).infer(input_wav)
+    single = BasicPitchEngine(batch_size=1).infer(input_wav)
+
+    for name in ("note", "onset", "contour"):
+        np.testing.assert_allclose(batched[name], single[name], atol=1e-5)
+
+
+def test_batching_transcriber_coalesces_concurrent_requests(tmp_path) -> None:
+    engine = BasicPitchEngine(batch_size=64)
+    wavs = [_write_tone(tmp_path / f"stem{i}.wav", seconds=3.0, frequency=55.0 * (i + 1)) for i in range(3)]
+    expected = [engine.infer(wav) for wav in wavs]
+    calls = 0
+    original = engine.predict_windows
+
+    def counting_predict(windows):
+        nonlocal calls
+        calls += 1
+        return original(windows)
+
+    engine.predict_windows = counting_predict
+    batcher = BatchingTranscriber(engine, max_jobs=3, max_wait_seconds=2.0)
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        results = list(pool.map(batcher.infer, wavs))
+
+    assert calls == 1
+    for result, reference in zip(results, expected):
+        for name in ("note", "onset", "contour"):
+            np.testing.assert_allclose(result[name], reference[name], atol=1e-5)
+
+
+def test_batching_transcriber_isolates_decode_failures(tmp_path) -> None:
+    batcher = BatchingTranscriber(BasicPitchEngine(), max_jobs=2, max_wait_seconds=0.5)
+    good = _write_tone(tmp_path / "good.wav", seconds=1.0)
+    bad = tmp_path / "bad.wav"
+    bad.write_bytes(b"not audio")
+    (tmp_path / "out").mkdir()
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        good_future = pool.submit(batcher.transcribe, good, tmp_path / "out")
+        bad_future = pool.submit(batcher.infer, bad)
+
+        assert good_future.result().name == "good.mid"
+        with pytest.raises(Exception):
+            bad_future.result()
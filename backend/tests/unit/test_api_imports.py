@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+# Generous enough for a cold CI runner; importing the ML stack takes several times longer.
+IMPORT_BUDGET_SECONDS = 3.0
+# Modules only the worker needs; loading any of them makes every API process pay for the ML stack.
+WORKER_ONLY_MODULES = (
+    "src.worker.tasks",
+    "src.pipelines.demucs_loader",
+    "src.pipelines.separation",
+    "src.pipelines.transcription",
+    "src.pipelines.tab",
+    "torch",
+    "demucs",
+    "onnxruntime",
+    "basic_pitch",
+    "numpy",
+    "guitarpro",
+    "pretty_midi",
+)
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import src.api.main
+print(json.dumps({"seconds": time.perf_counter() - started, "modules": sorted(sys.modules)}))
+"""
+
+
+def test_api_import_stays_light() -> None:
+    # A fresh interpreter, since this test session has long imported the worker modules.
+    result = subprocess.run(
+        [sys.executable, "-c", _PROBE],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+
+    assert [name for name in WORKER_ONLY_MODULES if name in report["modules"]] == []
+    assert report["seconds"] < IMPORT_BUDGET_SECONDS
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import librosa
+import numpy as np
+import pytest
+import soundfile as sf
+
+from src.pipelines import decode
+from src.pipelines.decode import decode_audio, is_pcm, load_pcm
+
+
+def _write_tone(path: Path, *, seconds: float, samplerate: int, channels: int = 2) -> Path:
+    t = np.linspace(0, seconds, int(samplerate * seconds), endpoint=False)
+    tone = (0.2 * np.sin(2 * np.pi * 55 * t)).astype(np.float32)
+    sf.write(path, np.stack([tone * (i + 1) / channels for i in range(channels)], axis=1), samplerate)
+    return path
+
+
+def test_decode_writes_memory_mapped_model_and_basic_pitch_variants(tmp_path: Path) -> None:
+    audio_path = _write_tone(tmp_path / "song.flac", seconds=2.5, samplerate=48000)
+
+    decoded = decode_audio(audio_path, tmp_path / "pcm")
+
+    model = load_pcm(decoded.model_path)
+    mono = load_pcm(decoded.basic_pitch_path)
+    assert isinstance(model, np.memmap) and isinstance(mono, np.memmap)
+    assert model.dtype == mono.dtype == np.float32
+    assert model.shape == (110250, 2)
+    # Block-wise decoding matches what Basic Pitch's own librosa.load would produce.
+    expected, _ = librosa.load(audio_path, sr=22050, mono=True)
+    np.testing.assert_allclose(mono, expected, atol=1e-6)
+    assert decoded.artifacts() == {"pcm": decoded.model_path, "basic_pitch_pcm": decoded.basic_pitch_path}
+    assert is_pcm(decoded.model_path) and is_pcm(decoded.basic_pitch_path) and not is_pcm(audio_path)
+
+
+def test_decode_keeps_model_rate_audio_bit_exact_and_upmixes_mono(tmp_path: Path) -> None:
+    audio_path = _write_tone(tmp_path / "mono.wav", seconds=1.0, samplerate=44100, channels=1)
+
+    decoded = decode_audio(audio_path, tmp_path / "pcm", basic_pitch=False)
+
+    source, _ = sf.read(audio_path, dtype="float32")
+    model = load_pcm(decoded.model_path)
+    np.testing.assert_array_equal(model, np.stack([source, source], axis=1))
+    assert decoded.basic_pitch_path is None
+    assert decoded.artifacts() == {"pcm": decoded.model_path}
+
+
+def test_decode_failure_leaves_no_partial_buffers(tmp_path: Path, monkeypatch) -> None:
+    audio_path = tmp_path / "broken.m4a"
+    audio_path.write_bytes(b"not audio")
+    monkeypatch.setattr(decode.shutil, "which", lambda name: None)
+
+    with pytest.raises(RuntimeError, match="Could not decode"):
+        decode_audio(audio_path, tmp_path / "pcm")
+
+    assert list((tmp_path / "pcm").iterdir()) == []
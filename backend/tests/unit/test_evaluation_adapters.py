@@ -2,7 +2,9 @@ from __future__ import annotations
 
 from pathlib import Path
 
+import numpy as np
 import pytest
+import soundfile as sf
 
 from src.evaluation import adapters
 from src.evaluation.adapters import (
@@ -13,19 +15,29 @@ from src.evaluation.adapters import (
 )
 from src.evaluation.io import write_midi
 from src.evaluation.models import NoteEvent, NoteEventSet
+from src.pipelines.decode import DecodedAudio, load_pcm
 
 
 def _config(tmp_path: Path) -> AdapterConfig:
     return AdapterConfig(demucs_model="test-model", demucs_cache_dir=tmp_path / "cache")
 
 
-def test_direct_separator_returns_original_audio(tmp_path: Path) -> None:
+def _fake_decode(audio_path: Path, output_dir: Path, **kwargs) -> DecodedAudio:
+    output_dir.mkdir(parents=True, exist_ok=True)
+    pcm_path = output_dir / "input.npy"
+    pcm_path.write_bytes(audio_path.read_bytes())
+    return DecodedAudio(model_path=pcm_path)
+
+
+def test_direct_separator_decodes_basic_pitch_pcm_once(tmp_path: Path) -> None:
     audio_path = tmp_path / "input.wav"
-    audio_path.write_bytes(b"audio")
+    sf.write(audio_path, np.zeros((44100, 2), dtype=np.float32), 44100)
 
     result = DirectSeparator().run(audio_path, tmp_path / "separator", config=_config(tmp_path))
 
-    assert result.audio_path == audio_path
+    assert result.audio_path == tmp_path / "separator" / "pcm" / "input.basic_pitch.npy"
+    assert load_pcm(result.audio_path).shape == (22050,)
+    assert not (tmp_path / "separator" / "pcm" / "input.npy").exists()
     assert result.artifacts == {}
     assert result.metadata["backend"] == "direct"
 
@@ -49,10 +61,12 @@ def test_demucs_separator_selects_bass_and_preserves_artifacts(
         return {"bass": bass_path, "drums": drums_path}
 
     monkeypatch.setattr(adapters, "separate_stems", fake_separate_stems)
+    monkeypatch.setattr(adapters, "decode_audio", _fake_decode)
     config = _config(tmp_path)
 
     result = DemucsSeparator().run(audio_path, tmp_path / "separator", config=config)
 
+    assert calls["input_audio"] == tmp_path / "separator" / "pcm" / "input.npy"
     assert result.audio_path.name == "bass.wav"
     assert set(result.artifacts) == {"bass", "drums"}
     assert calls["model_name"] == "test-model"
@@ -64,6 +78,7 @@ def test_demucs_separator_requires_bass_stem(tmp_path: Path, monkeypatch) -> Non
     audio_path = tmp_path / "input.wav"
     audio_path.write_bytes(b"audio")
     monkeypatch.setattr(adapters, "separate_stems", lambda **kwargs: {"other": tmp_path / "other.wav"})
+    monkeypatch.setattr(adapters, "decode_audio", _fake_decode)
 
     with pytest.raises(RuntimeError, match="bass stem"):
         DemucsSeparator().run(audio_path, tmp_path / "separator", config=_config(tmp_path))
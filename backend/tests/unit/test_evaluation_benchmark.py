@@ -3,6 +3,9 @@ from __future__ import annotations
 import json
 from pathlib import Path
 
+import numpy as np
+import soundfile as sf
+
 from src.evaluation import adapters
 from src.evaluation.adapters import AdapterConfig, SeparationResult, TranscriptionResult
 from src.evaluation.benchmark import main
@@ -68,9 +71,13 @@ class CountingSeparator:
         return SeparationResult(audio_path=audio_path, metadata={"backend": self.name})
 
 
+def _write_audio(path: Path) -> Path:
+    sf.write(path, np.zeros(4410, dtype=np.float32), 44100)
+    return path
+
+
 def _inputs(tmp_path: Path) -> tuple[Path, Path]:
-    audio_path = tmp_path / "audio.wav"
-    audio_path.write_bytes(b"synthetic audio placeholder")
+    audio_path = _write_audio(tmp_path / "audio.wav")
     reference = NoteEventSet(
         notes=(
             NoteEvent(start=0.0, end=0.5, midi=40, velocity=0.8),
@@ -151,8 +158,7 @@ def test_cli_without_reference_produces_listening_artifacts(
 ) -> None:
     monkeypatch.setitem(adapters.TRANSCRIBER_ADAPTERS, "fake", FakeTranscriber())
     monkeypatch.chdir(tmp_path)
-    audio_path = tmp_path / "audio.wav"
-    audio_path.write_bytes(b"synthetic audio placeholder")
+    audio_path = _write_audio(tmp_path / "audio.wav")
     output_dir = tmp_path / "output"
 
     exit_code = main(
@@ -286,8 +292,7 @@ def test_cli_rejects_reference_without_non_drum_notes(
     capsys,
 ) -> None:
     monkeypatch.setitem(adapters.TRANSCRIBER_ADAPTERS, "fake", FakeTranscriber())
-    audio_path = tmp_path / "audio.wav"
-    audio_path.write_bytes(b"audio")
+    audio_path = _write_audio(tmp_path / "audio.wav")
     reference_path = write_midi(NoteEventSet(), tmp_path / "empty.mid")
 
     exit_code = main(
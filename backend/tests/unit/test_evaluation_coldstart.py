@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from src.evaluation import coldstart
+from src.evaluation.coldstart import (
+    ColdStartReport,
+    TargetResult,
+    find_regressions,
+    main,
+    parse_importtime,
+    read_report,
+    write_report,
+)
+
+IMPORTTIME = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:      2000 |       2000 |     pydantic.fields
+import time:      3000 |       5000 |   pydantic
+import time:      1000 |       1000 |     fastapi.routing
+import time:      4000 |      10000 | fastapi
+import time:       500 |        500 | json
+"""
+
+
+def _report(**metrics: dict[str, float]) -> ColdStartReport:
+    return ColdStartReport(
+        recorded_at="2026-01-01T00:00:00Z",
+        repeat=1,
+        environment={},
+        targets={
+            target: TargetResult(metrics=values, module_count=10, import_breakdown={})
+            for target, values in metrics.items()
+        },
+    )
+
+
+def test_parse_importtime_sums_self_time_per_package() -> None:
+    breakdown = parse_importtime(IMPORTTIME)
+
+    assert breakdown == {"pydantic": 0.005, "fastapi": 0.005, "json": 0.0005, "_io": 0.0001}
+    assert parse_importtime(IMPORTTIME, limit=1) == {"pydantic": 0.005}
+
+
+def test_find_regressions_needs_relative_and_absolute_slowdown() -> None:
+    baseline = _report(api={"import_seconds": 1.0, "first_request_seconds": 0.1})
+    current = _report(
+        api={"import_seconds": 1.5, "first_request_seconds": 0.2, "new_metric": 9.0},
+        worker={"import_seconds": 9.0},
+    )
+
+    regressions = find_regressions(current, baseline, threshold=0.3, min_delta_seconds=0.15)
+
+    # 0.1s -> 0.2s doubles but stays under the absolute floor; unknown targets/metrics are new.
+    assert [(r.target, r.metric, r.current) for r in regressions] == [("api", "import_seconds", 1.5)]
+    assert find_regressions(current, baseline, threshold=0.6, min_delta_seconds=0.15) == []
+
+
+def test_report_round_trips(tmp_path: Path) -> None:
+    report = _report(api={"import_seconds": 0.5})
+
+    assert read_report(write_report(report, tmp_path / "nested" / "coldstart.json")) == report
+
+
+def test_main_updates_baseline_then_fails_on_regression(tmp_path: Path, monkeypatch) -> None:
+    timings = {"api": 0.5}
+
+    def fake_run(targets, *, repeat, worker_queues, source_dir):
+        return _report(**{target: {"import_seconds": timings[target]} for target in targets})
+
+    monkeypatch.setattr(coldstart, "run_coldstart", fake_run)
+    baseline = tmp_path / "coldstart.json"
+
+    assert main(["--targets", "api", "--baseline", str(baseline), "--update-baseline"]) == 0
+    assert read_report(baseline).targets["api"].metrics == {"import_seconds": 0.5}
+
+    assert main(["--targets", "api", "--baseline", str(baseline)]) == 0
+    timings["api"] = 1.0
+    output = tmp_path / "run.json"
+    assert main(["--targets", "api", "--baseline", str(baseline), "--output", str(output)]) == 1
+    assert read_report(output).targets["api"].metrics == {"import_seconds": 1.0}
+
+
+def test_main_rejects_unknown_target_and_missing_baseline(tmp_path: Path, capsys) -> None:
+    assert main(["--targets", "gui", "--update-baseline"]) == 2
+    assert "Unknown cold-start target 'gui'" in capsys.readouterr().err
+
+    assert main(["--targets", "api", "--baseline", str(tmp_path / "missing.json")]) == 2
+    assert "--update-baseline" in capsys.readouterr().err
+
+    assert main(["--targets", "api", "--update-baseline", "--source-dir", str(tmp_path)]) == 2
+    assert "No backend sources" in capsys.readouterr().err
+
+
+def test_measure_target_runs_benchmark_cli_in_fresh_processes() -> None:
+    result = coldstart.measure_target("benchmark_cli", repeat=1)
+
+    assert set(result.metrics) == {"import_seconds", "startup_seconds"}
+    assert result.metrics["startup_seconds"] >= result.metrics["import_seconds"] > 0
+    assert "src" in result.import_breakdown
+
+
+def test_worker_probe_runs_against_a_tree_without_the_warm_up_hook(tmp_path: Path) -> None:
+    # A baseline commit from before the worker warm-up only has the app and the task module.
+    worker = tmp_path / "src" / "worker"
+    worker.mkdir(parents=True)
+    for package in (tmp_path / "src", worker):
+        (package / "__init__.py").write_text("")
+    (worker / "tasks.py").write_text("")
+    (worker / "app.py").write_text('from celery import Celery\n\ncelery_app = Celery("stem2tab")\n')
+
+    run = coldstart._run_probe(coldstart._probe("worker"), ["celery"], source_dir=tmp_path)
+
+    assert run["metrics"]["ready_seconds"] >= run["metrics"]["import_seconds"] > 0
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from src.pipelines.fingering import UNPLAYABLE, build_position_table, optimize_fingering
+from src.pipelines.tunings import STANDARD_TUNINGS
+
+
+def _sounding_pitch(tuning: list[int], string: int, fret: int) -> int:
+    # PyGuitarPro numbers strings from the highest (1) down.
+    return list(reversed(tuning))[string - 1] + fret
+
+
+def test_position_table_marks_out_of_range_pitches() -> None:
+    table = build_position_table([40, 45, 50, 55], max_fret=24)
+
+    assert table.shape == (128, 4)
+    assert table[40].tolist() == [0, UNPLAYABLE, UNPLAYABLE, UNPLAYABLE]
+    assert table[55].tolist() == [15, 10, 5, 0]
+    assert (table[39] == UNPLAYABLE).all()
+    assert (table[80] == UNPLAYABLE).all()
+
+
+@pytest.mark.parametrize("strings", [4, 5, 6])
+def test_fingering_reproduces_every_playable_pitch(strings: int) -> None:
+    tuning = STANDARD_TUNINGS[strings]
+    pitches = np.random.default_rng(strings).integers(tuning[0], tuning[-1] + 20, 300).tolist()
+
+    fingering = optimize_fingering(pitches, tuning)
+
+    assert len(fingering) == len(pitches)
+    for pitch, mapping in zip(pitches, fingering):
+        assert mapping is not None
+        string, fret = mapping
+        assert 1 <= string <= strings
+        assert 0 <= fret <= 24
+        assert _sounding_pitch(tuning, string, fret) == pitch
+
+
+def test_fingering_moves_less_than_lowest_string_assignment() -> None:
+    tuning = STANDARD_TUNINGS[4]
+    pitches = [45, 52, 57, 55, 50, 45, 57, 62, 59, 52]
+
+    def hand_travel(frets: list[int]) -> int:
+        fretted = [fret for fret in frets if fret > 0]
+        return sum(abs(b - a) for a, b in zip(fretted, fretted[1:]))
+
+    fingering = optimize_fingering(pitches, tuning)
+    lowest_string = [next(p - o for o in tuning if 0 <= p - o <= 24) for p in pitches]
+
+    assert hand_travel([fret for _, fret in fingering]) < hand_travel(lowest_string)
+
+
+def test_unplayable_pitches_are_skipped() -> None:
+    fingering = optimize_fingering([10, 45, 127, 47], STANDARD_TUNINGS[4])
+
+    assert fingering[0] is None
+    assert fingering[2] is None
+    assert fingering[1] is not None and fingering[3] is not None
+    assert optimize_fingering([], STANDARD_TUNINGS[4]) == []
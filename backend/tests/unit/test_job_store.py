@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+from src.api.schemas import JobStatus, JobStatusResponse
+from src.core import job_store
+from src.core.config import settings
+from src.worker.checkpoints import make_checkpoint
+
+
+def _status(job_id: str = "job") -> JobStatusResponse:
+    now = datetime.now(timezone.utc)
+    return JobStatusResponse(
+        job_id=job_id,
+        status=JobStatus.PENDING,
+        progress=0,
+        created_at=now,
+        updated_at=now,
+        files=["input.wav"],
+    )
+
+
+def test_update_sets_only_given_fields() -> None:
+    store = job_store.MemoryJobStore(ttl_seconds=60)
+    assert store.create(_status()) == 1
+
+    assert store.update("job", progress=55) == 2
+    assert store.update("job", status=JobStatus.FAILURE, error="boom") == 3
+
+    metadata = store.get("job")
+    assert metadata.status == JobStatus.FAILURE
+    assert metadata.progress == 55
+    assert metadata.error == "boom"
+    assert metadata.files == ["input.wav"]
+    assert store.version("job") == 3
+
+    store.update("job", status=JobStatus.PENDING, error=None)
+    assert store.get("job").error is None
+
+
+def test_update_creates_missing_job_as_pending() -> None:
+    store = job_store.MemoryJobStore(ttl_seconds=60)
+
+    store.update("new", progress=5)
+
+    metadata = store.get("new")
+    assert metadata.status == JobStatus.PENDING
+    assert metadata.progress == 5
+    assert metadata.files == []
+
+
+def test_update_rejects_unknown_fields() -> None:
+    store = job_store.MemoryJobStore(ttl_seconds=60)
+
+    with pytest.raises(ValueError, match="Unknown job status fields: stages"):
+        store.update("job", stages={})
+
+
+def test_concurrent_writers_do_not_lose_fields(tmp_path) -> None:
+    # The API resetting status and the worker recording a stage used to overwrite each other.
+    store = job_store.MemoryJobStore(ttl_seconds=60)
+    store.create(_status())
+    audio = tmp_path / "input.wav"
+    audio.write_bytes(b"audio")
+    checkpoint = make_checkpoint(audio, {}, {"bass": audio})
+
+    writers = [threading.Thread(target=store.update, args=("job",), kwargs={"progress": 25})]
+    writers += [threading.Thread(target=store.set_stage, args=("job", f"stage{i}", checkpoint)) for i in range(8)]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+
+    metadata = store.get("job")
+    assert metadata.progress == 25
+    assert set(metadata.stages) == {f"stage{i}" for i in range(8)}
+    assert store.version("job") == 10
+
+
+def test_stages_round_trip_and_drop(tmp_path) -> None:
+    store = job_store.MemoryJobStore(ttl_seconds=60)
+    audio = tmp_path / "input.wav"
+    audio.write_bytes(b"audio")
+    checkpoint = make_checkpoint(audio, {"model": "htdemucs"}, {"bass": audio})
+
+    store.set_stage("job", "separation", checkpoint)
+    store.set_stage("job", "transcription", checkpoint)
+    store.drop_stages("job", "transcription", "render")
+
+    assert store.get("job").stages == {"separation": checkpoint}
+
+
+def test_expired_job_is_gone() -> None:
+    store = job_store.MemoryJobStore(ttl_seconds=0)
+    store.create(_status())
+
+    assert store.get("job") is None
+    assert store.version("job") is None
+
+
+def test_restore_job_copies_snapshot_into_store(monkeypatch, tmp_path, memory_job_store) -> None:
+    monkeypatch.setattr(settings, "file_bucket_path", tmp_path)
+    snapshot = job_store.JobMetadata.model_validate(
+        _status("done").model_dump() | {"status": JobStatus.SUCCESS, "version": 7}
+    )
+    job_store.write_snapshot(snapshot)
+
+    assert memory_job_store.get("done") is None
+    assert job_store.load_job("done") == snapshot
+    assert memory_job_store.get("done") is None
+
+    assert job_store.restore_job("done") == snapshot
+    # Versions continue past the snapshot's, so an ETag from the earlier run never matches again.
+    assert memory_job_store.get("done") == snapshot.model_copy(update={"version": 8})
+    assert memory_job_store.update("done", progress=80) == 9
+    assert Path(job_store.snapshot_path("done")).exists()
+
+
+def test_lapsed_lease_is_claimed_once() -> None:
+    store = job_store.MemoryJobStore(ttl_seconds=60)
+    store.heartbeat("running", timeout_seconds=60)
+    store.heartbeat("done", timeout_seconds=60)
+    store.release("done")
+
+    assert store.claim_stalled() == []
+    later = time.time() + 61
+    assert store.claim_stalled(later) == ["running"]
+    assert store.claim_stalled(later) == []
+
+
+def test_fail_stalled_jobs_marks_running_jobs_failed(monkeypatch, tmp_path, memory_job_store) -> None:
+    monkeypatch.setattr(settings, "file_bucket_path", tmp_path)
+    memory_job_store.create(_status("stalled"))
+    memory_job_store.update("stalled", status=JobStatus.STARTED)
+    memory_job_store.create(_status("finished"))
+    memory_job_store.update("finished", status=JobStatus.SUCCESS)
+    for job_id in ("stalled", "finished"):
+        memory_job_store.heartbeat(job_id, timeout_seconds=0)
+
+    assert job_store.fail_stalled_jobs(time.time() + 1) == ["stalled"]
+
+    stalled = memory_job_store.get("stalled")
+    assert stalled.status == JobStatus.FAILURE
+    assert stalled.error == job_store.STALLED_ERROR
+    assert job_store.read_snapshot("stalled") == stalled
+    assert memory_job_store.get("finished").status == JobStatus.SUCCESS
+    assert job_store.fail_stalled_jobs(time.time() + 1) == []
+
+
+def test_incomplete_store_backend_fails_on_creation() -> None:
+    class PartialStore(job_store.JobStore):
+        def _commit(self, job_id, fields, defaults) -> int:
+            return 1
+
+    with pytest.raises(TypeError, match="abstract"):
+        PartialStore(ttl_seconds=60)
+
+
+def test_get_job_store_is_shared_per_url() -> None:
+    assert job_store.get_job_store() is job_store.get_job_store()
+    assert isinstance(job_store.get_job_store(), job_store.MemoryJobStore)
+
+
+def test_writes_are_published_to_subscribers() -> None:
+    store = job_store.MemoryJobStore(ttl_seconds=60)
+
+    async def receive() -> list[dict]:
+        async with store.subscribe("job") as events:
+            store.create(_status())
+            store.update("job", status=JobStatus.STARTED, progress=5)
+            store.update("other", progress=50)
+            received = [await events.get(timeout=1), await events.get(timeout=1)]
+            assert await events.get(timeout=0.01) is None
+            return received
+
+    created, started = asyncio.run(receive())
+
+    assert created["event"] == "progress"
+    assert created["version"] == 1
+    assert created["data"]["files"] == ["input.wav"]
+    assert started["version"] == 2
+    assert started["data"]["status"] == "STARTED"
+    assert started["data"]["progress"] == 5
+    assert "updated_at" in started["data"]
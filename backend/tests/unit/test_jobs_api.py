@@ -1,16 +1,35 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import io
+import json
+import threading
 from datetime import datetime, timezone
 from pathlib import Path
 
+import numpy as np
+import pytest
+import soundfile as sf
 from fastapi.testclient import TestClient
 
-from src.api import main
-from src.api.main import METADATA_FILENAME, app
+from src.api import main, uploads
+from src.api.main import app
+from src.core import job_store
 from src.core.config import settings
+from src.core.jobs import METADATA_FILENAME
 from src.worker import tasks
 from src.worker.app import celery_app
+from src.worker.checkpoints import make_checkpoint
+
+
+def _wav_bytes(seconds: float, samplerate: int = 8000) -> bytes:
+    buffer = io.BytesIO()
+    sf.write(buffer, np.zeros(int(seconds * samplerate), dtype=np.float32), samplerate, format="WAV")
+    return buffer.getvalue()
+
+
+WAV = _wav_bytes(0.1)
 
 
 def _touch_file(path: Path, content: bytes) -> Path:
@@ -23,7 +42,6 @@ def _setup_eager(monkeypatch, tmp_path) -> None:
     monkeypatch.setattr(celery_app.conf, "task_always_eager", True)
     monkeypatch.setattr(celery_app.conf, "task_store_eager_result", True)
     monkeypatch.setattr(celery_app.conf, "result_backend", "cache+memory://")
-    monkeypatch.setattr(tasks, "ensure_model", lambda *args, **kwargs: None)
     monkeypatch.setattr(
         tasks,
         "separate_stems",
@@ -49,7 +67,7 @@ def test_create_and_get_job_success(monkeypatch, tmp_path) -> None:
     _setup_eager(monkeypatch, tmp_path)
     client = TestClient(app)
 
-    files = {"file": ("tone.wav", b"\x00\x01", "audio/wav")}
+    files = {"file": ("tone.wav", WAV, "audio/wav")}
     response = client.post("/api/v1/jobs", files=files, data={"strings": 4, "tuning": "standard"})
 
     assert response.status_code == 202
@@ -67,6 +85,91 @@ def test_create_and_get_job_success(monkeypatch, tmp_path) -> None:
     assert "input.wav" in payload["files"]
     if payload["status"] == "SUCCESS":
         assert payload["progress"] == 100
+    assert "stages" not in payload
+    assert set(tasks._load_metadata(job["job_id"]).stages) == {"separation", "transcription", "render"}
+
+
+def test_polling_never_writes_metadata(monkeypatch, tmp_path, memory_job_store) -> None:
+    _setup_eager(monkeypatch, tmp_path)
+    client = TestClient(app)
+    now = datetime.now(timezone.utc)
+    _touch_file(tmp_path / "job-poll" / "input.wav", b"audio")
+    memory_job_store.create(
+        main.JobStatusResponse(
+            job_id="job-poll",
+            status=main.JobStatus.STARTED,
+            progress=25,
+            created_at=now,
+            updated_at=now,
+            files=["input.wav"],
+        )
+    )
+    version = memory_job_store.version("job-poll")
+
+    for _ in range(3):
+        response = client.get("/api/v1/jobs/job-poll")
+        assert response.status_code == 200
+        assert response.json()["progress"] == 25
+
+    assert not (tmp_path / "job-poll" / METADATA_FILENAME).exists()
+    assert memory_job_store.version("job-poll") == version
+
+
+def test_get_job_answers_if_none_match_with_304(monkeypatch, tmp_path, memory_job_store) -> None:
+    _setup_eager(monkeypatch, tmp_path)
+    client = TestClient(app)
+    job_id = client.post("/api/v1/jobs", files={"file": ("tone.wav", WAV, "audio/wav")}).json()["job_id"]
+
+    first = client.get(f"/api/v1/jobs/{job_id}")
+    etag = first.headers["etag"]
+    assert first.status_code == 200
+    assert etag == f'"v{memory_job_store.version(job_id)}"'
+
+    cached = client.get(f"/api/v1/jobs/{job_id}", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+
+    memory_job_store.update(job_id, progress=99)
+    changed = client.get(f"/api/v1/jobs/{job_id}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()["progress"] == 99
+    assert "version" not in changed.json()
+
+
+def test_finished_job_is_served_from_memory(monkeypatch, tmp_path, memory_job_store) -> None:
+    _setup_eager(monkeypatch, tmp_path)
+    client = TestClient(app)
+    job_id = client.post("/api/v1/jobs", files={"file": ("tone.wav", WAV, "audio/wav")}).json()["job_id"]
+    first = client.get(f"/api/v1/jobs/{job_id}")
+    assert first.json()["status"] == "SUCCESS"
+
+    def fail(job_id):
+        raise AssertionError("finished jobs must not be re-read from the store")
+
+    monkeypatch.setattr(memory_job_store, "get_versioned", fail)
+    second = client.get(f"/api/v1/jobs/{job_id}")
+
+    assert second.status_code == 200
+    assert second.content == first.content
+    assert second.headers["etag"] == first.headers["etag"]
+
+
+def test_get_job_falls_back_to_snapshot(monkeypatch, tmp_path) -> None:
+    _setup_eager(monkeypatch, tmp_path)
+    client = TestClient(app)
+    job_id = client.post("/api/v1/jobs", files={"file": ("tone.wav", WAV, "audio/wav")}).json()["job_id"]
+    snapshot = tmp_path / job_id / METADATA_FILENAME
+    written = snapshot.read_bytes()
+    # Simulate the job's hash expiring from the store.
+    monkeypatch.setattr(job_store, "_STORES", {})
+
+    response = client.get(f"/api/v1/jobs/{job_id}")
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "SUCCESS"
+    assert snapshot.read_bytes() == written
 
 
 def test_rejects_unsupported_extension(monkeypatch, tmp_path) -> None:
@@ -92,6 +195,52 @@ def test_rejects_too_large(monkeypatch, tmp_path) -> None:
 
     assert response.status_code == 413
     assert "File too large" in response.json()["detail"]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_create_job_records_upload_hash_and_duration(monkeypatch, tmp_path) -> None:
+    _setup_eager(monkeypatch, tmp_path)
+    received: dict[str, object] = {}
+    pipeline = main.pipeline
+
+    def capture(job_id, payload):
+        received.update(payload)
+        return pipeline(job_id, payload)
+
+    monkeypatch.setattr(main, "pipeline", capture)
+    client = TestClient(app)
+
+    response = client.post("/api/v1/jobs", files={"file": ("tone.wav", WAV, "audio/wav")}, data={"strings": "5"})
+
+    assert response.status_code == 202
+    assert received["input_sha256"] == hashlib.sha256(WAV).hexdigest()
+    assert received["duration_seconds"] == pytest.approx(0.1)
+    assert received["strings"] == 5
+    assert (tmp_path / response.json()["job_id"] / "input.wav").read_bytes() == WAV
+
+
+def test_rejects_undecodable_audio(monkeypatch, tmp_path) -> None:
+    _setup_eager(monkeypatch, tmp_path)
+    monkeypatch.setattr(uploads.shutil, "which", lambda name: None)
+    client = TestClient(app)
+
+    response = client.post("/api/v1/jobs", files={"file": ("tone.wav", b"\x00\x01", "audio/wav")})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Could not decode audio file"
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_rejects_overlong_audio(monkeypatch, tmp_path) -> None:
+    _setup_eager(monkeypatch, tmp_path)
+    monkeypatch.setattr(settings, "max_audio_seconds", 0.05)
+    client = TestClient(app)
+
+    response = client.post("/api/v1/jobs", files={"file": ("tone.wav", WAV, "audio/wav")})
+
+    assert response.status_code == 400
+    assert "Audio too long" in response.json()["detail"]
+    assert list(tmp_path.iterdir()) == []
 
 
 def test_missing_job_returns_404(monkeypatch, tmp_path) -> None:
@@ -155,3 +304,215 @@ def test_download_file_not_found(monkeypatch, tmp_path) -> None:
     assert response.status_code == 404
     assert response.json()["detail"] == "File not found"
 
+
+def test_retranscribe_requires_cached_posteriors(monkeypatch, tmp_path) -> None:
+    _setup_eager(monkeypatch, tmp_path)
+    client = TestClient(app)
+    job_id = client.post("/api/v1/jobs", files={"file": ("tone.wav", WAV, "audio/wav")}).json()["job_id"]
+
+    response = client.post(f"/api/v1/jobs/{job_id}/retranscribe", json={"onset_threshold": 0.6})
+
+    assert response.status_code == 409
+
+
+def test_retranscribe_enqueues_rethresholding(monkeypatch, tmp_path) -> None:
+    _setup_eager(monkeypatch, tmp_path)
+    received: dict[str, object] = {}
+
+    def fake_retranscribe(posteriors_dir, output_path, **kwargs):
+        received.update(kwargs)
+        return _touch_file(output_path, b"midi2")
+
+    monkeypatch.setattr(tasks, "retranscribe_midi", fake_retranscribe)
+    client = TestClient(app)
+    job_id = client.post("/api/v1/jobs", files={"file": ("tone.wav", WAV, "audio/wav")}).json()["job_id"]
+    (settings.file_bucket_path / job_id / "bass.posteriors").mkdir()
+
+    response = client.post(
+        f"/api/v1/jobs/{job_id}/retranscribe",
+        json={"onset_threshold": 0.6, "frame_threshold": 0.4, "minimum_note_length_ms": 50},
+    )
+
+    assert response.status_code == 202
+    assert response.json()["job_id"] == job_id
+    assert received == {
+        "onset_threshold": 0.6,
+        "frame_threshold": 0.4,
+        "minimum_note_length_ms": 50.0,
+        "job_id": job_id,
+    }
+    assert (settings.file_bucket_path / job_id / "bass.mid").read_bytes() == b"midi2"
+
+
+def test_retranscribe_validates_thresholds(monkeypatch, tmp_path) -> None:
+    monkeypatch.setattr(settings, "file_bucket_path", tmp_path)
+    client = TestClient(app)
+
+    response = client.post("/api/v1/jobs/any/retranscribe", json={"onset_threshold": 1.5})
+
+    assert response.status_code == 422
+
+
+def test_create_job_rejects_unknown_tuning(monkeypatch, tmp_path) -> None:
+    _setup_eager(monkeypatch, tmp_path)
+    client = TestClient(app)
+
+    files = {"file": ("tone.wav", WAV, "audio/wav")}
+    response = client.post("/api/v1/jobs", files=files, data={"strings": 4, "tuning": "open_g"})
+
+    assert response.status_code == 400
+    assert "Unknown tuning" in response.json()["detail"]
+
+
+def test_retab_requires_transcription(monkeypatch, tmp_path) -> None:
+    _setup_eager(monkeypatch, tmp_path)
+    monkeypatch.setattr(tasks, "transcribe_midi", lambda input_wav, output_dir, **kwargs: input_wav)
+    client = TestClient(app)
+    job_id = client.post("/api/v1/jobs", files={"file": ("tone.wav", WAV, "audio/wav")}).json()["job_id"]
+
+    response = client.post(f"/api/v1/jobs/{job_id}/retab", json={"tuning": "drop_d"})
+
+    assert response.status_code == 409
+
+
+def test_retab_regenerates_tab_with_new_tuning(monkeypatch, tmp_path) -> None:
+    _setup_eager(monkeypatch, tmp_path)
+    client = TestClient(app)
+    job_id = client.post("/api/v1/jobs", files={"file": ("tone.wav", WAV, "audio/wav")}).json()["job_id"]
+    received: dict[str, object] = {}
+
+    def fake_tab(midi_path, output_path, **kwargs):
+        received.update(kwargs)
+        return _touch_file(output_path, b"gp5-bead")
+
+    monkeypatch.setattr(tasks, "midi_to_gp5", fake_tab)
+
+    response = client.post(f"/api/v1/jobs/{job_id}/retab", json={"strings": 4, "tuning": "bead"})
+
+    assert response.status_code == 202
+    assert received == {"strings": 4, "tuning": "bead", "extra_formats": ("musicxml",), "job_id": job_id}
+    assert (settings.file_bucket_path / job_id / "bass.gp5").read_bytes() == b"gp5-bead"
+    assert client.post(f"/api/v1/jobs/{job_id}/retab", json={"strings": 5, "tuning": "bead"}).status_code == 400
+
+
+def _sse_events(body: str) -> list[tuple[str, dict]]:
+    events = []
+    for frame in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in frame.splitlines() if not line.startswith(":"))
+        if fields:
+            events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_job_events_closes_after_finished_status(monkeypatch, tmp_path) -> None:
+    _setup_eager(monkeypatch, tmp_path)
+    client = TestClient(app)
+    job_id = client.post("/api/v1/jobs", files={"file": ("tone.wav", WAV, "audio/wav")}).json()["job_id"]
+
+    response = client.get(f"/api/v1/jobs/{job_id}/events")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    [(event, data)] = _sse_events(response.text)
+    assert event == "status"
+    assert data["status"] == "SUCCESS"
+    assert "stages" not in data
+
+
+def test_job_events_missing_job_returns_404(monkeypatch, tmp_path) -> None:
+    monkeypatch.setattr(settings, "file_bucket_path", tmp_path)
+    client = TestClient(app)
+
+    assert client.get("/api/v1/jobs/non-existent/events").status_code == 404
+
+
+def test_job_events_relays_worker_updates(monkeypatch, tmp_path, memory_job_store) -> None:
+    monkeypatch.setattr(settings, "file_bucket_path", tmp_path)
+    now = datetime.now(timezone.utc)
+    memory_job_store.create(
+        main.JobStatusResponse(job_id="job-live", status=main.JobStatus.STARTED, progress=5, created_at=now, updated_at=now)
+    )
+    checkpoint = make_checkpoint(_touch_file(tmp_path / "input.wav", b"audio"), {}, {})
+
+    def worker() -> None:
+        memory_job_store.update("job-live", progress=25)
+        memory_job_store.set_stage("job-live", "separation", checkpoint)
+        memory_job_store.update("job-live", status=main.JobStatus.SUCCESS, progress=100)
+
+    class Client:
+        async def is_disconnected(self) -> bool:
+            return False
+
+    async def collect() -> str:
+        frames = []
+        async for frame in main._job_events(memory_job_store, "job-live", Client()):
+            frames.append(frame)
+            if len(frames) == 1:
+                threading.Thread(target=worker).start()
+        return "".join(frames)
+
+    events = _sse_events(asyncio.run(asyncio.wait_for(collect(), timeout=5)))
+
+    assert [event for event, _ in events] == ["status", "progress", "stage", "progress"]
+    assert events[0][1]["progress"] == 5
+    assert events[1][1]["progress"] == 25
+    assert events[2][1]["stage"] == "separation"
+    assert events[3][1]["status"] == "SUCCESS"
+
+
+def test_resumable_upload_creates_job(monkeypatch, tmp_path) -> None:
+    _setup_eager(monkeypatch, tmp_path)
+    monkeypatch.setattr(main, "MAX_UPLOAD_BYTES", 16)
+    client = TestClient(app)
+    audio = _wav_bytes(1.0)
+
+    created = client.post("/api/v1/uploads", json={"filename": "rehearsal.wav", "size": len(audio)})
+    assert created.status_code == 201
+    upload_id = created.json()["upload_id"]
+    assert created.json() == {"upload_id": upload_id, "offset": 0, "size": len(audio)}
+
+    first = client.put(f"/api/v1/uploads/{upload_id}", params={"offset": 0}, content=audio[:5000])
+    assert first.json()["offset"] == 5000
+    # A retried chunk for an old offset is refused; the client resumes from the reported one.
+    stale = client.put(f"/api/v1/uploads/{upload_id}", params={"offset": 0}, content=audio[:5000])
+    assert stale.status_code == 409
+    assert client.get(f"/api/v1/uploads/{upload_id}").json()["offset"] == 5000
+    assert client.post(f"/api/v1/uploads/{upload_id}/complete", json={}).status_code == 409
+
+    rest = client.put(f"/api/v1/uploads/{upload_id}", params={"offset": 5000}, content=audio[5000:])
+    assert rest.json()["offset"] == len(audio)
+
+    completed = client.post(f"/api/v1/uploads/{upload_id}/complete", json={"strings": 5, "tuning": "standard"})
+    assert completed.status_code == 202
+    assert completed.json()["job_id"] == upload_id
+    job_dir = tmp_path / upload_id
+    assert (job_dir / "input.wav").read_bytes() == audio
+    assert sorted(path.name for path in job_dir.iterdir() if path.name.startswith("input")) == ["input.wav"]
+    assert not (job_dir / uploads.SESSION_FILENAME).exists()
+    assert client.get(f"/api/v1/jobs/{upload_id}").json()["status"] == "SUCCESS"
+    assert client.get(f"/api/v1/uploads/{upload_id}").status_code == 404
+
+
+def test_resumable_upload_enforces_total_size(monkeypatch, tmp_path) -> None:
+    monkeypatch.setattr(settings, "file_bucket_path", tmp_path)
+    monkeypatch.setattr(main, "MAX_RESUMABLE_UPLOAD_BYTES", 1024)
+    client = TestClient(app)
+
+    assert client.post("/api/v1/uploads", json={"filename": "big.flac", "size": 1025}).status_code == 413
+    assert client.post("/api/v1/uploads", json={"filename": "notes.txt", "size": 10}).status_code == 400
+
+    upload_id = client.post("/api/v1/uploads", json={"filename": "small.flac", "size": 10}).json()["upload_id"]
+    client.put(f"/api/v1/uploads/{upload_id}", params={"offset": 0}, content=b"x" * 6)
+    overflow = client.put(f"/api/v1/uploads/{upload_id}", params={"offset": 6}, content=b"x" * 6)
+
+    assert overflow.status_code == 413
+    assert client.get(f"/api/v1/uploads/{upload_id}").json()["offset"] == 6
+
+
+def test_unknown_upload_returns_404(monkeypatch, tmp_path) -> None:
+    monkeypatch.setattr(settings, "file_bucket_path", tmp_path)
+    client = TestClient(app)
+
+    assert client.get("/api/v1/uploads/../etc").status_code == 404
+    assert client.put("/api/v1/uploads/not-a-uuid", params={"offset": 0}, content=b"x").status_code == 404
+    assert client.get(f"/api/v1/uploads/{'0' * 8}-0000-0000-0000-{'0' * 12}").status_code == 404
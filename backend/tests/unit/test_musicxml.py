@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import io
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.pipelines.musicxml import write_musicxml, write_musicxml_file
+from src.pipelines.score import (
+    DIVISIONS,
+    GRID_TICKS,
+    REST,
+    Event,
+    notated_values,
+    score_from_notes,
+    sequential_events,
+    split_measures,
+)
+
+
+def _parse(score) -> ET.Element:
+    buffer = io.StringIO()
+    write_musicxml(score, buffer)
+    return ET.fromstring(buffer.getvalue().split("\n", 2)[2])
+
+
+def _measure_ticks(measure: ET.Element) -> int:
+    return sum(int(note.findtext("duration")) for note in measure.iter("note"))
+
+
+def test_sequential_events_place_notes_on_absolute_ticks() -> None:
+    # 120 BPM: onsets at 0, 1.4 and 1.8 quarters snap to the 64th grid; gaps shorter than a sixteenth join the note before.
+    score = score_from_notes(np.array([[0.0, 0.6, 40, 90], [0.7, 0.71, 42, 90], [0.9, 9.0, 45, 90]]))
+
+    ticks, notes = sequential_events(score)
+
+    assert notes.tolist() == [0, 1, 2]
+    assert ticks.tolist() == [66, 21, 8 * DIVISIONS]
+
+
+def test_detached_notes_do_not_drift() -> None:
+    # 2400 eighth notes at 120 BPM, each held for 0.2 s of its 0.25 s slot.
+    starts = np.arange(2400) * 0.25
+    score = score_from_notes(np.column_stack((starts, starts + 0.2, np.full(2400, 40), np.full(2400, 90))))
+
+    ticks, notes = sequential_events(score)
+    measures = split_measures(ticks, notes, 4 * DIVISIONS)
+
+    assert len(measures) == 300
+    assert ticks[:-1].sum() / DIVISIONS == 1199.5
+    assert set(ticks[:-1].tolist()) == {DIVISIONS // 2}
+
+
+def test_notes_sharing_an_onset_are_played_in_sequence() -> None:
+    score = score_from_notes(np.array([[0.0, 0.5, 40, 90], [0.0, 0.5, 45, 90], [1.0, 1.5, 43, 90]]))
+
+    ticks, notes = sequential_events(score)
+
+    assert notes.tolist() == [0, 1, REST, 2]
+    assert ticks.tolist() == [GRID_TICKS, DIVISIONS - GRID_TICKS, DIVISIONS, DIVISIONS]
+
+
+def test_split_measures_ties_across_barlines_and_pads_last_measure() -> None:
+    measures = split_measures(np.array([144, 96]), np.array([0, 1]), 192)
+
+    assert measures == [
+        [Event(144, 0), Event(48, 1, tie_start=True)],
+        [Event(48, 1, tie_stop=True), Event(144, REST)],
+    ]
+    assert split_measures(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), 192) == [[Event(192, REST)]]
+
+
+@pytest.mark.parametrize("ticks", [3, 15, 39, 60, 99, 189, 288])
+def test_notated_values_cover_duration(ticks: int) -> None:
+    values = notated_values(ticks)
+
+    assert sum(value.ticks for value in values) == ticks
+    assert [value.ticks for value in values] == sorted((value.ticks for value in values), reverse=True)
+
+
+def test_off_grid_lengths_are_spelled_without_tuplets() -> None:
+    # 61 ticks long at 120 BPM: snapped to 60, a quarter tied to a sixteenth.
+    score = score_from_notes(np.array([[0.0, 61 / (2 * DIVISIONS), 40, 90], [1.0, 1.5, 42, 90]]))
+
+    root = _parse(score)
+
+    durations = [int(note.findtext("duration")) for note in root.iter("note")]
+    assert durations[:2] == [48, 12]
+    assert all(duration % GRID_TICKS == 0 for duration in durations)
+    assert root.find(".//time-modification") is None
+    with pytest.raises(ValueError, match="multiples of 3"):
+        notated_values(13)
+
+
+def test_written_measures_are_full_and_ties_are_paired() -> None:
+    rng = np.random.default_rng(0)
+    starts = np.sort(rng.uniform(0, 60, 400))
+    notes = np.column_stack((starts, starts + rng.uniform(0.05, 1.5, 400), rng.integers(28, 60, 400), np.full(400, 90)))
+    root = _parse(score_from_notes(notes, tempi=np.array([97.0])))
+
+    measures = root.find("part").findall("measure")
+    assert all(_measure_ticks(measure) == 4 * DIVISIONS for measure in measures)
+    assert root.find(".//divisions").text == str(DIVISIONS)
+    assert root.find(".//sound").get("tempo") == "97"
+    ties = [tie.get("type") for tie in root.iter("tie")]
+    assert ties.count("start") == ties.count("stop")
+    assert len(root.findall(".//note/pitch")) >= 400
+
+
+def test_pitch_spelling_and_time_signature(tmp_path: Path) -> None:
+    score = score_from_notes(np.array([[0.0, 0.5, 40, 90], [0.5, 1.0, 42, 90]]), time_signature=(3, 4))
+    path = tmp_path / "bass.musicxml"
+
+    assert write_musicxml_file(score, path) == 1
+
+    root = ET.parse(path).getroot()
+    pitches = [
+        (pitch.findtext("step"), pitch.findtext("alter"), pitch.findtext("octave")) for pitch in root.iter("pitch")
+    ]
+    assert pitches == [("E", None, "2"), ("F", "1", "2")]
+    assert root.find(".//time/beats").text == "3"
+    assert _measure_ticks(root.find(".//measure")) == 3 * DIVISIONS
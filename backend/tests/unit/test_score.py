@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pretty_midi
+
+from src.pipelines.score import load_score, score_from_notes
+
+
+def test_load_score_sorts_notes_and_reads_tempo_map(tmp_path: Path) -> None:
+    midi = pretty_midi.PrettyMIDI(initial_tempo=90.0)
+    bass = pretty_midi.Instrument(program=33)
+    bass.notes.extend(
+        [
+            pretty_midi.Note(velocity=70, pitch=45, start=1.0, end=1.5),
+            pretty_midi.Note(velocity=80, pitch=40, start=0.0, end=0.5),
+            pretty_midi.Note(velocity=90, pitch=43, start=0.5, end=0.5),  # zero length
+        ]
+    )
+    drums = pretty_midi.Instrument(program=0, is_drum=True)
+    drums.notes.append(pretty_midi.Note(velocity=100, pitch=36, start=0.0, end=0.1))
+    midi.instruments.extend([bass, drums])
+    midi.time_signature_changes.append(pretty_midi.TimeSignature(3, 4, 0.0))
+    midi.write(str(tmp_path / "bass.mid"))
+
+    score = load_score(tmp_path / "bass.mid")
+
+    assert len(score) == 2
+    assert score.pitches.tolist() == [40, 45]
+    assert score.velocities.tolist() == [80, 70]
+    assert np.allclose(score.starts, [0.0, 1.0], atol=1e-5)
+    assert round(score.bpm, 3) == 90.0
+    assert score.time_signature == (3, 4)
+
+
+def test_seconds_to_quarters_integrates_tempo_changes() -> None:
+    score = score_from_notes(np.empty((0, 4)), tempo_times=np.array([0.0, 2.0]), tempi=np.array([120.0, 60.0]))
+
+    # 2 s at 120 BPM is 4 quarters; each further second at 60 BPM adds one.
+    assert np.allclose(score.seconds_to_quarters(np.array([0.0, 1.0, 2.0, 3.5])), [0.0, 2.0, 4.0, 5.5])
+    assert len(score) == 0
+    assert score.bpm == 120.0
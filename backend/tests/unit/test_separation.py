@@ -0,0 +1,311 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from src.pipelines import separation
+from src.pipelines.decode import decode_audio
+from src.pipelines.separation import (
+    DEFAULT_STEMS,
+    DemucsEngine,
+    StemHandoff,
+    get_engine,
+    resolve_stem_mode,
+    separate_stems,
+)
+
+# Randomly initialised, tiny HDemucs shipped with Demucs; no weight download required.
+UNITTEST_MODEL = "demucs_unittest"
+
+
+def _write_tone(path: Path, *, seconds: float = 1.0, samplerate: int = 44100) -> Path:
+    t = np.linspace(0, seconds, int(samplerate * seconds), endpoint=False)
+    tone = 0.1 * np.sin(2 * np.pi * 55 * t)
+    sf.write(path, np.stack([tone, tone], axis=1), samplerate)
+    return path
+
+
+def test_engine_writes_all_stems_in_process(tmp_path: Path) -> None:
+    audio_path = _write_tone(tmp_path / "input.wav")
+    engine = DemucsEngine(UNITTEST_MODEL, tmp_path / "cache", device="cpu")
+
+    stems = engine.separate(audio_path, tmp_path / "job")
+
+    assert set(stems) == set(DEFAULT_STEMS)
+    for stem, path in stems.items():
+        assert path == tmp_path / "job" / f"{stem}.wav"
+        info = sf.info(path)
+        assert info.samplerate == 44100
+        assert info.channels == 2
+        assert info.subtype == "PCM_16"
+    assert not (tmp_path / "job" / "_demucs").exists()
+
+
+def test_engine_loads_model_once(tmp_path: Path, monkeypatch) -> None:
+    audio_path = _write_tone(tmp_path / "input.wav", seconds=0.5)
+    engine = DemucsEngine(UNITTEST_MODEL, tmp_path / "cache", device="cpu")
+    loads = 0
+    original = engine._load_model
+
+    def counting_load():
+        nonlocal loads
+        loads += 1
+        return original()
+
+    monkeypatch.setattr(engine, "_load_model", counting_load)
+
+    engine.separate(audio_path, tmp_path / "first")
+    engine.separate(audio_path, tmp_path / "second")
+
+    assert loads == 1
+    assert engine.loaded
+
+
+def test_get_engine_is_cached_per_model(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr(separation, "_ENGINES", {})
+
+    first = get_engine("htdemucs", tmp_path)
+    assert get_engine("htdemucs", tmp_path) is first
+    assert get_engine("mdx", tmp_path) is not first
+
+
+def test_separate_stems_rejects_unknown_backend(tmp_path: Path) -> None:
+    audio_path = _write_tone(tmp_path / "input.wav", seconds=0.1)
+
+    with pytest.raises(ValueError, match="available"):
+        separate_stems(audio_path, tmp_path, model_name=UNITTEST_MODEL, cache_dir=tmp_path, backend="gpu-farm")
+
+
+def test_engine_missing_input_raises(tmp_path: Path) -> None:
+    engine = DemucsEngine(UNITTEST_MODEL, tmp_path / "cache", device="cpu")
+
+    with pytest.raises(FileNotFoundError):
+        engine.separate(tmp_path / "missing.wav", tmp_path / "job")
+
+
+def test_bass_mode_writes_only_bass_stem(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr(separation, "_ENGINES", {})
+    audio_path = _write_tone(tmp_path / "input.wav", seconds=0.5)
+    output_dir = tmp_path / "job"
+
+    stems = separate_stems(audio_path, output_dir, model_name=UNITTEST_MODEL, cache_dir=tmp_path / "cache", mode="bass")
+
+    assert list(stems) == ["bass"]
+    assert sorted(path.name for path in output_dir.iterdir()) == ["bass.wav"]
+
+
+def test_bass_rest_mode_mixes_remaining_sources(tmp_path: Path) -> None:
+    audio_path = _write_tone(tmp_path / "input.wav", seconds=0.5)
+    engine = DemucsEngine(UNITTEST_MODEL, tmp_path / "cache", device="cpu")
+
+    stems = engine.separate(audio_path, tmp_path / "job", stems=resolve_stem_mode("bass_rest"))
+
+    assert set(stems) == {"bass", "no_bass"}
+    assert sf.info(stems["no_bass"]).frames == sf.info(stems["bass"]).frames
+
+
+def test_unknown_stem_mode_lists_available_modes() -> None:
+    with pytest.raises(ValueError, match="bass_rest"):
+        resolve_stem_mode("guitar")
+
+
+def _identity_engine(tmp_path: Path) -> DemucsEngine:
+    """Engine whose 'model' returns the mix as every source, so output must equal input."""
+    engine = DemucsEngine(UNITTEST_MODEL, tmp_path / "cache", device="cpu", chunk_overlap_seconds=0.1)
+    engine._model = SimpleNamespace(samplerate=44100, audio_channels=2, sources=["drums", "bass", "other", "vocals"])
+    engine._run_model = lambda normalized: {name: normalized.clone() for name in engine.model.sources}
+    return engine
+
+
+def test_streaming_separation_reconstructs_signal_across_windows(tmp_path: Path) -> None:
+    audio_path = _write_tone(tmp_path / "input.wav", seconds=2.3)
+    engine = _identity_engine(tmp_path)
+
+    stems = engine.separate(audio_path, tmp_path / "job", stems=("bass",), chunk_seconds=0.5)
+
+    original, _ = sf.read(audio_path, dtype="float32")
+    separated, samplerate = sf.read(stems["bass"], dtype="float32")
+    assert samplerate == 44100
+    assert separated.shape == original.shape
+    np.testing.assert_allclose(separated, original, atol=1e-3)
+
+
+def test_loud_mix_gets_the_same_level_streamed_or_whole(tmp_path: Path) -> None:
+    t = np.linspace(0, 1.5, int(44100 * 1.5), endpoint=False)
+    loud = 1.5 * np.sin(2 * np.pi * 55 * t)
+    audio_path = tmp_path / "input.wav"
+    sf.write(audio_path, np.stack([loud, loud], axis=1), 44100, subtype="FLOAT")
+    engine = _identity_engine(tmp_path)
+
+    whole = engine.separate(audio_path, tmp_path / "whole", stems=("bass",))
+    chunked = engine.separate(audio_path, tmp_path / "chunked", stems=("bass",), chunk_seconds=0.5)
+
+    whole_bass, _ = sf.read(whole["bass"], dtype="float32")
+    chunked_bass, _ = sf.read(chunked["bass"], dtype="float32")
+    # Rescaled below full scale rather than clipped, identically in both paths.
+    np.testing.assert_allclose(whole_bass[:, 0], loud / (1.01 * 1.5), atol=2e-3)
+    np.testing.assert_allclose(chunked_bass, whole_bass, atol=2e-3)
+
+
+def test_streaming_separation_matches_whole_file_stems(tmp_path: Path) -> None:
+    audio_path = _write_tone(tmp_path / "input.wav", seconds=1.5)
+    engine = DemucsEngine(UNITTEST_MODEL, tmp_path / "cache", device="cpu", shifts=0)
+
+    whole = engine.separate(audio_path, tmp_path / "whole")
+    chunked = engine.separate(audio_path, tmp_path / "chunked", chunk_seconds=0.5)
+
+    assert set(chunked) == set(whole)
+    for stem in whole:
+        assert chunked[stem].name == whole[stem].name
+        assert sf.info(chunked[stem]).frames == sf.info(whole[stem]).frames
+        assert sf.info(chunked[stem]).subtype == "PCM_16"
+
+
+@pytest.mark.parametrize("chunk_seconds", [None, 0.5])
+def test_engine_reads_decoded_pcm_like_the_source_file(tmp_path: Path, chunk_seconds: float | None) -> None:
+    audio_path = _write_tone(tmp_path / "input.wav", seconds=1.3)
+    pcm_path = decode_audio(audio_path, tmp_path / "pcm", basic_pitch=False).model_path
+    engine = _identity_engine(tmp_path)
+
+    from_file = engine.separate(audio_path, tmp_path / "file", stems=("bass",), chunk_seconds=chunk_seconds)
+    from_pcm = engine.separate(pcm_path, tmp_path / "pcm-job", stems=("bass",), chunk_seconds=chunk_seconds)
+
+    expected, _ = sf.read(from_file["bass"], dtype="float32")
+    separated, samplerate = sf.read(from_pcm["bass"], dtype="float32")
+    assert samplerate == 44100
+    np.testing.assert_allclose(separated, expected, atol=1e-4)
+
+
+@pytest.mark.parametrize("chunk_seconds", [None, 0.5])
+def test_handoff_returns_bass_in_memory_and_writes_stems_in_background(
+    tmp_path: Path, chunk_seconds: float | None
+) -> None:
+    audio_path = _write_tone(tmp_path / "input.wav", seconds=1.3)
+    engine = _identity_engine(tmp_path)
+    handoff = StemHandoff("bass")
+
+    stems = engine.separate(
+        audio_path, tmp_path / "job", stems=("bass", "other"), chunk_seconds=chunk_seconds, handoff=handoff
+    )
+    handoff.wait()
+
+    assert set(stems) == {"bass", "other"}
+    assert all(path.is_file() for path in stems.values())
+    # Same audio Basic Pitch would have decoded from the written stem, up to 16-bit rounding.
+    expected = np.load(decode_audio(stems["bass"], tmp_path / "pcm", model_rate=False).basic_pitch_path)
+    assert handoff.audio.dtype == np.float32
+    assert handoff.audio.shape == expected.shape
+    np.testing.assert_allclose(handoff.audio, expected, atol=1e-3)
+
+
+def test_handoff_skips_queued_work_after_a_failed_write() -> None:
+    handoff = StemHandoff()
+    ran: list[str] = []
+
+    def broken() -> None:
+        raise OSError("disk full")
+
+    handoff.submit(ran.append, "first")
+    handoff.submit(broken)
+    handoff.submit(ran.append, "checkpoint")
+
+    with pytest.raises(OSError, match="disk full"):
+        handoff.wait()
+    assert ran == ["first"]
+
+
+_FAKE_DEMUCS = """#!{python}
+import sys, time
+import os
+from pathlib import Path
+
+args = sys.argv[1:]
+model, out, track = args[args.index("-n") + 1], Path(args[args.index("--out") + 1]), Path(args[-1])
+print("Selected model is a bag of 1 models.", flush=True)
+for percent in (0, 50, 100):
+    sys.stderr.write(f"\\r{{percent:3d}}%|#####     | {{percent / 10:.1f}}/10.0 [00:01<00:01, 7.50seconds/s]")
+    sys.stderr.flush()
+    time.sleep({delay})
+sys.stderr.write("\\n")
+if {fail}:
+    print("RuntimeError: CUDA out of memory", file=sys.stderr)
+    sys.exit(1)
+separated = out / model / track.stem
+separated.mkdir(parents=True)
+for stem in ("bass", "no_bass"):
+    (separated / f"{{stem}}.wav").write_bytes(b"stem")
+"""
+
+
+def _fake_demucs_cli(monkeypatch, tmp_path: Path, *, delay: float = 0.0, fail: bool = False) -> None:
+    import sys
+
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    script = bin_dir / "demucs"
+    script.write_text(_FAKE_DEMUCS.format(python=sys.executable, delay=delay, fail=fail))
+    script.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}:{os.environ['PATH']}")
+
+
+def test_cli_backend_streams_progress(monkeypatch, tmp_path: Path) -> None:
+    _fake_demucs_cli(monkeypatch, tmp_path)
+    audio_path = _write_tone(tmp_path / "input.wav")
+    progress: list[float] = []
+
+    stems = separate_stems(
+        audio_path,
+        tmp_path / "job",
+        model_name="htdemucs",
+        cache_dir=tmp_path / "cache",
+        backend="cli",
+        mode="bass",
+        on_progress=progress.append,
+    )
+
+    assert stems == {"bass": tmp_path / "job" / "bass.wav"}
+    assert progress == [0.0, 0.5, 1.0]
+    assert not (tmp_path / "job" / "_demucs").exists()
+
+
+def test_cli_backend_reports_the_tail_of_failed_runs(monkeypatch, tmp_path: Path) -> None:
+    _fake_demucs_cli(monkeypatch, tmp_path, fail=True)
+    audio_path = _write_tone(tmp_path / "input.wav")
+    errors: list[str] = []
+    monkeypatch.setattr(
+        separation.logger, "exception", lambda event, **kwargs: errors.append(kwargs.get("stderr", ""))
+    )
+
+    with pytest.raises(RuntimeError, match="Demucs separation failed"):
+        separate_stems(
+            audio_path, tmp_path / "job", model_name="htdemucs", cache_dir=tmp_path / "cache", backend="cli", mode="bass"
+        )
+
+    assert "CUDA out of memory" in errors[0]
+    assert "%|" not in errors[0]
+
+
+def test_cli_watchdog_kills_a_stalled_run(monkeypatch, tmp_path: Path) -> None:
+    import time
+
+    _fake_demucs_cli(monkeypatch, tmp_path, delay=30)
+    audio_path = _write_tone(tmp_path / "input.wav")
+    started = time.monotonic()
+
+    with pytest.raises(RuntimeError, match="no output for 0.5s"):
+        separate_stems(
+            audio_path,
+            tmp_path / "job",
+            model_name="htdemucs",
+            cache_dir=tmp_path / "cache",
+            backend="cli",
+            mode="bass",
+            stall_timeout_seconds=0.5,
+        )
+
+    assert time.monotonic() - started < 10
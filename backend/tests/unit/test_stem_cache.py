@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+from src.pipelines import separation
+from src.pipelines.separation import separate_stems
+from src.pipelines.stem_cache import StemCache, audio_digest
+
+
+def _write_tone(path: Path, frequency: float = 55.0) -> Path:
+    t = np.linspace(0, 0.25, 11025, endpoint=False)
+    sf.write(path, 0.1 * np.sin(2 * np.pi * frequency * t), 44100)
+    return path
+
+
+def _stem(path: Path, size: int) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+    return path
+
+
+def test_audio_digest_uses_decoded_pcm(tmp_path: Path) -> None:
+    wav = _write_tone(tmp_path / "song.wav")
+    flac = tmp_path / "song.flac"
+    data, samplerate = sf.read(wav, dtype="float32")
+    sf.write(flac, data, samplerate, subtype="PCM_16")
+
+    assert audio_digest(wav) == audio_digest(flac)
+    assert audio_digest(wav) != audio_digest(_write_tone(tmp_path / "other.wav", frequency=110.0))
+
+
+def test_fetch_hard_links_cached_stems(tmp_path: Path) -> None:
+    cache = StemCache(tmp_path / "cache", max_bytes=1024)
+    produced = _stem(tmp_path / "job-a" / "bass.wav", 10)
+    cache.store("htdemucs/abc", {"bass": produced})
+
+    linked = cache.fetch("htdemucs/abc", ("bass",), tmp_path / "job-b")
+
+    assert linked == {"bass": tmp_path / "job-b" / "bass.wav"}
+    assert os.path.samefile(linked["bass"], produced)
+    assert cache.fetch("htdemucs/abc", ("bass", "drums"), tmp_path / "job-c") is None
+
+
+def test_evicts_least_recently_used_entries(tmp_path: Path) -> None:
+    cache = StemCache(tmp_path / "cache", max_bytes=25)
+    cache.store("m/old", {"bass": _stem(tmp_path / "a" / "bass.wav", 10)})
+    cache.store("m/used", {"bass": _stem(tmp_path / "b" / "bass.wav", 10)})
+    os.utime(tmp_path / "cache" / "m" / "old", (1, 1))
+    os.utime(tmp_path / "cache" / "m" / "used", (2, 2))
+    cache.fetch("m/used", ("bass",), tmp_path / "job")
+
+    cache.store("m/new", {"bass": _stem(tmp_path / "c" / "bass.wav", 10)})
+
+    assert not (tmp_path / "cache" / "m" / "old").exists()
+    assert (tmp_path / "cache" / "m" / "used").is_dir()
+    assert (tmp_path / "cache" / "m" / "new").is_dir()
+
+
+def test_separate_stems_skips_demucs_on_cache_hit(tmp_path: Path, monkeypatch) -> None:
+    audio_path = _write_tone(tmp_path / "input.wav")
+    cache = StemCache(tmp_path / "cache", max_bytes=1 << 30)
+    calls = 0
+
+    class FakeEngine:
+        def separate(self, input_audio: Path, output_dir: Path, *, stems, **kwargs) -> dict[str, Path]:
+            nonlocal calls
+            calls += 1
+            return {stem: _stem(output_dir / f"{stem}.wav", 4) for stem in stems}
+
+    monkeypatch.setattr(separation, "get_engine", lambda *args: FakeEngine())
+    kwargs = {"model_name": "htdemucs", "cache_dir": tmp_path / "models", "mode": "bass", "cache": cache}
+
+    first = separate_stems(audio_path, tmp_path / "job-1", **kwargs)
+    second = separate_stems(audio_path, tmp_path / "job-2", **kwargs)
+
+    assert calls == 1
+    assert second["bass"] == tmp_path / "job-2" / "bass.wav"
+    assert os.path.samefile(first["bass"], second["bass"])
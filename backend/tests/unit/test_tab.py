@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+
+import guitarpro
+import pretty_midi
+import pytest
+
+from src.pipelines import tab
+from src.pipelines.tab import SCORE_WRITERS, midi_to_gp5, register_writer
+from src.pipelines.tunings import STANDARD_TUNINGS, resolve_tuning
+
+
+def _write_midi(path: Path, pitches: list[int], *, step: float = 0.5) -> Path:
+    midi = pretty_midi.PrettyMIDI(initial_tempo=120.0)
+    bass = pretty_midi.Instrument(program=33)
+    for index, pitch in enumerate(pitches):
+        bass.notes.append(pretty_midi.Note(velocity=90, pitch=pitch, start=index * step, end=(index + 1) * step))
+    midi.instruments.append(bass)
+    midi.write(str(path))
+    return path
+
+
+def _gp_notes(path: Path) -> list[guitarpro.models.Note]:
+    song = guitarpro.parse(str(path))
+    return [
+        note
+        for measure in song.tracks[0].measures
+        for voice in measure.voices
+        for beat in voice.beats
+        for note in beat.notes
+    ]
+
+
+def test_midi_to_gp5_places_notes_with_optimized_fingering(tmp_path: Path) -> None:
+    pitches = [45, 47, 49, 50, 52, 50, 49, 47]
+    midi_path = _write_midi(tmp_path / "bass.mid", pitches)
+
+    gp5_path = midi_to_gp5(midi_path, tmp_path / "bass.gp5", strings=4)
+
+    assert gp5_path == tmp_path / "bass.gp5"
+    open_strings = list(reversed(STANDARD_TUNINGS[4]))
+    notes = _gp_notes(gp5_path)
+    assert [open_strings[note.string - 1] + note.value for note in notes] == pitches
+    assert (tmp_path / "bass.musicxml").is_file()
+
+
+@pytest.mark.parametrize(
+    ("tuning", "strings", "expected"),
+    [
+        ("standard", 4, (40, 45, 50, 55)),
+        ("Drop-D", 4, (38, 45, 50, 55)),
+        ("half step down", 5, (34, 39, 44, 49, 54)),
+        ("bead", 4, (35, 40, 45, 50)),
+        ("36,41,46,51", 4, (36, 41, 46, 51)),
+        ([33, 38, 43, 48, 53], 5, (33, 38, 43, 48, 53)),
+    ],
+)
+def test_resolve_tuning(tuning, strings: int, expected: tuple[int, ...]) -> None:
+    assert resolve_tuning(tuning, strings) == expected
+
+
+@pytest.mark.parametrize(
+    ("tuning", "strings", "message"),
+    [
+        ("open_g", 4, "Unknown tuning"),
+        ("bead", 5, "not defined for 5 strings"),
+        ("38,45,50", 4, "has 3 strings"),
+        ("38,x,50,55", 4, "Invalid custom tuning"),
+        ("38,45,50,200", 4, "Invalid custom tuning"),
+    ],
+)
+def test_resolve_tuning_rejects_invalid(tuning: str, strings: int, message: str) -> None:
+    with pytest.raises(ValueError, match=message):
+        resolve_tuning(tuning, strings)
+
+
+def test_midi_to_gp5_uses_requested_tuning(tmp_path: Path) -> None:
+    # Low D only exists on a drop-D bass; standard tuning would have to skip it.
+    pitches = [38, 45, 38, 50]
+    midi_path = _write_midi(tmp_path / "bass.mid", pitches)
+
+    gp5_path = midi_to_gp5(midi_path, tmp_path / "bass.gp5", strings=4, tuning="drop_d")
+
+    song = guitarpro.parse(str(gp5_path))
+    open_strings = [string.value for string in song.tracks[0].strings]
+    assert open_strings == [55, 50, 45, 38]
+    assert [open_strings[note.string - 1] + note.value for note in _gp_notes(gp5_path)] == pitches
+
+
+def test_midi_is_parsed_once_for_all_writers(monkeypatch, tmp_path: Path) -> None:
+    midi_path = _write_midi(tmp_path / "bass.mid", [40, 43, 45])
+    parses: list[Path] = []
+    load_score = tab.load_score
+    monkeypatch.setattr(tab, "load_score", lambda path: parses.append(path) or load_score(path))
+    monkeypatch.setattr(pretty_midi.PrettyMIDI, "estimate_tempo", lambda self: pytest.fail("tempo re-estimated"))
+
+    class PitchListWriter:
+        name = "pitches"
+        suffix = ".txt"
+
+        def write(self, score, output_path, *, tuning, job_id=None):
+            output_path.write_text(",".join(map(str, score.pitches.tolist())), encoding="utf-8")
+            return output_path
+
+    monkeypatch.setattr(tab, "SCORE_WRITERS", dict(SCORE_WRITERS))
+    register_writer(PitchListWriter())
+
+    midi_to_gp5(midi_path, tmp_path / "bass.gp5", extra_formats=("musicxml", "pitches"))
+
+    assert parses == [midi_path]
+    assert (tmp_path / "bass.gp5").is_file()
+    assert (tmp_path / "bass.musicxml").is_file()
+    assert (tmp_path / "bass.txt").read_text(encoding="utf-8") == "40,43,45"
+
+
+def test_unknown_output_format_is_rejected(tmp_path: Path) -> None:
+    midi_path = _write_midi(tmp_path / "bass.mid", [40])
+
+    with pytest.raises(ValueError, match="Unknown tab format 'pdf'"):
+        midi_to_gp5(midi_path, tmp_path / "bass.gp5", extra_formats=("pdf",))
+
+
+def test_music21_writer_remains_available_as_opt_in(tmp_path: Path) -> None:
+    midi_path = _write_midi(tmp_path / "bass.mid", [40, 42])
+
+    midi_to_gp5(midi_path, tmp_path / "bass.gp5", extra_formats=("music21",))
+
+    assert "<score-partwise" in (tmp_path / "bass.musicxml").read_text(encoding="utf-8")
+
+
+def _beat_ticks(beat: guitarpro.models.Beat) -> int:
+    return beat.duration.time
+
+
+def test_gp5_splits_measures_and_ties_across_barlines(tmp_path: Path) -> None:
+    midi = pretty_midi.PrettyMIDI(initial_tempo=120.0)
+    bass = pretty_midi.Instrument(program=33)
+    # Dotted half, then a half note that crosses the first barline, then a quarter after a rest.
+    for pitch, start, end in ((40, 0.0, 1.5), (45, 1.5, 2.5), (47, 3.0, 3.5)):
+        bass.notes.append(pretty_midi.Note(velocity=90, pitch=pitch, start=start, end=end))
+    midi.instruments.append(bass)
+    midi.write(str(tmp_path / "bass.mid"))
+
+    song = guitarpro.parse(str(midi_to_gp5(tmp_path / "bass.mid", tmp_path / "bass.gp5")))
+
+    measures = song.tracks[0].measures
+    assert len(measures) == 2
+    for measure in measures:
+        assert sum(_beat_ticks(beat) for beat in measure.voices[0].beats) == measure.header.length
+    first, second = (measure.voices[0].beats for measure in measures)
+    assert [(beat.duration.value, beat.duration.isDotted) for beat in first] == [(2, True), (4, False)]
+    assert second[0].notes[0].type == guitarpro.models.NoteType.tie
+    assert second[1].status == guitarpro.models.BeatStatus.rest
+    assert second[2].notes[0].value == 2  # B on the A string
+
+
+def test_gp5_full_length_song_is_split_into_bars(tmp_path: Path) -> None:
+    # Ten minutes of eighth notes at 120 BPM.
+    pitches = [40 + (index % 12) for index in range(2400)]
+    midi_path = _write_midi(tmp_path / "bass.mid", pitches, step=0.25)
+
+    started = time.perf_counter()
+    midi_to_gp5(midi_path, tmp_path / "bass.gp5", extra_formats=())
+    elapsed = time.perf_counter() - started
+
+    song = guitarpro.parse(str(tmp_path / "bass.gp5"))
+    assert len(song.tracks[0].measures) == 300
+    assert all(len(measure.voices[0].beats) == 8 for measure in song.tracks[0].measures)
+    assert elapsed < 10
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import onnxruntime as ort
+import pretty_midi
+import pytest
+import soundfile as sf
+
+from src.pipelines.decode import decode_audio, load_pcm
+from src.pipelines.transcription import (
+    N_OVERLAPPING_FRAMES,
+    BasicPitchEngine,
+    BatchingTranscriber,
+    SessionOptions,
+    load_posteriors,
+    main,
+    retranscribe_midi,
+    save_posteriors,
+)
+
+
+def test_session_options_map_to_onnx_runtime() -> None:
+    options = SessionOptions(
+        intra_op_threads=2,
+        inter_op_threads=1,
+        graph_optimization="extended",
+        execution_mode="parallel",
+    ).to_ort()
+
+    assert options.intra_op_num_threads == 2
+    assert options.inter_op_num_threads == 1
+    assert options.graph_optimization_level == ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+    assert options.execution_mode == ort.ExecutionMode.ORT_PARALLEL
+
+
+@pytest.mark.parametrize(
+    ("field", "value"),
+    [("graph_optimization", "maximum"), ("execution_mode", "async")],
+)
+def test_session_options_reject_unknown_values(field: str, value: str) -> None:
+    with pytest.raises(ValueError, match="available"):
+        SessionOptions(**{field: value}).to_ort()
+
+
+def test_concurrent_first_use_creates_one_session(monkeypatch) -> None:
+    engine = BasicPitchEngine()
+    created: list[object] = []
+    ready = threading.Barrier(4)
+
+    def create_session() -> object:
+        time.sleep(0.05)
+        created.append(object())
+        return created[-1]
+
+    monkeypatch.setattr(engine, "_create_session", create_session)
+
+    def use() -> object:
+        ready.wait()
+        return engine.session
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        sessions = list(pool.map(lambda _: use(), range(4)))
+
+    assert len(created) == 1
+    assert sessions == created * 4
+
+
+def test_batch_errors_reach_callers_and_the_dispatcher_survives(monkeypatch) -> None:
+    batcher = BatchingTranscriber(BasicPitchEngine(), max_jobs=2, max_wait_seconds=0.01)
+    batches = 0
+
+    def run_batch(batch) -> None:
+        nonlocal batches
+        batches += 1
+        if batches == 1:
+            raise RuntimeError("shape mismatch")
+        for request in batch:
+            request.future.set_result({"note": request.input_wav})
+
+    monkeypatch.setattr(batcher, "_run_batch", run_batch)
+
+    def infer(path: Path) -> Future:
+        # A daemon thread, so a regression fails on the timeout instead of hanging the run.
+        future: Future = Future()
+
+        def run() -> None:
+            try:
+                future.set_result(batcher.infer(path))
+            except Exception as exc:
+                future.set_exception(exc)
+
+        threading.Thread(target=run, daemon=True).start()
+        return future
+
+    with pytest.raises(RuntimeError, match="shape mismatch"):
+        infer(Path("first.wav")).result(timeout=5)
+    assert infer(Path("second.wav")).result(timeout=5) == {"note": Path("second.wav")}
+
+
+def _posteriors(n_frames: int = 200) -> dict[str, np.ndarray]:
+    """Synthetic activations holding one clear E1 (MIDI 28) note, 40 frames long."""
+    note = np.zeros((n_frames, 88), dtype=np.float32)
+    onset = np.zeros((n_frames, 88), dtype=np.float32)
+    contour = np.zeros((n_frames, 264), dtype=np.float32)
+    pitch_index = 28 - 21
+    note[20:60, pitch_index] = 0.7
+    onset[20, pitch_index] = 0.7
+    return {"note": note, "onset": onset, "contour": contour}
+
+
+def test_posteriors_round_trip_memory_mapped(tmp_path: Path) -> None:
+    directory = save_posteriors(_posteriors(), tmp_path / "bass.posteriors")
+
+    loaded = load_posteriors(directory)
+
+    assert set(loaded) == {"note", "onset", "contour"}
+    assert isinstance(loaded["note"], np.memmap)
+    np.testing.assert_array_equal(loaded["onset"], _posteriors()["onset"])
+
+
+def test_retranscribe_applies_new_thresholds(tmp_path: Path) -> None:
+    directory = save_posteriors(_posteriors(), tmp_path / "bass.posteriors")
+
+    default_path = retranscribe_midi(directory, tmp_path / "default.mid")
+    strict_path = retranscribe_midi(directory, tmp_path / "strict.mid", onset_threshold=0.9, frame_threshold=0.8)
+
+    default_notes = [n for inst in pretty_midi.PrettyMIDI(str(default_path)).instruments for n in inst.notes]
+    strict_notes = [n for inst in pretty_midi.PrettyMIDI(str(strict_path)).instruments for n in inst.notes]
+    assert [n.pitch for n in default_notes] == [28]
+    assert strict_notes == []
+
+
+def test_retranscribe_cli_reports_missing_posteriors(tmp_path: Path, capsys) -> None:
+    exit_code = main(["--posteriors", str(tmp_path / "missing"), "--output", str(tmp_path / "out.mid")])
+
+    assert exit_code == 2
+    assert "Cached posteriors missing" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("seconds", [0.01, 2.0, 7.3])
+def test_windows_match_basic_pitch_and_read_pcm_without_decoding(tmp_path: Path, seconds: float) -> None:
+    from basic_pitch.constants import AUDIO_N_SAMPLES, FFT_HOP
+    from basic_pitch.inference import get_audio_input
+
+    audio_path = tmp_path / "bass.wav"
+    rng = np.random.default_rng(0)
+    sf.write(audio_path, (0.1 * rng.standard_normal(int(44100 * seconds))).astype(np.float32), 44100)
+    overlap_len = N_OVERLAPPING_FRAMES * FFT_HOP
+    windows = get_audio_input(audio_path, overlap_len, AUDIO_N_SAMPLES - overlap_len)
+    expected = np.concatenate([window for window, _, _ in windows])
+    pcm_path = decode_audio(audio_path, tmp_path / "pcm", model_rate=False).basic_pitch_path
+    engine = BasicPitchEngine()
+
+    windows, length = engine.load_windows(audio_path)
+    pcm_windows, pcm_length = engine.load_windows(pcm_path)
+    # In-memory audio is windowed as is; the path only names the output.
+    memory_windows, memory_length = engine.load_windows(tmp_path / "missing.wav", np.array(load_pcm(pcm_path)))
+
+    np.testing.assert_array_equal(windows, expected)
+    np.testing.assert_array_equal(pcm_windows, expected)
+    np.testing.assert_array_equal(memory_windows, expected)
+    assert length == pcm_length == memory_length == len(load_pcm(pcm_path))
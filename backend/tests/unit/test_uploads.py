@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import io
+import os
+import time
+
+import numpy as np
+import pytest
+import soundfile as sf
+from fastapi import HTTPException
+
+from src.api import uploads
+
+BOUNDARY = "stem2tab-boundary"
+CONTENT_TYPE = f"multipart/form-data; boundary={BOUNDARY}"
+
+
+def _multipart(filename: str, content: bytes, **fields: str) -> bytes:
+    parts = [
+        f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        for name, value in fields.items()
+    ]
+    parts.append(
+        f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        "Content-Type: application/octet-stream\r\n\r\n".encode()
+        + content
+        + b"\r\n"
+    )
+    return b"".join(parts) + f"--{BOUNDARY}--\r\n".encode()
+
+
+def _receive(body: bytes, destination, *, chunk: int = 7, max_bytes: int = 1024) -> uploads.SavedUpload:
+    async def stream():
+        for start in range(0, len(body), chunk):
+            yield body[start : start + chunk]
+
+    return asyncio.run(
+        uploads.receive_upload(stream(), CONTENT_TYPE, destination, allowed_extensions={"wav"}, max_bytes=max_bytes)
+    )
+
+
+def test_receive_upload_streams_file_across_chunk_boundaries(tmp_path) -> None:
+    content = bytes(range(256)) * 3
+
+    upload = _receive(_multipart("Take 1.WAV", content, strings="5", tuning="drop_d"), tmp_path / "job")
+
+    assert upload.path == tmp_path / "job" / "input.wav"
+    assert upload.path.read_bytes() == content
+    assert upload.size_bytes == len(content)
+    assert upload.sha256 == hashlib.sha256(content).hexdigest()
+    assert upload.filename == "Take 1.WAV"
+    assert upload.fields == {"strings": "5", "tuning": "drop_d"}
+
+
+def test_receive_upload_aborts_past_the_limit(tmp_path) -> None:
+    received = 0
+    body = _multipart("tone.wav", b"x" * 4096)
+
+    async def stream():
+        nonlocal received
+        for start in range(0, len(body), 256):
+            received += 256
+            yield body[start : start + 256]
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(
+            uploads.receive_upload(stream(), CONTENT_TYPE, tmp_path, allowed_extensions={"wav"}, max_bytes=1024)
+        )
+
+    assert excinfo.value.status_code == 413
+    assert received < len(body)
+    assert not (tmp_path / "input.wav").exists()
+
+
+@pytest.mark.parametrize(
+    ("body", "detail"),
+    [
+        (_multipart("notes.txt", b"text"), "Unsupported file format"),
+        (_multipart("", b"audio"), "File is required"),
+        (f"--{BOUNDARY}--\r\n".encode(), "File is required"),
+    ],
+)
+def test_receive_upload_rejects_bad_forms(tmp_path, body, detail) -> None:
+    with pytest.raises(HTTPException, match=detail) as excinfo:
+        _receive(body, tmp_path)
+
+    assert excinfo.value.status_code == 400
+
+
+def test_receive_upload_caps_plain_form_fields(tmp_path) -> None:
+    oversized = _multipart("tone.wav", b"audio", tuning="x" * (uploads.MAX_FIELD_BYTES + 1))
+    with pytest.raises(HTTPException, match="'tuning' too large") as excinfo:
+        _receive(oversized, tmp_path, chunk=4096)
+    assert excinfo.value.status_code == 413
+
+    fields = {f"field{index}": "1" for index in range(uploads.MAX_FORM_FIELDS + 1)}
+    with pytest.raises(HTTPException, match="Too many form fields") as excinfo:
+        _receive(_multipart("tone.wav", b"audio", **fields), tmp_path)
+    assert excinfo.value.status_code == 400
+    assert not (tmp_path / "input.wav").exists()
+
+
+def test_probe_duration_reads_the_header(tmp_path) -> None:
+    path = tmp_path / "tone.flac"
+    sf.write(path, np.zeros(22050, dtype=np.float32), 11025)
+
+    assert uploads.probe_duration(path) == pytest.approx(2.0)
+
+
+def test_probe_duration_rejects_undecodable_audio(monkeypatch, tmp_path) -> None:
+    monkeypatch.setattr(uploads.shutil, "which", lambda name: None)
+    path = tmp_path / "tone.wav"
+    path.write_bytes(b"RIFF....not audio")
+
+    with pytest.raises(ValueError, match="Could not decode"):
+        uploads.probe_duration(path)
+    empty = io.BytesIO()
+    sf.write(empty, np.zeros(0, dtype=np.float32), 8000, format="WAV")
+    path.write_bytes(empty.getvalue())
+    with pytest.raises(ValueError, match="Could not decode"):
+        uploads.probe_duration(path)
+
+
+def test_concurrent_chunks_for_the_same_offset_do_not_interleave(tmp_path) -> None:
+    session = uploads.create_session(tmp_path / "job", "take.wav", 8, allowed_extensions={"wav"}, max_bytes=1024)
+
+    async def race() -> tuple[int, HTTPException, HTTPException]:
+        streaming = asyncio.Event()
+
+        async def slow(content: bytes):
+            streaming.set()
+            for byte in content:
+                await asyncio.sleep(0.01)
+                yield bytes([byte])
+
+        async def retry() -> tuple[HTTPException, HTTPException]:
+            # A client retrying after a timeout while its first request is still streaming.
+            await streaming.wait()
+            with pytest.raises(HTTPException) as refused:
+                await uploads.append_chunk(_chunks(b"BBBB"), session, offset=0)
+            with pytest.raises(HTTPException) as completing:
+                uploads.complete_session(session)
+            return refused.value, completing.value
+
+        written, (refused, completing) = await asyncio.gather(
+            uploads.append_chunk(slow(b"AAAA"), session, offset=0), retry()
+        )
+        return written, refused, completing
+
+    written, refused, completing = asyncio.run(race())
+
+    assert written == 4
+    assert refused.status_code == completing.status_code == 409
+    assert session.part_path.read_bytes() == b"AAAA"
+    assert asyncio.run(uploads.append_chunk(_chunks(b"CCCC"), session, offset=4)) == 8
+    assert session.part_path.read_bytes() == b"AAAACCCC"
+
+
+async def _chunks(content: bytes):
+    yield content
+
+
+def test_idle_sessions_expire_and_are_swept(tmp_path) -> None:
+    idle = uploads.create_session(tmp_path / "idle", "a.wav", 8, allowed_extensions={"wav"}, max_bytes=1024)
+    active = uploads.create_session(tmp_path / "active", "b.wav", 8, allowed_extensions={"wav"}, max_bytes=1024)
+    asyncio.run(uploads.append_chunk(_chunks(b"xx"), idle, offset=0))
+    hour_ago = time.time() - 3600
+    for path in (idle.record_path, idle.part_path):
+        os.utime(path, (hour_ago, hour_ago))
+
+    assert uploads.load_session(tmp_path / "idle", ttl_seconds=600) is None
+    assert uploads.load_session(tmp_path / "idle") == idle
+    assert uploads.load_session(tmp_path / "active", ttl_seconds=600) == active
+
+    assert uploads.sweep_sessions(tmp_path, ttl_seconds=600) == [tmp_path / "idle"]
+    assert not (tmp_path / "idle").exists()
+    assert active.part_path.exists()
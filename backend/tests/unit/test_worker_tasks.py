@@ -2,24 +2,41 @@ from __future__ import annotations
 
 from datetime import datetime, timezone
 from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
 
 from src.api.schemas import JobStatusResponse
 from src.core.config import settings
+from src.core.job_store import get_job_store, read_snapshot
+from src.pipelines.decode import DecodedAudio, load_pcm
 from src.worker import tasks
-from src.worker.app import celery_app
+from src.worker import app
+from src.worker.app import celery_app, pipeline
+
+
+def _write(path: Path, content: bytes) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    return path
+
+
+def _fake_decode(input_audio: Path, output_dir: Path, **kwargs) -> DecodedAudio:
+    # Stage tests use placeholder bytes instead of audio; pass them through as the "PCM".
+    return DecodedAudio(model_path=_write(output_dir / "input.npy", input_audio.read_bytes()))
 
 
 def _setup_eager(monkeypatch) -> None:
     monkeypatch.setattr(celery_app.conf, "task_always_eager", True)
     monkeypatch.setattr(celery_app.conf, "task_store_eager_result", True)
     monkeypatch.setattr(celery_app.conf, "result_backend", "cache+memory://")
-    monkeypatch.setattr(tasks.process_job, "update_state", lambda *args, **kwargs: None)
+    monkeypatch.setattr(tasks, "_update_state", lambda *args, **kwargs: None)
+    monkeypatch.setattr(tasks, "decode_audio", _fake_decode)
 
 
 def test_process_job_pipeline(monkeypatch, tmp_path) -> None:
     _setup_eager(monkeypatch)
     monkeypatch.setattr(settings, "file_bucket_path", tmp_path)
-    monkeypatch.setattr(tasks, "ensure_model", lambda *args, **kwargs: None)
 
     def fake_separate(input_audio: Path, output_dir: Path, **kwargs) -> dict[str, Path]:
         stems = {}
@@ -58,7 +75,7 @@ def test_process_job_pipeline(monkeypatch, tmp_path) -> None:
         files=["input.wav"],
         error=None,
     )
-    tasks._write_metadata(metadata)
+    get_job_store().create(metadata)
 
     payload = {"input_path": str(input_path), "strings": 4}
     result = tasks.process_job(job_id, payload)
@@ -72,4 +89,444 @@ def test_process_job_pipeline(monkeypatch, tmp_path) -> None:
     assert "bass.mid" in meta.files
     assert "bass.gp5" in meta.files
     assert "bass.wav" in meta.files
+    # The finished job is snapshotted to metadata.json, checkpoints included.
+    assert read_snapshot(job_id) == meta
+
+
+def test_running_task_holds_a_lease_until_it_finishes(monkeypatch, tmp_path) -> None:
+    _setup_eager(monkeypatch)
+    monkeypatch.setattr(settings, "file_bucket_path", tmp_path)
+    store = get_job_store()
+    leased: list[list[str]] = []
+
+    def fake_tab(midi_path: Path, output_path: Path, **kwargs) -> Path:
+        leased.append(store.claim_stalled(float("inf")))
+        return _write(output_path, b"gp5")
+
+    monkeypatch.setattr(tasks, "midi_to_gp5", fake_tab)
+    _write(tmp_path / "job-lease" / "bass.mid", b"midi")
+
+    tasks.retab_job("job-lease", {"strings": 4})
+
+    assert leased == [["job-lease"]]
+    assert store.claim_stalled(float("inf")) == []
+
+
+def test_process_job_threads_tuning_to_tab(monkeypatch, tmp_path) -> None:
+    _setup_eager(monkeypatch)
+    monkeypatch.setattr(settings, "file_bucket_path", tmp_path)
+    received: dict[str, object] = {}
+
+    def fake_tab(midi_path: Path, output_path: Path, **kwargs) -> Path:
+        received.update(kwargs)
+        output_path.write_bytes(b"gp5")
+        return output_path
+
+    monkeypatch.setattr(tasks, "separate_stems", lambda input_audio, output_dir, **kwargs: {"bass": input_audio})
+    monkeypatch.setattr(
+        tasks,
+        "transcribe_midi",
+        lambda input_wav, output_dir, **kwargs: _write(output_dir / "bass.mid", b"midi"),
+    )
+    monkeypatch.setattr(tasks, "midi_to_gp5", fake_tab)
+    input_path = _write(tmp_path / "job-tuning" / "input.wav", b"audio")
+
+    tasks.process_job("job-tuning", {"input_path": str(input_path), "strings": 5, "tuning": "drop_d"})
+
+    assert received["strings"] == 5
+    assert received["tuning"] == "drop_d"
+
+
+def test_process_job_rejects_unknown_tuning_before_separation(monkeypatch, tmp_path) -> None:
+    _setup_eager(monkeypatch)
+    monkeypatch.setattr(settings, "file_bucket_path", tmp_path)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("separation must not run for an invalid tuning")
+
+    monkeypatch.setattr(tasks, "separate_stems", fail)
+    input_path = _write(tmp_path / "job-bad-tuning" / "input.wav", b"audio")
+
+    with pytest.raises(ValueError, match="Unknown tuning"):
+        tasks.process_job("job-bad-tuning", {"input_path": str(input_path), "tuning": "open_g"})
+
+    meta = tasks._load_metadata("job-bad-tuning")
+    assert meta.status == tasks.JobStatus.FAILURE
+    assert "Unknown tuning" in meta.error
+
+
+def test_separate_stage_fails_the_job_for_missing_input(monkeypatch, tmp_path) -> None:
+    _setup_eager(monkeypatch)
+    monkeypatch.setattr(settings, "file_bucket_path", tmp_path)
+
+    with pytest.raises(FileNotFoundError):
+        tasks.separate_stage("job-missing", {"input_path": str(tmp_path / "missing.wav")})
+
+    meta = tasks._load_metadata("job-missing")
+    assert meta.status == tasks.JobStatus.FAILURE
+    assert "Input audio not found" in meta.error
+
+
+def test_retab_job_only_reruns_tab_stage(monkeypatch, tmp_path) -> None:
+    _setup_eager(monkeypatch)
+    monkeypatch.setattr(settings, "file_bucket_path", tmp_path)
+    received: dict[str, object] = {}
+
+    def fail(*args, **kwargs):
+        raise AssertionError("retab must reuse existing stems and MIDI")
+
+    def fake_tab(midi_path: Path, output_path: Path, **kwargs) -> Path:
+        received.update(kwargs, midi_path=midi_path)
+        output_path.write_bytes(b"gp5")
+        return output_path
+
+    monkeypatch.setattr(tasks, "separate_stems", fail)
+    monkeypatch.setattr(tasks, "transcribe_midi", fail)
+    monkeypatch.setattr(tasks, "midi_to_gp5", fake_tab)
+    midi_path = _write(tmp_path / "job-retab" / "bass.mid", b"midi")
+
+    result = tasks.retab_job("job-retab", {"strings": 4, "tuning": "38,45,50,55"})
+
+    assert result["files"] == ["bass.gp5", "bass.mid"]
+    assert received == {
+        "strings": 4,
+        "tuning": "38,45,50,55",
+        "extra_formats": ("musicxml",),
+        "job_id": "job-retab",
+        "midi_path": midi_path,
+    }
+    assert tasks._load_metadata("job-retab").status == tasks.JobStatus.SUCCESS
+
+
+def test_pipeline_chains_stages_on_their_own_queues() -> None:
+    signature = pipeline("job-chain", {"input_path": "/data/job-chain/input.wav"})
+
+    names = [task.task for task in signature.tasks]
+    assert names == [
+        "src.worker.tasks.separate_stage",
+        "src.worker.tasks.transcribe_stage",
+        "src.worker.tasks.render_stage",
+    ]
+    queues = [celery_app.amqp.router.route({}, name)["queue"].name for name in names]
+    assert queues == ["separation", "transcription", "render"]
+
+
+def test_inprocess_pipeline_mode_runs_the_whole_job_as_one_task(monkeypatch) -> None:
+    payload = {"input_path": "/data/job-one/input.wav"}
+
+    signature = pipeline("job-one", payload, mode="inprocess")
+
+    assert signature.task == "src.worker.tasks.process_job"
+    assert tuple(signature.args) == ("job-one", payload)
+    monkeypatch.setattr(settings, "pipeline_mode", "inprocess")
+    assert pipeline("job-one", payload).task == app.PROCESS_JOB
+    with pytest.raises(ValueError, match="chain, inprocess"):
+        pipeline("job-one", payload, mode="threads")
+
+
+def test_task_names_match_registered_tasks() -> None:
+    # The API enqueues by these names without importing this module.
+    assert app.SEPARATE_STAGE == tasks.separate_stage.name
+    assert app.TRANSCRIBE_STAGE == tasks.transcribe_stage.name
+    assert app.RENDER_STAGE == tasks.render_stage.name
+    assert app.RETRANSCRIBE_JOB == tasks.retranscribe_job.name
+    assert app.RETAB_JOB == tasks.retab_job.name
+    assert app.PROCESS_JOB == tasks.process_job.name
+    assert {app.SEPARATE_STAGE, app.TRANSCRIBE_STAGE, app.RENDER_STAGE} <= set(celery_app.tasks)
+
+
+def test_pipeline_passes_artifacts_by_path(monkeypatch, tmp_path) -> None:
+    _setup_eager(monkeypatch)
+    monkeypatch.setattr(settings, "file_bucket_path", tmp_path)
+    seen: dict[str, object] = {}
+
+    def fake_transcribe(input_wav: Path, output_dir: Path, **kwargs) -> Path:
+        seen["transcribe_input"] = input_wav
+        return _write(output_dir / "bass.mid", b"midi")
+
+    def fake_tab(midi_path: Path, output_path: Path, **kwargs) -> Path:
+        seen["tab_input"] = midi_path
+        return _write(output_path, b"gp5")
+
+    monkeypatch.setattr(
+        tasks,
+        "separate_stems",
+        lambda input_audio, output_dir, **kwargs: {"bass": _write(output_dir / "bass.wav", b"stem")},
+    )
+    monkeypatch.setattr(tasks, "transcribe_midi", fake_transcribe)
+    monkeypatch.setattr(tasks, "midi_to_gp5", fake_tab)
+    input_path = _write(tmp_path / "job-chain" / "input.wav", b"audio")
+
+    result = pipeline("job-chain", {"input_path": str(input_path)}).apply_async(task_id="job-chain")
+
+    assert result.get() == {"job_id": "job-chain", "files": ["bass.gp5", "bass.mid", "bass.wav", "input.wav"]}
+    assert seen == {
+        "transcribe_input": tmp_path / "job-chain" / "bass.wav",
+        "tab_input": tmp_path / "job-chain" / "bass.mid",
+    }
+    assert tasks._load_metadata("job-chain").status == tasks.JobStatus.SUCCESS
+
+
+def test_failed_stage_marks_the_job_failed(monkeypatch, tmp_path) -> None:
+    _setup_eager(monkeypatch)
+    monkeypatch.setattr(settings, "file_bucket_path", tmp_path)
+    failures: list[tuple[str, str]] = []
+
+    def broken_transcribe(*args, **kwargs):
+        raise RuntimeError("onnx exploded")
+
+    monkeypatch.setattr(tasks, "transcribe_midi", broken_transcribe)
+    monkeypatch.setattr(tasks, "_mark_failed", lambda job_id, exc: failures.append((job_id, str(exc))))
+    bass_path = _write(tmp_path / "job-fail" / "bass.wav", b"stem")
+
+    with pytest.raises(RuntimeError):
+        tasks.transcribe_stage({"job_id": "job-fail", "bass_path": str(bass_path)})
+
+    assert failures == [("job-fail", "onnx exploded")]
+    metadata = tasks._load_metadata("job-fail")
+    assert metadata.status == tasks.JobStatus.FAILURE
+    assert metadata.error == "onnx exploded"
+
+
+def _fake_stages(monkeypatch, calls: list[str], *, fail_render: bool = False) -> None:
+    def fake_separate(input_audio: Path, output_dir: Path, **kwargs) -> dict[str, Path]:
+        calls.append("separation")
+        return {"bass": _write(output_dir / "bass.wav", b"stem:" + input_audio.read_bytes())}
+
+    def fake_transcribe(input_wav: Path, output_dir: Path, **kwargs) -> Path:
+        calls.append("transcription")
+        (output_dir / "bass.posteriors").mkdir(exist_ok=True)
+        return _write(output_dir / "bass.mid", b"midi")
+
+    def fake_tab(midi_path: Path, output_path: Path, **kwargs) -> Path:
+        calls.append("render")
+        if fail_render:
+            raise OSError("disk full")
+        return _write(output_path, f"gp5-{kwargs['tuning']}".encode())
+
+    monkeypatch.setattr(tasks, "separate_stems", fake_separate)
+    monkeypatch.setattr(tasks, "transcribe_midi", fake_transcribe)
+    monkeypatch.setattr(tasks, "midi_to_gp5", fake_tab)
+
+
+def test_retry_resumes_after_last_completed_stage(monkeypatch, tmp_path) -> None:
+    _setup_eager(monkeypatch)
+    monkeypatch.setattr(settings, "file_bucket_path", tmp_path)
+    calls: list[str] = []
+    _fake_stages(monkeypatch, calls, fail_render=True)
+    payload = {"input_path": str(_write(tmp_path / "job-resume" / "input.wav", b"audio")), "tuning": "standard"}
+
+    with pytest.raises(OSError):
+        tasks.process_job("job-resume", payload)
+    _fake_stages(monkeypatch, calls)
+    tasks.process_job("job-resume", payload)
+
+    assert calls == ["separation", "transcription", "render", "render"]
+    stages = tasks._load_metadata("job-resume").stages
+    assert set(stages) == {"separation", "transcription", "render"}
+    assert stages["render"].params == {"strings": 4, "tuning": "standard", "musicxml_writer": "musicxml"}
+    assert stages["separation"].artifacts == {"bass": str(tmp_path / "job-resume" / "bass.wav")}
+
+
+def test_checkpoints_are_invalidated_by_input_params_and_missing_artifacts(monkeypatch, tmp_path) -> None:
+    _setup_eager(monkeypatch)
+    monkeypatch.setattr(settings, "file_bucket_path", tmp_path)
+    calls: list[str] = []
+    _fake_stages(monkeypatch, calls)
+    input_path = _write(tmp_path / "job-ckpt" / "input.wav", b"audio")
+    payload = {"input_path": str(input_path)}
+
+    tasks.process_job("job-ckpt", payload)
+    tasks.process_job("job-ckpt", payload)
+    assert calls == ["separation", "transcription", "render"]
+
+    tasks.process_job("job-ckpt", {**payload, "tuning": "drop_d"})
+    assert calls[3:] == ["render"]
+
+    # A regenerated MIDI with identical bytes still satisfies the render checkpoint.
+    (tmp_path / "job-ckpt" / "bass.mid").unlink()
+    tasks.process_job("job-ckpt", {**payload, "tuning": "drop_d"})
+    assert calls[4:] == ["transcription"]
+
+    input_path.write_bytes(b"other audio")
+    tasks.process_job("job-ckpt", payload)
+    assert calls[5:] == ["separation", "transcription", "render"]
+
+
+def test_separation_reads_pcm_decoded_once(monkeypatch, tmp_path) -> None:
+    import numpy as np
+    import soundfile as sf
+
+    monkeypatch.setattr(tasks, "_update_state", lambda *args, **kwargs: None)
+    monkeypatch.setattr(settings, "file_bucket_path", tmp_path)
+    monkeypatch.setattr(settings, "demucs_backend", "inprocess")
+    calls: list[str] = []
+    _fake_stages(monkeypatch, calls)
+    seen: dict[str, object] = {}
+
+    def fake_separate(input_audio: Path, output_dir: Path, **kwargs) -> dict[str, Path]:
+        seen["input"] = input_audio
+        seen["shape"] = load_pcm(input_audio).shape
+        return {"bass": _write(output_dir / "bass.wav", b"stem")}
+
+    monkeypatch.setattr(tasks, "separate_stems", fake_separate)
+    input_path = tmp_path / "job-pcm" / "input.flac"
+    input_path.parent.mkdir(parents=True)
+    sf.write(input_path, np.zeros(22050, dtype=np.float32), 22050)
+
+    tasks.process_job("job-pcm", {"input_path": str(input_path)})
+
+    assert seen == {"input": tmp_path / "job-pcm" / "pcm" / "input.npy", "shape": (44100, 2)}
+    # The decoded PCM is scratch data: gone once the job succeeds, checkpoint included.
+    assert not (tmp_path / "job-pcm" / "pcm").exists()
+    assert "decode" not in tasks._load_metadata("job-pcm").stages
+
+
+def test_warm_up_preloads_models_once_per_process(monkeypatch) -> None:
+    calls: list[str] = []
+    monkeypatch.setattr(settings, "demucs_backend", "inprocess")
+    monkeypatch.setattr(tasks, "ensure_model", lambda model_name, cache_dir: calls.append(model_name))
+    monkeypatch.setattr(
+        tasks,
+        "get_transcriber",
+        lambda options: SimpleNamespace(session=calls.append(f"basic_pitch:{options.intra_op_threads}")),
+    )
+
+    timings = tasks.warm_up()
+
+    assert calls == [settings.demucs_model, "basic_pitch:0"]
+    assert set(timings) == {"demucs_seconds", "basic_pitch_seconds", "total_seconds"}
+    assert timings["total_seconds"] >= 0
+
+
+def test_render_only_worker_skips_model_warm_up(monkeypatch) -> None:
+    calls: list[dict[str, bool]] = []
+    monkeypatch.setattr(tasks, "_consumed_queues", lambda: {"render"})
+    monkeypatch.setattr(tasks, "warm_up", lambda **kwargs: calls.append(kwargs))
+
+    tasks._warm_up_worker_process()
+    monkeypatch.setattr(tasks, "_consumed_queues", lambda: {"separation"})
+    tasks._warm_up_worker_process()
+
+    assert calls == [{"demucs": False, "basic_pitch": False}, {"demucs": True, "basic_pitch": False}]
+
+
+@pytest.mark.parametrize(("pool", "warmed"), [("threads", True), ("prefork", False), ("solo", False)])
+def test_worker_init_warms_up_pools_without_process_init(monkeypatch, pool: str, warmed: bool) -> None:
+    calls: list[dict[str, bool]] = []
+    monkeypatch.setattr(tasks, "_consumed_queues", lambda: {"transcription"})
+    monkeypatch.setattr(tasks, "warm_up", lambda **kwargs: calls.append(kwargs))
+
+    tasks._warm_up_worker(SimpleNamespace(pool_cls=pool))
+
+    assert calls == ([{"demucs": False, "basic_pitch": True}] if warmed else [])
+
+
+def test_process_job_does_not_load_models(monkeypatch, tmp_path) -> None:
+    _setup_eager(monkeypatch)
+    monkeypatch.setattr(settings, "file_bucket_path", tmp_path)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("models must be loaded by the warm-up hook, not per job")
+
+    monkeypatch.setattr(tasks, "ensure_model", fail)
+    monkeypatch.setattr(tasks, "separate_stems", lambda input_audio, output_dir, **kwargs: {"bass": input_audio})
+    monkeypatch.setattr(tasks, "transcribe_midi", lambda input_wav, output_dir, **kwargs: input_wav)
+    monkeypatch.setattr(tasks, "midi_to_gp5", lambda midi_path, output_path, **kwargs: midi_path)
+    input_path = tmp_path / "job-warm" / "input.wav"
+    input_path.parent.mkdir(parents=True)
+    input_path.write_bytes(b"audio")
+
+    result = tasks.process_job("job-warm", {"input_path": str(input_path)})
+
+    assert result["job_id"] == "job-warm"
+
+
+def test_retranscribe_job_rebuilds_midi_and_tab(monkeypatch, tmp_path) -> None:
+    _setup_eager(monkeypatch)
+    monkeypatch.setattr(settings, "file_bucket_path", tmp_path)
+    calls: dict[str, object] = {}
+
+    def fake_retranscribe(posteriors_dir: Path, output_path: Path, **kwargs) -> Path:
+        calls["posteriors_dir"] = posteriors_dir
+        calls.update(kwargs)
+        output_path.write_bytes(b"midi")
+        return output_path
+
+    def fake_tab(midi_path: Path, output_path: Path, **kwargs) -> Path:
+        calls["strings"] = kwargs["strings"]
+        output_path.write_bytes(b"gp5")
+        return output_path
+
+    monkeypatch.setattr(tasks, "retranscribe_midi", fake_retranscribe)
+    monkeypatch.setattr(tasks, "midi_to_gp5", fake_tab)
+    (tmp_path / "job-re").mkdir()
+
+    result = tasks.retranscribe_job("job-re", {"onset_threshold": 0.7, "strings": 5})
+
+    assert result["files"] == ["bass.gp5", "bass.mid"]
+    assert calls["posteriors_dir"] == tmp_path / "job-re" / "bass.posteriors"
+    assert calls["onset_threshold"] == 0.7
+    assert calls["frame_threshold"] == 0.3
+    assert calls["strings"] == 5
+    assert tasks._load_metadata("job-re").status == tasks.JobStatus.SUCCESS
+
+
+def test_process_job_hands_bass_to_transcription_in_memory(monkeypatch, tmp_path) -> None:
+    import threading
+
+    import numpy as np
+
+    _setup_eager(monkeypatch)
+    monkeypatch.setattr(settings, "file_bucket_path", tmp_path)
+    monkeypatch.setattr(settings, "demucs_backend", "inprocess")
+    calls: list[str] = []
+    _fake_stages(monkeypatch, calls)
+    written = threading.Event()
+    seen: dict[str, object] = {}
+
+    def fake_separate(input_audio: Path, output_dir: Path, *, handoff, **kwargs) -> dict[str, Path]:
+        bass_path = output_dir / "bass.wav"
+
+        def write() -> None:
+            written.wait(5)
+            _write(bass_path, b"stem")
+
+        handoff.submit(write)
+        handoff.audio = np.zeros(22050, dtype=np.float32)
+        return {"bass": bass_path}
+
+    def fake_transcribe(input_wav: Path, output_dir: Path, *, audio, **kwargs) -> Path:
+        # Transcription starts while bass.wav is still being written.
+        seen["audio"] = audio
+        seen["bass_written"] = input_wav.exists()
+        written.set()
+        (output_dir / "bass.posteriors").mkdir()
+        return _write(output_dir / "bass.mid", b"midi")
+
+    monkeypatch.setattr(tasks, "separate_stems", fake_separate)
+    monkeypatch.setattr(tasks, "transcribe_midi", fake_transcribe)
+    input_path = _write(tmp_path / "job-memory" / "input.wav", b"audio")
+
+    result = tasks.process_job("job-memory", {"input_path": str(input_path)})
+
+    assert seen["bass_written"] is False
+    assert seen["audio"].shape == (22050,)
+    assert "bass.wav" in result["files"]
+    stages = tasks._load_metadata("job-memory").stages
+    # Both checkpoints were recorded once bass.wav was complete, so they are valid for a retry.
+    assert {"separation", "transcription", "render"} <= set(stages)
+    bass_path = tmp_path / "job-memory" / "bass.wav"
+    assert tasks._completed_stage("job-memory", "transcription", bass_path, tasks.DEFAULT_NOTE_THRESHOLDS)
+
+
+def test_separation_progress_is_forwarded_between_stage_bounds(monkeypatch) -> None:
+    updates: list[int] = []
+    monkeypatch.setattr(tasks, "_update_state", lambda job_id, progress: updates.append(progress))
+
+    report = tasks._stage_progress("job-progress", 10, 25)
+    # A second bar (next model of a bag) restarts at 0 and must not move progress backwards.
+    for fraction in (0.0, 0.1, 0.12, 0.5, 1.0, 0.0, 0.6, 1.0):
+        report(fraction)
 
+    assert updates == [11, 17, 25]
@@ -17,6 +17,9 @@ export interface JobPollingState {
   error?: string;
 }
 
+const FINISHED_STATUSES = new Set(["SUCCESS", "FAILURE", "REVOKED"]);
+
+// イベントストリーム (SSE) を優先し、使えない環境や接続エラー時は従来のポーリングに切り替える
 export function useJobPolling(jobId?: string, intervalMs = 2000): JobPollingState {
   const [data, setData] = useState<JobStatus | undefined>();
   const [isLoading, setIsLoading] = useState<boolean>(false);
@@ -32,6 +35,7 @@ export function useJobPolling(jobId?: string, intervalMs = 2000): JobPollingStat
     let active = true;
     const controller = new AbortController();
     let intervalId: number | undefined;
+    let source: EventSource | undefined;
 
     const fetchStatus = async (): Promise<void> => {
       setIsLoading(true);
@@ -65,12 +69,42 @@ export function useJobPolling(jobId?: string, intervalMs = 2000): JobPollingStat
       }
     };
 
-    void fetchStatus();
-    intervalId = window.setInterval(fetchStatus, intervalMs);
+    const startPolling = (): void => {
+      void fetchStatus();
+      intervalId = window.setInterval(fetchStatus, intervalMs);
+    };
+
+    const applyEvent = (event: MessageEvent<string>, replace: boolean): void => {
+      const update = JSON.parse(event.data) as Partial<JobStatus>;
+      setData((previous) => (replace ? (update as JobStatus) : ({ ...previous, ...update } as JobStatus)));
+      setError(undefined);
+      setIsLoading(false);
+      if (update.status && FINISHED_STATUSES.has(update.status)) {
+        source?.close();
+      }
+    };
+
+    if (typeof EventSource === "undefined") {
+      startPolling();
+    } else {
+      setIsLoading(true);
+      source = new EventSource(`${API_BASE}/api/v1/jobs/${jobId}/events`);
+      source.addEventListener("status", (event) => applyEvent(event as MessageEvent<string>, true));
+      source.addEventListener("progress", (event) => applyEvent(event as MessageEvent<string>, false));
+      source.onerror = () => {
+        // 完了後にサーバーがストリームを閉じた場合も含め、ポーリングで最終状態を確認する
+        source?.close();
+        source = undefined;
+        if (active && intervalId === undefined) {
+          startPolling();
+        }
+      };
+    }
 
     return () => {
       active = false;
       controller.abort();
+      source?.close();
       if (intervalId !== undefined) {
         window.clearInterval(intervalId);
       }